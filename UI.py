@@ -1,10 +1,41 @@
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
 import tkinter as tk
-import subprocess
+import ast
 import os
 import json
+import queue
+import threading
+import time
+from pathlib import Path
 from config_manager import config
+from pipeline import PipelineWorker, RunCancelled
+
+# Как часто окно забирает события хода обработки, мс
+POLL_INTERVAL_MS = 100
+# Сколько ждать отклика на отмену, прежде чем завершить процесс обработки принудительно, мс
+CANCEL_TIMEOUT_MS = 15000
+
+# Сколько проблем проверки настроек показывать в окне подтверждения сохранения
+MAX_SHOWN_ISSUES = 15
+
+# Названия этапов обработки для окна
+STAGE_TITLES = {
+    "discover": "Поиск опросных листов",
+    "load": "Чтение опросных листов",
+    "combine_dataframes": "Объединение таблиц модуля",
+    "concat": "Сборка общей таблицы",
+    "compact_dtypes": "Сжатие типов столбцов",
+    "load_checkpoint": "Чтение контрольной точки",
+    "apply_replacements": "Замены значений",
+    "resolve_identities": "Сопоставление сотрудников",
+    "smart_merge": "Удаление дубликатов",
+    "smart_merge_incremental": "Удаление дубликатов (изменённые группы)",
+    "combine_columns": "Объединение столбцов",
+    "combine_columns_incremental": "Объединение столбцов (изменённые группы)",
+    "export_wait": "Ожидание записи Excel",
+    "sqlite_export": "Запись в SQLite",
+}
 
 
 class AdminHelperApp(ctk.CTk):
@@ -18,10 +49,28 @@ class AdminHelperApp(ctk.CTk):
 
         self.input_folder = ctk.StringVar()
 
+        # Состояние текущего запуска: поток запуска и очередь его событий для окна
+        self.run_thread = None
+        self.run_id = 0
+        self.cancel_requested = False
+        self.events = queue.Queue()
+        self.current_stage = None
+        self.stage_started = None
+        self.stage_detail = ""
+
         self.build_sidebar()
         self.build_main_area()
         self.settings_window = None
         self.rename_entries = {}
+        # Проверка настроек тоже идёт в своём потоке: чтение заголовков опросных листов
+        # большого каталога занимает секунды
+        self.check_thread = None
+        self.check_results = queue.Queue()
+
+        # Процесс обработки стартует вместе с окном: к первому запуску pandas уже загружен
+        self.worker = PipelineWorker()
+        self.worker.start()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def build_sidebar(self):
         sidebar = ctk.CTkFrame(
@@ -60,7 +109,19 @@ class AdminHelperApp(ctk.CTk):
             folder_frame, text="Выбрать...", command=self.select_input_folder)
         browse_btn.pack(side="left")
 
-        run_btn = ctk.CTkButton(
+        self.progress_bar = ctk.CTkProgressBar(main_frame)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(fill="x")
+
+        self.status_label = ctk.CTkLabel(
+            main_frame, text="", text_color="black", anchor="w")
+        self.status_label.pack(fill="x", pady=(5, 5))
+
+        # Время этапов и найденные/записанные файлы текущего запуска
+        self.stage_log = ctk.CTkTextbox(main_frame, state="disabled")
+        self.stage_log.pack(fill="both", expand=True, pady=(0, 50))
+
+        self.run_btn = ctk.CTkButton(
             main_frame,
             text="Запуск",
             fg_color="#007ACC",
@@ -68,7 +129,17 @@ class AdminHelperApp(ctk.CTk):
             font=ctk.CTkFont(size=14, weight="bold"),
             command=self.run_main_script
         )
-        run_btn.place(relx=1.0, rely=1.0, anchor="se", x=-10, y=-10)
+        self.run_btn.place(relx=1.0, rely=1.0, anchor="se", x=-10, y=-10)
+
+        self.cancel_btn = ctk.CTkButton(
+            main_frame,
+            text="Отмена",
+            fg_color="#999999",
+            hover_color="#777777",
+            state="disabled",
+            command=self.cancel_run
+        )
+        self.cancel_btn.place(relx=1.0, rely=1.0, anchor="se", x=-160, y=-10)
 
     def select_input_folder(self):
         folder = filedialog.askdirectory()
@@ -81,12 +152,139 @@ class AdminHelperApp(ctk.CTk):
             messagebox.showwarning(
                 "Предупреждение", "Сначала выберите каталог с данными.")
             return
+        if self.run_thread is not None and self.run_thread.is_alive():
+            return
+
+        self.run_id += 1
+        self.cancel_requested = False
+        self.events = queue.Queue()
+        self.current_stage = None
+        self.stage_detail = ""
+        self.progress_bar.set(0)
+        self.status_label.configure(text="Подготовка...")
+        self.stage_log.configure(state="normal")
+        self.stage_log.delete("1.0", "end")
+        self.stage_log.configure(state="disabled")
+        self.run_btn.configure(state="disabled")
+        self.cancel_btn.configure(state="normal")
+
+        # Обработка идёт в отдельном потоке, окно остаётся отзывчивым
+        self.run_thread = threading.Thread(
+            target=self.run_in_background,
+            args=(self.input_folder.get(), self.events), daemon=True)
+        self.run_thread.start()
+        self.after(POLL_INTERVAL_MS, self.poll_events)
+
+    def run_in_background(self, folder, events):
+        """Поток запуска: события и итог передаются окну через очередь — Tk работает только в своём потоке."""
         try:
-            subprocess.run(["python", "main.py"], check=True)
-            messagebox.showinfo("Успех", "main.py успешно выполнен.")
-        except subprocess.CalledProcessError as e:
+            result = self.worker.run(
+                input_folder=folder, on_event=lambda event: events.put(("event", event)))
+        except RunCancelled:
+            events.put(("cancelled", None))
+        except RuntimeError as e:
+            events.put(("error", str(e)))
+        except Exception as e:
+            # Без итога в очереди окно так и ждало бы конца запуска с выключенной кнопкой
+            events.put(("error", f"{type(e).__name__}: {e}"))
+        else:
+            events.put(("done", result))
+
+    def cancel_run(self):
+        self.cancel_requested = True
+        self.worker.cancel()
+        self.cancel_btn.configure(state="disabled")
+        self.status_label.configure(text="Отмена...")
+        # Если процесс не откликнулся (например, долго разбирает один большой файл) — завершаем его
+        self.after(CANCEL_TIMEOUT_MS, self.force_cancel, self.run_id)
+
+    def force_cancel(self, run_id):
+        if run_id == self.run_id and self.run_thread is not None and self.run_thread.is_alive():
+            self.worker.terminate()
+
+    def poll_events(self):
+        while True:
+            try:
+                kind, payload = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "event":
+                self.show_event(payload)
+            else:
+                self.finish_run(kind, payload)
+                return
+        self.show_status()
+        self.after(POLL_INTERVAL_MS, self.poll_events)
+
+    def show_event(self, event):
+        kind = event["event"]
+        if kind == "progress":
+            self.progress_bar.set(event["fraction"])
+        elif kind == "files_discovered":
+            modules = ", ".join(f"{module}: файлов {info['files']}, таблиц {info['tables']}"
+                                for module, info in event["modules"].items())
+            self.add_log_line(f"Найдено опросных листов: {event['files']} ({modules})")
+        elif kind == "file_loaded":
+            self.stage_detail = f"файл {event['done']} из {event['total']}"
+        elif kind == "stage_started":
+            self.current_stage = self.stage_title(event)
+            self.stage_started = time.monotonic()
+            self.stage_detail = ""
+        elif kind == "stage_finished":
+            rows = f", строк {event['rows_in']} → {event['rows_out']}" \
+                if event["rows_out"] is not None else ""
+            self.add_log_line(f"{self.stage_title(event)}: {event['wall_time']:.2f} с{rows}")
+            self.current_stage = None
+        elif kind == "file_written":
+            self.add_log_line(f"Записан файл {Path(event['path']).name} ({event['seconds']:.2f} с)")
+        elif kind == "sqlite_written":
+            self.add_log_line(f"База {Path(event['path']).name}: добавлено {event['inserted']}, "
+                              f"изменено {event['updated']}, удалено {event['deleted']}")
+
+    def stage_title(self, event):
+        title = STAGE_TITLES.get(event["stage"], event["stage"])
+        return f"{title} [{event['module']}]" if event["module"] else title
+
+    def show_status(self):
+        """Текущий этап и сколько он уже идёт."""
+        if self.current_stage is None or self.cancel_btn.cget("state") == "disabled":
+            return
+        elapsed = time.monotonic() - self.stage_started
+        detail = f", {self.stage_detail}" if self.stage_detail else ""
+        self.status_label.configure(text=f"{self.current_stage}: {elapsed:.1f} с{detail}")
+
+    def add_log_line(self, text):
+        self.stage_log.configure(state="normal")
+        self.stage_log.insert("end", text + "\n")
+        self.stage_log.see("end")
+        self.stage_log.configure(state="disabled")
+
+    def finish_run(self, kind, payload):
+        self.run_btn.configure(state="normal")
+        self.cancel_btn.configure(state="disabled")
+        # Процесс, завершённый принудительно после отмены, — тоже отмена, а не ошибка
+        if kind == "cancelled" or (kind == "error" and self.cancel_requested):
+            self.status_label.configure(text="Обработка отменена")
+        elif kind == "error":
+            self.status_label.configure(text="Обработка завершилась с ошибкой")
+            messagebox.showerror(
+                "Ошибка", f"Обработка завершилась с ошибкой:\n{payload}")
+        elif payload.failures:
+            self.status_label.configure(text="Не все файлы записаны")
+            failed = "\n".join(f"{path}: {error}" for path, error in payload.failures)
             messagebox.showerror(
-                "Ошибка", f"main.py завершился с ошибкой:\n{e}")
+                "Ошибка", f"Не удалось записать файлы:\n{failed}")
+        else:
+            self.progress_bar.set(1)
+            self.status_label.configure(
+                text=f"Готово за {payload.wall_time:.1f} с, записано файлов: {len(payload.written)}")
+            messagebox.showinfo(
+                "Успех", f"Обработка завершена за {payload.wall_time:.1f} с, "
+                         f"записано файлов: {len(payload.written)}.")
+
+    def on_close(self):
+        self.worker.close()
+        self.destroy()
 
     def open_settings(self):
         if self.settings_window is not None and self.settings_window.winfo_exists():
@@ -130,9 +328,13 @@ class AdminHelperApp(ctk.CTk):
                                 command=self.remove_last_entry_from_active_tab)
         del_btn.pack(side="right", padx=5)
 
-        save_btn = ctk.CTkButton(
+        self.save_btn = ctk.CTkButton(
             button_frame, text="Сохранить", command=self.save_config)
-        save_btn.pack(side="right", padx=5)
+        self.save_btn.pack(side="right", padx=5)
+
+        self.check_btn = ctk.CTkButton(
+            button_frame, text="Проверить", command=self.show_config_check)
+        self.check_btn.pack(side="right", padx=5)
 
     def build_config_tab(self, tab_name, mapping):
         tab = self.tabview.add(tab_name)
@@ -195,7 +397,8 @@ class AdminHelperApp(ctk.CTk):
             entry_pair = entries.pop()
             entry_pair[0].master.destroy()
 
-    def save_config(self):
+    def collect_config(self):
+        """Настройки из вкладок окна в том виде, в каком они будут сохранены в config.json."""
         updated_config = {}
 
         for tab_name, data in self.rename_entries.items():
@@ -206,16 +409,111 @@ class AdminHelperApp(ctk.CTk):
                 if key:
                     updated_tab[key] = self.parse_value(value)
             updated_config[tab_name] = updated_tab
+        return updated_config
+
+    def check_config(self, updated_config, on_checked):
+        """
+        Проверка настроек по заголовкам таблиц опросных листов выбранного каталога
+        (или каталога по умолчанию) — без чтения данных — в отдельном потоке.
+        Итог передаётся в on_checked из потока окна (poll_config_check).
+        """
+        if self.check_thread is not None and self.check_thread.is_alive():
+            return
+        folder = (self.input_folder.get() or os.environ.get("INPUT_FOLDER")
+                  or config.ROOT / "Обрабатываемые")
+        self.check_results = queue.Queue()
+        self.check_btn.configure(state="disabled")
+        self.save_btn.configure(state="disabled")
+        self.success_label.configure(text="Проверка настроек...", text_color="gray")
+        self.check_thread = threading.Thread(
+            target=self.check_in_background,
+            args=(folder, updated_config, self.check_results), daemon=True)
+        self.check_thread.start()
+        self.after(POLL_INTERVAL_MS, self.poll_config_check, self.settings_window, on_checked)
+
+    def check_in_background(self, folder, updated_config, results):
+        """Поток проверки настроек: итог передаётся окну через очередь, как и события запуска."""
+        # pandas нужен только проверке: окно без неё запускается быстрее
+        from config_check import check_config
+
+        try:
+            results.put(("done", check_config(folder, updated_config)))
+        except Exception as e:
+            results.put(("error", f"{type(e).__name__}: {e}"))
+
+    def poll_config_check(self, window, on_checked):
+        try:
+            kind, payload = self.check_results.get_nowait()
+        except queue.Empty:
+            self.after(POLL_INTERVAL_MS, self.poll_config_check, window, on_checked)
+            return
+        # Окно настроек закрыли, пока шла проверка, — показывать итог некуда
+        if window is not self.settings_window:
+            return
+        self.check_btn.configure(state="normal")
+        self.save_btn.configure(state="normal")
+        self.success_label.configure(text="")
+        if kind == "error":
+            messagebox.showerror(
+                "Ошибка", f"Проверка настроек завершилась с ошибкой:\n{payload}",
+                parent=self.settings_window)
+            return
+        on_checked(payload)
+
+    def show_config_check(self):
+        self.check_config(self.collect_config(), self.show_check_result)
+
+    def show_check_result(self, check):
+        window = ctk.CTkToplevel(self.settings_window)
+        window.title("Проверка настроек")
+        window.geometry("750x450")
+        window.transient(self.settings_window)
+        window.attributes("-topmost", True)
+        textbox = ctk.CTkTextbox(window, wrap="word")
+        textbox.pack(padx=10, pady=10, fill="both", expand=True)
+        textbox.insert("1.0", check.format())
+        textbox.configure(state="disabled")
+
+    def save_config(self):
+        updated_config = self.collect_config()
+
+        # Ошибки в настройках — частая причина упавшего запуска: проверяем до сохранения
+        self.check_config(updated_config, lambda check: self.save_checked_config(updated_config, check))
+
+    def save_checked_config(self, updated_config, check):
+        if check.errors:
+            issues = [str(issue) for issue in check.issues]
+            if len(issues) > MAX_SHOWN_ISSUES:
+                issues = issues[:MAX_SHOWN_ISSUES] + [f"... и ещё {len(issues) - MAX_SHOWN_ISSUES}"]
+            if not messagebox.askyesno(
+                    "Проверка настроек",
+                    "\n".join(issues) + "\n\nС такими настройками обработка завершится ошибкой. "
+                                       "Всё равно сохранить?",
+                    parent=self.settings_window):
+                self.success_label.configure(text="Не сохранено: ошибки в настройках",
+                                             text_color="red")
+                return
 
         with open("config.json", "w", encoding="utf-8") as f:
             json.dump(updated_config, f, ensure_ascii=False, indent=4)
 
-        self.success_label.configure(text="Изменения сохранены!")
+        if check.warnings:
+            self.success_label.configure(
+                text=f"Изменения сохранены, предупреждений: {len(check.warnings)} (см. «Проверить»)",
+                text_color="orange")
+        else:
+            self.success_label.configure(text="Изменения сохранены!", text_color="green")
 
     def parse_value(self, value):
         try:
             return json.loads(value)
         except:
+            # Словари и списки во вкладках показаны через str() — в кавычках Python
+            if value.strip()[:1] in ("{", "["):
+                try:
+                    return ast.literal_eval(value)
+                except (ValueError, SyntaxError):
+                    pass
             return value
 
     def on_close_settings(self):
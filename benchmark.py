@@ -0,0 +1,851 @@
+"""
+Замеры производительности этапов обработки.
+
+Запуск:
+    python benchmark.py load [--folder PATH] [--repeat N]
+    python benchmark.py merge [--rows N] [--columns N] [--seed N]
+    python benchmark.py replace [--rows N] [--rules N] [--repeat N]
+    python benchmark.py combine [--rows N] [--repeat N]
+    python benchmark.py write [--rows N [N ...]] [--columns N]
+    python benchmark.py incremental [--folder PATH]
+    python benchmark.py dtypes [--rows N]
+    python benchmark.py permissions [--rows N] [--rights N] [--repeat N]
+    python benchmark.py startup [--folder PATH] [--repeat N] [--excel all|final|none]
+    python benchmark.py watch [--folder PATH] [--quiet SECONDS]
+    python benchmark.py identity [--rows N [N ...]] [--variant-rate X]
+    python benchmark.py engines [--rows N [N ...]] [--repeat N]
+    python benchmark.py sqlite [--rows N] [--change-rate X] [--lookups N]
+    python benchmark.py suite [--rows N] [--columns N] [--duplicate-rate X] [--plus-share X]
+                              [--repeat N] [--output PATH] [--compare PATH] [--threshold X]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from config_manager import config
+import functions
+from questionnaire_generator import SURNAMES, GeneratorOptions, generate, translit
+from tests.helpers import (apply_replacements_pairwise, combine_columns_apply, engine_differences,
+                           engine_tables, input_changes, input_files, mixed_permission_frame,
+                           pandas_chain, permission_frame, polars_chain, random_frame, rights_frame,
+                           rules_workload, smart_merge_iterrows)
+
+# Каталог результатов `benchmark.py suite` по умолчанию
+SUITE_FOLDER = config.ROOT / "log" / "benchmarks"
+
+
+def _timeit(func, repeat: int):
+    """Возвращает лучший результат из repeat запусков и сам результат последнего вызова."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def bench_load(folder: Path, repeat: int) -> None:
+    """Сравнивает потоковое чтение таблиц с полной загрузкой книги openpyxl."""
+    for path in input_files(folder):
+        timings = {}
+        results = {}
+        for engine in functions.TABLE_READERS:
+            def run():
+                functions._workbook_cache.clear()
+                return functions.TABLE_READERS[engine](path)
+            timings[engine], results[engine] = _timeit(run, repeat)
+
+        # Оба способа обязаны давать одинаковые таблицы
+        reference = results["openpyxl"]
+        for engine, tables in results.items():
+            assert list(tables) == list(reference), f"{path.name}: {engine}"
+            for name, df in tables.items():
+                assert_frame_equal(df, reference[name])
+
+        line = ", ".join(f"{engine}: {t * 1000:.1f} мс" for engine, t in timings.items())
+        print(f"{path.name} ({len(reference)} табл.): {line}")
+
+
+def bench_merge(rows: int, columns: int, seed: int) -> None:
+    """Замеряет smart_merge против построчной реализации (совпадение проверяет tests/test_functions.py)."""
+    df = random_frame(rows, columns, seed)
+    legacy, _ = _timeit(lambda: smart_merge_iterrows(df, config.RENAME_MAP), 1)
+    vectorized, _ = _timeit(lambda: functions.smart_merge(df, config.RENAME_MAP), 3)
+    print(f"smart_merge {rows}x{columns + 2}: построчно {legacy * 1000:.1f} мс, "
+          f"groupby().first() {vectorized * 1000:.1f} мс ({legacy / vectorized:.0f}x)")
+
+
+def bench_replace(rows: int, rules: int, repeat: int) -> None:
+    """
+    Замеряет apply_replacements против попарных replace: на словарях config.json
+    (одна пара на столбец) и на словаре с rules парами на столбец, где попарный
+    replace проходит столбец rules раз. Совпадение проверяет tests/test_functions.py.
+    """
+    workloads = [
+        ("config.json", permission_frame(rows, seed=0), (config.REPLACE_ENERGYMAIN, config.REPLACE_ACCESS)),
+    ]
+    if rules > 1:
+        df, replace_dict = rules_workload(rows, rules, seed=0)
+        workloads.append((f"{rules} пар на столбец", df, (replace_dict,)))
+
+    for title, df, dicts in workloads:
+        pairwise, _ = _timeit(lambda: apply_replacements_pairwise(df.copy(), *dicts), repeat)
+        planned, _ = _timeit(lambda: functions.apply_replacements(df.copy(), *dicts), repeat)
+        print(f"apply_replacements {rows} строк, {title}: попарно {pairwise * 1000:.1f} мс, "
+              f"по плану {planned * 1000:.1f} мс ({pairwise / planned:.1f}x)")
+
+
+def bench_combine(rows: int, repeat: int) -> None:
+    """Замеряет объединение столбцов против построчной реализации (совпадение проверяет tests/test_functions.py)."""
+    keys = ["REPLACE_ENERGYMAIN", "REPLACE_ACCESS"]
+    df = mixed_permission_frame(rows, seed=0)
+
+    def legacy():
+        result = df.copy()
+        for key in keys:
+            result = combine_columns_apply(result, key, drop=True)
+        return result
+
+    def vectorized():
+        return functions.combine_columns_by_replace_keys(df.copy(), keys, config, drop=True)
+
+    legacy_time, _ = _timeit(legacy, repeat)
+    vectorized_time, _ = _timeit(vectorized, repeat)
+    print(f"combine_columns {rows} строк: DataFrame.apply {legacy_time * 1000:.1f} мс, "
+          f"по столбцам {vectorized_time * 1000:.1f} мс")
+
+
+def bench_write(rows_list: list[int], columns: int) -> None:
+    """
+    Сравнивает способы записи в Excel по времени и пиковой памяти Python
+    и проверяет, что записанные данные читаются обратно одинаково.
+    """
+    import tempfile
+    import tracemalloc
+    from excel_writer import EXCEL_WRITERS, xlsxwriter
+
+    engines = [name for name in EXCEL_WRITERS if name != "xlsxwriter" or xlsxwriter is not None]
+    with tempfile.TemporaryDirectory() as folder:
+        for rows in rows_list:
+            df = random_frame(rows, columns, seed=0)
+            line = []
+            paths = {}
+            for engine in engines:
+                paths[engine] = str(Path(folder) / f"{engine}_{rows}.xlsx")
+                elapsed, _ = _timeit(lambda: EXCEL_WRITERS[engine](df, paths[engine]), 1)
+                result = f"{engine}: {elapsed:.2f} с"
+                # tracemalloc сильно замедляет запись, поэтому память меряем отдельным запуском
+                if rows <= 100_000:
+                    tracemalloc.start()
+                    EXCEL_WRITERS[engine](df, paths[engine])
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                    result += f", пик {peak / 2 ** 20:.0f} МБ"
+                line.append(result)
+            print(f"{rows} строк x {columns + 2}: " + "; ".join(line))
+
+            # Проверку содержимого делаем только на небольших объёмах — чтение тоже дорогое
+            if rows <= 10_000:
+                reference = pd.read_excel(paths["pandas"])
+                for engine in engines:
+                    assert_frame_equal(pd.read_excel(paths[engine]), reference)
+
+
+@contextmanager
+def _main_folders(folder: Path):
+    """
+    Служебные каталоги main (кэш, контрольные точки, состояние инкрементальной обработки,
+    логи) на время замера — внутри folder: замеры не трогают каталоги репозитория.
+    """
+    import main
+
+    names = ("CACHE_FOLDER", "CHECKPOINT_FOLDER", "INCREMENTAL_FOLDER", "LOG_FOLDER")
+    saved = {name: getattr(main, name) for name in names}
+    for name in names:
+        setattr(main, name, folder / name.removesuffix("_FOLDER").lower())
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(main, name, value)
+
+
+def bench_incremental(folder: Path) -> None:
+    """
+    Замеряет инкрементальный запуск против полной сборки после изменения, добавления
+    и удаления опросных листов. Совпадение выгрузок проверяет tests/test_incremental.py.
+    """
+    import main
+    from instrumentation import RunReport
+
+    steps = [
+        ("первый запуск", None),
+        ("без изменений", lambda inputs: None),
+        *input_changes(),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp, _main_folders(Path(tmp)):
+        tmp = Path(tmp)
+        inputs = tmp / "Обрабатываемые"
+        os.makedirs(inputs)
+        for path in input_files(folder):
+            shutil.copy(path, inputs / path.name)
+
+        main.INPUT_FOLDER = inputs
+
+        def run(argv):
+            exports = {}
+            start = time.perf_counter()
+            main.run_stages(main.parse_args(argv), RunReport(),
+                            lambda name, df: exports.__setitem__(name, df))
+            return time.perf_counter() - start, exports
+
+        for title, mutate in steps:
+            if mutate is not None:
+                mutate(inputs)
+            incremental_time, _ = run(["--incremental"])
+            full_time, _ = run([])
+            print(f"{title:<16} инкрементально {incremental_time:.3f} с, "
+                  f"полная сборка {full_time:.3f} с")
+
+
+def _questionnaire_frame(rows: int, seed: int) -> pd.DataFrame:
+    """
+    Объединённая таблица в духе итоговой: повторяющиеся строки (организации, должности,
+    права '+'), даты и номера в столбцах object. Строится из списков, как при чтении таблиц.
+    """
+    rng = np.random.default_rng(seed)
+    person = rng.integers(0, max(1, rows * 2 // 3), rows)
+    data = {
+        "№": [int(i) if i % 10 else None for i in range(rows)],
+        "Организация": [f"Филиал {i}" for i in rng.integers(0, 12, rows)],
+        "Подразделение": [f"Цех {i}" for i in rng.integers(0, 80, rows)],
+        "ФИО": [f"Сотрудник {i}" for i in person],
+        "УЗ": [f"user{i}" for i in person],
+        "Должность": [f"Должность {i}" for i in rng.integers(0, 150, rows)],
+        "Дата заявки": [datetime(2024, 1 + i % 12, 1 + i % 28) if i % 3 else None
+                        for i in rng.integers(0, 365, rows)],
+    }
+    pool = ["+", None, None]
+    for column in {**config.REPLACE_ENERGYMAIN, **config.REPLACE_ACCESS}:
+        data[column] = [pool[i] for i in rng.integers(0, len(pool), rows)]
+    return pd.DataFrame(data)
+
+
+def bench_dtypes(rows: int) -> None:
+    """Память таблицы по этапам без compact_dtypes и с ним; выгружаемые значения должны совпасть."""
+    from excel_writer import _iter_rows
+
+    replace_keys = ["REPLACE_ENERGYMAIN", "REPLACE_ACCESS"]
+    stages = [
+        ("replace", lambda df: functions.apply_replacements(
+            df, config.REPLACE_ENERGYMAIN, config.REPLACE_ACCESS)),
+        ("merge", lambda df: functions.smart_merge(df, config.RENAME_MAP)),
+        ("combine_columns", lambda df: functions.combine_columns_by_replace_keys(
+            df.copy(deep=False), replace_keys, config)),
+    ]
+
+    def run(compact: bool, trace: bool):
+        """Прогон этапов; возвращает итог и замеры: память таблицы, пик tracemalloc, время."""
+        df = _questionnaire_frame(rows, seed=0)
+        measures = [("load", df.memory_usage(deep=True).sum(), None, None)]
+        pipeline = stages
+        if compact:
+            pipeline = [("compact", lambda df: functions.compact_dtypes(df, config.DTYPES))] + stages
+        for name, stage in pipeline:
+            if trace:
+                tracemalloc.start()
+            start = time.perf_counter()
+            df = stage(df)
+            elapsed = time.perf_counter() - start
+            peak = None
+            if trace:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            measures.append((name, df.memory_usage(deep=True).sum(), peak, elapsed))
+        return df, measures
+
+    results = {}
+    for compact in (False, True):
+        # Время — без tracemalloc, он заметно замедляет работу с объектами Python
+        df, timed = run(compact, trace=False)
+        _, traced = run(compact, trace=True)
+        line = []
+        for (name, size, _, elapsed), (_, _, peak, _) in zip(timed, traced):
+            extra = "" if elapsed is None else f" (пик {peak / 2 ** 20:.1f} МБ, {elapsed:.3f} с)"
+            line.append(f"{name} {size / 2 ** 20:.2f} МБ{extra}")
+        results[compact] = df
+        print(f"{'compact' if compact else 'как есть':<9}", " | ".join(line))
+
+    assert list(_iter_rows(results[False])) == list(_iter_rows(results[True]))
+    print("Выгружаемые значения совпадают. Типы с compact_dtypes:")
+    print(results[True].dtypes.astype(str).value_counts().to_string())
+
+
+def bench_permissions(rows: int, rights: int, repeat: int) -> None:
+    """
+    smart_merge и объединение столбцов прав: битовая матрица против столбцов по отдельности
+    (совпадение проверяет tests/test_permissions.py).
+    """
+    df, bench_config = rights_frame(rows, rights, seed=0)
+    for flags_as_bits in (False, True):
+        merge_time, merged = _timeit(lambda: functions.smart_merge(
+            df, {}, flags_as_bits=flags_as_bits), repeat)
+        combine_time, _ = _timeit(lambda: functions.combine_columns_by_replace_keys(
+            merged.copy(deep=False), ["REPLACE_RIGHTS"], bench_config,
+            flags_as_bits=flags_as_bits), repeat)
+        label = "битовая матрица" if flags_as_bits else "по столбцам"
+        print(f"{label:<16} smart_merge {merge_time * 1000:8.1f} мс, "
+              f"объединение столбцов {combine_time * 1000:8.1f} мс")
+    print(f"{rows} строк ({len(merged)} после smart_merge), {rights} прав")
+
+
+def bench_startup(folder: Path, repeat: int, excel: str) -> None:
+    """
+    Холодный запуск (новый процесс `python main.py`, как раньше запускал UI) против
+    запусков в постоянном процессе PipelineWorker, где pandas и настройки уже загружены.
+    """
+    from pipeline import PipelineWorker
+
+    root = Path(__file__).parent
+    with tempfile.TemporaryDirectory() as tmp:
+        options = ["--input-folder", str(folder), "--output-folder", tmp,
+                   "--excel", excel]
+
+        def cold():
+            subprocess.run([sys.executable, "main.py", *options], cwd=root, check=True,
+                           stdout=subprocess.DEVNULL)
+
+        def import_only():
+            subprocess.run([sys.executable, "-c", "import main"], cwd=root, check=True)
+
+        # Первый запуск заполняет кэш разобранных таблиц и в замеры не входит
+        cold()
+        import_time, _ = _timeit(import_only, repeat)
+        cold_time, _ = _timeit(cold, repeat)
+
+        with PipelineWorker() as worker:
+            start = time.perf_counter()
+            worker.wait_ready()
+            ready_time = time.perf_counter() - start
+            warm_time, _ = _timeit(lambda: worker.run(
+                folder, tmp, excel=excel), repeat)
+
+    print(f"импорт обработки в новом процессе {import_time:.3f} с")
+    print(f"холодный запуск python main.py    {cold_time:.3f} с")
+    print(f"старт PipelineWorker (один раз)   {ready_time:.3f} с")
+    print(f"запуск в PipelineWorker           {warm_time:.3f} с "
+          f"({cold_time / warm_time:.1f}x быстрее холодного)")
+
+
+def bench_watch(folder: Path, quiet: float) -> None:
+    """
+    Служба наблюдения за каталогом (watch_service): задержка от изменения опросных листов
+    до готового итогового файла против полного запуска `python main.py`.
+    Итоговые файлы службы и полного запуска должны совпадать.
+    """
+    import main
+    from watch_service import WatchService
+
+    root = Path(__file__).parent
+    with tempfile.TemporaryDirectory() as tmp, _main_folders(Path(tmp)):
+        tmp = Path(tmp)
+        inputs = tmp / "Обрабатываемые"
+        os.makedirs(inputs)
+        for path in input_files(folder):
+            shutil.copy(path, inputs / path.name)
+
+        service = WatchService(
+            main.parse_args(["--input-folder", str(inputs), "--output-folder", str(tmp / "service"),
+                             "--excel", "final"]),
+            status_file=tmp / "status.json", quiet=quiet)
+        try:
+            service.run_once()
+            for title, change in input_changes():
+                change(inputs)
+                start = time.monotonic()
+                run = service.run_once(service.wait_for_batch(idle_timeout=30))
+                latency = time.monotonic() - start
+
+                full_start = time.perf_counter()
+                subprocess.run([sys.executable, "main.py", "--input-folder", str(inputs),
+                                "--output-folder", str(tmp / "full"), "--excel", "final",
+                                "--no-cache"],
+                               cwd=root, check=True, stdout=subprocess.DEVNULL)
+                full_time = time.perf_counter() - full_start
+
+                name = f"{main.FINAL_EXPORT}.xlsx"
+                assert_frame_equal(pd.read_excel(tmp / "service" / name),
+                                   pd.read_excel(tmp / "full" / name), obj=title)
+                print(f"{title:<16} служба: задержка {latency:.2f} с (ожидание тишины {quiet} с, "
+                      f"обработка {run['duration']:.2f} с), полный запуск {full_time:.2f} с, "
+                      f"итог совпадает")
+        finally:
+            service.close()
+        with open(tmp / "status.json", encoding="utf-8") as f:
+            status = json.load(f)
+        print(f"файл состояния: {status['state']}, режим {status['mode']}, запусков {status['runs']}, "
+              f"очередь {status['queue_depth']}, задержка последнего {status['last_run']['latency']} с")
+
+
+FIRST_NAMES = ["Иван", "Пётр", "Алексей", "Сергей", "Андрей", "Дмитрий", "Михаил", "Николай",
+               "Ольга", "Елена", "Анна", "Наталья", "Татьяна", "Светлана", "Юрий", "Артём"]
+PATRONYMICS = ["Иванович", "Петрович", "Алексеевич", "Сергеевич", "Андреевич", "Дмитриевич",
+               "Михайлович", "Николаевич", "Семёнович", "Фёдорович", "Юрьевич", "Олегович"]
+
+
+def _identity_frame(rows: int, variant_rate: float, seed: int) -> tuple[pd.DataFrame, np.ndarray]:
+    """
+    Строки сотрудников с разным написанием ФИО/УЗ: регистр, пробелы, ё/е, домен, инициалы,
+    пустой УЗ, опечатка в фамилии. Возвращает таблицу и номер сотрудника для каждой строки.
+    """
+    rng = np.random.default_rng(seed)
+    n_people = max(1, rows // 3)
+    people = []
+    logins = set()
+    for i in range(n_people):
+        surname = SURNAMES[rng.integers(len(SURNAMES))]
+        first = FIRST_NAMES[rng.integers(len(FIRST_NAMES))]
+        middle = PATRONYMICS[rng.integers(len(PATRONYMICS))]
+        login = translit(surname + first[0] + middle[0]).lower().replace("ё", "e")
+        # Однофамильцы с одинаковыми инициалами получают УЗ с номером
+        if login in logins:
+            login = f"{login}{i}"
+        logins.add(login)
+        people.append((f"{surname} {first} {middle}", login, surname, first, middle))
+
+    person = rng.integers(0, n_people, rows)
+    variant = np.where(rng.random(rows) < variant_rate, rng.integers(0, 7, rows), -1)
+    fio, login = [], []
+    for p, v in zip(person, variant):
+        name, account, surname, first, middle = people[p]
+        if v == 0:
+            name = name.upper()
+        elif v == 1:
+            name = "  " + name.replace(" ", "   ")
+        elif v == 2:
+            name = name.replace("ё", "е").replace("Ё", "Е")
+        elif v == 3:
+            account = f"CORP\\{account}"
+        elif v == 4:
+            name = f"{surname} {first[0]}.{middle[0]}."
+        elif v == 5:
+            account = None
+        elif v == 6:
+            position = 1 + rng.integers(len(surname) - 1)
+            name = f"{surname[:position]}{'оаеи'[rng.integers(4)]}{surname[position + 1:]} {first} {middle}"
+        fio.append(name)
+        login.append(account)
+    df = pd.DataFrame({"ФИО": fio, "УЗ": login,
+                       "Право": np.where(rng.random(rows) < 0.3, "+", None)})
+    return df, person
+
+
+def bench_identity(rows_list: list[int], variant_rate: float) -> None:
+    """
+    Сопоставление сотрудников (identity.resolve_identities): время на разных объёмах
+    (рост должен быть почти линейным) и качество — сколько групп smart_merge после
+    сопоставления смешивают разных сотрудников и сколько сотрудников остались разбитыми.
+    """
+    from identity import IdentityRules, resolve_identities
+
+    rules = IdentityRules(enabled=True)
+    previous = None
+    for rows in rows_list:
+        df, person = _identity_frame(rows, variant_rate, seed=rows)
+        start = time.perf_counter()
+        resolved, report = resolve_identities(df, rules)
+        elapsed = time.perf_counter() - start
+
+        groups = pd.DataFrame({"key": list(zip(resolved["ФИО"], resolved["УЗ"])), "person": person})
+        groups = groups[resolved[["ФИО", "УЗ"]].notna().all(axis=1).to_numpy()]
+        mixed = int((groups.groupby("key")["person"].nunique() > 1).sum())
+        split = int((groups.groupby("person")["key"].nunique() > 1).sum())
+        exact = df[["ФИО", "УЗ"]].dropna().drop_duplicates().shape[0]
+        merged = groups["key"].nunique()
+        scale = f", {elapsed / previous[1] / (rows / previous[0]):.2f} от линейного" if previous else ""
+        print(f"{rows:>8} строк: {elapsed:6.2f} с ({elapsed / rows * 1e6:.1f} мкс/строку{scale}); "
+              f"групп {exact} -> {merged} при {len(set(person))} сотрудниках; "
+              f"смешано групп {mixed}, разбито сотрудников {split}, "
+              f"на проверку {int((report['Действие'] == 'проверить').sum())}")
+        previous = (rows, elapsed)
+
+
+def bench_engines(rows_list: list[int], repeat: int) -> None:
+    """
+    Движки pandas и polars на таблицах engine_tables: время от склейки таблиц до объединения
+    столбцов (для polars — вместе с переводом результата в pandas). Совпадение результатов
+    проверяет tests/test_polars_engine.py.
+    """
+    for rows in rows_list:
+        tables = engine_tables(rows, seed=rows)
+        timings = {}
+        results = {}
+        for engine, chain in (("pandas", pandas_chain), ("polars", polars_chain)):
+            timings[engine], results[engine] = _timeit(lambda: chain(tables), repeat)
+        print(f"{rows:>9} строк -> {len(results['pandas'])}: pandas {timings['pandas']:.2f} с, "
+              f"polars {timings['polars']:.2f} с (x{timings['pandas'] / timings['polars']:.1f})")
+        del tables, results
+
+
+def bench_sqlite(rows: int, change_rate: float, lookups: int) -> None:
+    """
+    Выгрузка итога в SQLite (sqlite_store): первая запись, повторная запись без изменений
+    и с долей change_rate изменённых, новых и удалённых строк; проверка содержимого базы;
+    время поиска по 'ФИО' и 'УЗ' против чтения итогового файла Excel.
+    """
+    import sqlite3
+    from sqlite_store import export_to_sqlite, lookup
+
+    final = pandas_chain(engine_tables(rows, seed=0))
+    final = final.drop(columns=[column for column in {**config.REPLACE_ENERGYMAIN, **config.REPLACE_ACCESS}
+                                if column in final.columns]).reset_index(drop=True)
+    rng = np.random.default_rng(0)
+    # Новое значение не из категорий compact_dtypes — столбец переводится в строки
+    changed = final.astype({"Должность": "str"})
+    positions = rng.choice(len(final), max(1, int(len(final) * change_rate)), replace=False)
+    third = len(positions) // 3
+    changed.loc[positions[:third], "Должность"] = "Новая должность"
+    # Новые сотрудники вместо удалённых
+    changed.loc[positions[third:2 * third], "УЗ"] = [f"new{i}" for i in range(2 * third - third)]
+    changed = changed.drop(index=positions[2 * third:]).reset_index(drop=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "итог.sqlite"
+        for title, df in (("первая запись", final), ("без изменений", final),
+                          (f"изменено {change_rate:.0%}", changed)):
+            elapsed, stats = _timeit(lambda: export_to_sqlite(df, path), 1)
+            print(f"{title:<16} {elapsed:7.3f} с: " + ", ".join(f"{k} {v}" for k, v in stats.items()))
+
+        with sqlite3.connect(path) as conn:
+            stored = pd.read_sql('SELECT * FROM "итог"', conn).drop(columns="_hash")
+        expected = changed.sort_values(functions.MERGE_KEYS).reset_index(drop=True)
+        stored = stored.sort_values(functions.MERGE_KEYS).reset_index(drop=True)
+        problems = engine_differences(expected, stored)
+        print("содержимое базы: " + ("совпадает с таблицей" if not problems else "; ".join(problems)))
+
+        keys = changed[["ФИО", "УЗ"]].sample(min(lookups, len(changed)), random_state=0).to_numpy()
+        for column, values in (("ФИО", keys[:, 0]), ("УЗ", keys[:, 1])):
+            start = time.perf_counter()
+            for value in values:
+                lookup(path, **({"fio": value} if column == "ФИО" else {"login": value}))
+            print(f"поиск по {column}: {(time.perf_counter() - start) / len(values) * 1000:.2f} мс")
+
+        excel_path = Path(tmp) / "итог.xlsx"
+        functions.save_dataframe_to_excel(changed, str(excel_path))
+        elapsed, _ = _timeit(lambda: pd.read_excel(excel_path), 1)
+        print(f"чтение итогового Excel ({excel_path.stat().st_size / 2 ** 20:.1f} МБ): {elapsed:.2f} с")
+
+
+def _measure(func, repeat: int, setup=None) -> tuple[dict, object]:
+    """
+    Времена repeat запусков (с) и сводка по ним; возвращает и результат последнего вызова.
+    setup() перед каждым запуском готовит аргументы func (например, копию изменяемой таблицы)
+    и в замер не входит.
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    stats = {"min": min(times), "median": statistics.median(times), "mean": statistics.mean(times),
+             "stddev": statistics.stdev(times) if len(times) > 1 else 0.0, "rounds": len(times),
+             "times": times}
+    return stats, result
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=config.ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _machine_info() -> dict:
+    import openpyxl
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count(),
+            "numpy": np.__version__, "pandas": pd.__version__, "openpyxl": openpyxl.__version__}
+
+
+def suite_case_names() -> list[str]:
+    """Имена замеров suite_cases в том же порядке."""
+    import main
+    return ["load_named_table", "combine_dataframes", "apply_replacements", "smart_merge",
+            *(f"combine_columns_by_replace_key[{key}]" for key in main.COMBINE_KEYS),
+            "save_dataframe_to_excel", "full_run"]
+
+
+def suite_cases(folder: Path, output: Path) -> list[tuple[str, object, object]]:
+    """
+    Замеры набора suite на опросных листах каталога folder, в порядке этапов обработки:
+    (имя замера, функция, setup или None). Каждый этап получает результат предыдущего,
+    посчитанный один раз заранее, чтобы замеры не зависели друг от друга.
+
+    apply_replacements меняет таблицу на месте, поэтому каждый запуск получает свою копию
+    из setup — иначе со второго запуска замерялась бы замена в уже заменённых данных.
+    """
+    import main
+
+    files = functions.discover_input_files(folder, config.MODULES)
+    module_key, module_files = next((key, files) for key, files in files.items() if files)
+    first_file, first_tables = next(iter(module_files.items()))
+
+    module_dfs = {
+        key: [functions.load_named_table(str(path), name)
+              for path, names in paths.items() for name in names]
+        for key, paths in files.items() if paths}
+    combined = pd.concat([
+        functions.combine_dataframes(dfs, config.MODULES[key]["columns_to_remove"], config.RENAME_MAP)
+        for key, dfs in module_dfs.items()], ignore_index=True)
+    combined = functions.compact_dtypes(combined, config.DTYPES)
+    replaced = functions.apply_replacements(
+        combined.copy(), config.REPLACE_ENERGYMAIN, config.REPLACE_ACCESS)
+    merged = functions.smart_merge(replaced, config.RENAME_MAP)
+    final = functions.combine_columns_by_replace_keys(
+        merged.copy(deep=False), main.COMBINE_KEYS, config)
+
+    def full_run():
+        # Контрольные точки и логи полного запуска — рядом с выгрузками, а не в репозитории
+        with _main_folders(output / "main"):
+            return main.run(folder, output, no_cache=True)
+
+    return [
+        ("load_named_table", lambda: functions.load_named_table(str(first_file), first_tables[0]), None),
+        ("combine_dataframes", lambda: functions.combine_dataframes(
+            module_dfs[module_key], config.MODULES[module_key]["columns_to_remove"],
+            config.RENAME_MAP), None),
+        ("apply_replacements", lambda df: functions.apply_replacements(
+            df, config.REPLACE_ENERGYMAIN, config.REPLACE_ACCESS), lambda: (combined.copy(),)),
+        ("smart_merge", lambda: functions.smart_merge(replaced, config.RENAME_MAP), None),
+        *((f"combine_columns_by_replace_key[{key}]",
+           lambda df, key=key: functions.combine_columns_by_replace_key(df, key, config),
+           lambda: (merged.copy(deep=False),))
+          for key in main.COMBINE_KEYS),
+        ("save_dataframe_to_excel", lambda: functions.save_dataframe_to_excel(
+            final, str(output / "итог.xlsx")), None),
+        ("full_run", full_run, None),
+    ]
+
+
+def compare_results(current: dict, previous: dict, threshold: float) -> list[str]:
+    """
+    Сравнивает лучшие времена замеров с прошлыми результатами и печатает отношения.
+    Лучшее время меньше зависит от посторонней нагрузки на машину, чем медиана.
+    Возвращает замеры, ставшие медленнее больше чем на долю threshold.
+    """
+    before = {bench["name"]: bench for bench in previous["benchmarks"]}
+    if previous.get("params") != current["params"]:
+        print(f"Внимание: параметры прошлого замера другие: {previous.get('params')}")
+    regressions = []
+    print(f"Сравнение с {previous.get('commit') or '?'} от {previous.get('datetime')}:")
+    for bench in current["benchmarks"]:
+        old = before.get(bench["name"])
+        if old is None:
+            print(f"  {bench['name']:<50} нет в прошлых результатах")
+            continue
+        ratio = bench["min"] / old["min"]
+        regressed = ratio > 1 + threshold
+        if regressed:
+            regressions.append(bench["name"])
+        print(f"  {bench['name']:<50} {old['min'] * 1000:9.1f} -> {bench['min'] * 1000:9.1f} мс "
+              f"({ratio:.2f}x){'  ЗАМЕДЛЕНИЕ' if regressed else ''}")
+    return regressions
+
+
+def bench_suite(options: GeneratorOptions, repeat: int, output: Path | None,
+                compare: Path | None, threshold: float) -> int:
+    """
+    Набор замеров основных функций обработки и полного запуска на синтетических опросных
+    листах (questionnaire_generator) заданного масштаба. Результаты записываются в JSON,
+    чтобы сравнивать запуски между версиями; с compare — сравнение с прошлыми результатами.
+    Те же замеры под pytest-benchmark — tests/test_benchmarks.py.
+
+    Returns:
+        int: Код завершения: 1, если есть замедления больше threshold, иначе 0.
+    """
+    results = {
+        "datetime": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "machine_info": _machine_info(),
+        "params": {"rows": options.rows, "columns": options.columns,
+                   "duplicate_rate": options.duplicate_rate, "plus_share": options.plus_share,
+                   "files_per_module": options.files_per_module, "seed": options.seed},
+        "repeat": repeat,
+        "benchmarks": [],
+    }
+    # Прошлые результаты читаются до замеров: ошибка в пути не должна стоить целого прогона
+    previous = None
+    if compare is not None:
+        with open(compare, encoding="utf-8") as f:
+            previous = json.load(f)
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs, outputs = Path(tmp) / "in", Path(tmp) / "out"
+        outputs.mkdir()
+        generate(inputs, options)
+        for name, func, setup in suite_cases(inputs, outputs):
+            stats, _ = _measure(func, repeat, setup)
+            results["benchmarks"].append({"name": name, **stats})
+            print(f"{name:<50} медиана {stats['median'] * 1000:9.1f} мс, "
+                  f"лучший {stats['min'] * 1000:9.1f} мс")
+
+    if output is None:
+        os.makedirs(SUITE_FOLDER, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = SUITE_FOLDER / f"{stamp}_{results['commit'] or 'nogit'}.json"
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4, ensure_ascii=False)
+    print(f"Результаты: {output}")
+
+    if previous is None:
+        return 0
+    regressions = compare_results(results, previous, threshold)
+    if regressions:
+        print(f"Замедление больше {threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    load_parser = subparsers.add_parser("load", help="чтение именованных таблиц")
+    load_parser.add_argument("--folder", type=Path, default=config.ROOT / "Обрабатываемые")
+    load_parser.add_argument("--repeat", type=int, default=3)
+
+    merge_parser = subparsers.add_parser("merge", help="smart_merge")
+    merge_parser.add_argument("--rows", type=int, default=5000)
+    merge_parser.add_argument("--columns", type=int, default=20)
+    merge_parser.add_argument("--seed", type=int, default=0)
+
+    replace_parser = subparsers.add_parser("replace", help="apply_replacements")
+    replace_parser.add_argument("--rows", type=int, default=200_000)
+    replace_parser.add_argument("--rules", type=int, default=10)
+    replace_parser.add_argument("--repeat", type=int, default=3)
+
+    combine_parser = subparsers.add_parser("combine", help="combine_columns_by_replace_keys")
+    combine_parser.add_argument("--rows", type=int, default=100_000)
+    combine_parser.add_argument("--repeat", type=int, default=3)
+
+    write_parser = subparsers.add_parser("write", help="save_dataframe_to_excel")
+    write_parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    write_parser.add_argument("--columns", type=int, default=20)
+
+    incremental_parser = subparsers.add_parser(
+        "incremental", help="инкрементальный запуск против полной сборки")
+    incremental_parser.add_argument("--folder", type=Path, default=config.ROOT / "Обрабатываемые")
+
+    dtypes_parser = subparsers.add_parser("dtypes", help="compact_dtypes: память по этапам")
+    dtypes_parser.add_argument("--rows", type=int, default=200_000)
+
+    permissions_parser = subparsers.add_parser(
+        "permissions", help="битовая матрица прав в smart_merge и объединении столбцов")
+    permissions_parser.add_argument("--rows", type=int, default=50_000)
+    permissions_parser.add_argument("--rights", type=int, default=300)
+    permissions_parser.add_argument("--repeat", type=int, default=3)
+
+    startup_parser = subparsers.add_parser(
+        "startup", help="холодный запуск против постоянного процесса обработки")
+    startup_parser.add_argument("--folder", type=Path, default=config.ROOT / "Обрабатываемые")
+    startup_parser.add_argument("--repeat", type=int, default=5)
+    startup_parser.add_argument("--excel", choices=["all", "final", "none"], default="all")
+
+    watch_parser = subparsers.add_parser(
+        "watch", help="служба наблюдения за каталогом против полного запуска")
+    watch_parser.add_argument("--folder", type=Path, default=config.ROOT / "Обрабатываемые")
+    watch_parser.add_argument("--quiet", type=float, default=0.5)
+
+    identity_parser = subparsers.add_parser(
+        "identity", help="сопоставление сотрудников: время и качество")
+    identity_parser.add_argument("--rows", type=int, nargs="+", default=[50_000, 100_000, 200_000, 500_000])
+    identity_parser.add_argument("--variant-rate", type=float, default=0.2,
+                                 help="доля строк с другим написанием ФИО/УЗ")
+
+    engines_parser = subparsers.add_parser(
+        "engines", help="движки pandas и polars: время от склейки таблиц до объединения столбцов")
+    engines_parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000, 5_000_000])
+    engines_parser.add_argument("--repeat", type=int, default=1)
+
+    sqlite_parser = subparsers.add_parser(
+        "sqlite", help="выгрузка итога в SQLite: upsert, проверка содержимого, поиск")
+    sqlite_parser.add_argument("--rows", type=int, default=100_000)
+    sqlite_parser.add_argument("--change-rate", type=float, default=0.01,
+                               help="доля изменённых, новых и удалённых строк при повторной записи")
+    sqlite_parser.add_argument("--lookups", type=int, default=1000)
+
+    suite_parser = subparsers.add_parser(
+        "suite", help="набор замеров на синтетических опросных листах с результатами в JSON")
+    suite_parser.add_argument("--rows", type=int, default=2000, help="строк в каждой таблице")
+    suite_parser.add_argument("--columns", type=int, default=30, help="столбцов в каждой таблице")
+    suite_parser.add_argument("--duplicate-rate", type=float, default=0.3)
+    suite_parser.add_argument("--plus-share", type=float, default=0.3)
+    suite_parser.add_argument("--files-per-module", type=int, default=1)
+    suite_parser.add_argument("--seed", type=int, default=0)
+    suite_parser.add_argument("--repeat", type=int, default=5)
+    suite_parser.add_argument("--output", type=Path, default=None,
+                              help=f"файл результатов, по умолчанию в {SUITE_FOLDER}")
+    suite_parser.add_argument("--compare", type=Path, default=None,
+                              help="прошлые результаты для сравнения")
+    suite_parser.add_argument("--threshold", type=float, default=0.2,
+                              help="допустимое замедление лучшего времени, доля")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    if args.command == "load":
+        bench_load(args.folder, args.repeat)
+    elif args.command == "merge":
+        bench_merge(args.rows, args.columns, args.seed)
+    elif args.command == "replace":
+        bench_replace(args.rows, args.rules, args.repeat)
+    elif args.command == "combine":
+        bench_combine(args.rows, args.repeat)
+    elif args.command == "write":
+        bench_write(args.rows, args.columns)
+    elif args.command == "incremental":
+        bench_incremental(args.folder)
+    elif args.command == "dtypes":
+        bench_dtypes(args.rows)
+    elif args.command == "permissions":
+        bench_permissions(args.rows, args.rights, args.repeat)
+    elif args.command == "startup":
+        bench_startup(args.folder, args.repeat, args.excel)
+    elif args.command == "watch":
+        bench_watch(args.folder, args.quiet)
+    elif args.command == "identity":
+        bench_identity(args.rows, args.variant_rate)
+    elif args.command == "engines":
+        bench_engines(args.rows, args.repeat)
+    elif args.command == "sqlite":
+        bench_sqlite(args.rows, args.change_rate, args.lookups)
+    elif args.command == "suite":
+        sys.exit(bench_suite(
+            GeneratorOptions(rows=args.rows, columns=args.columns,
+                             duplicate_rate=args.duplicate_rate, plus_share=args.plus_share,
+                             files_per_module=args.files_per_module, seed=args.seed),
+            args.repeat, args.output, args.compare, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
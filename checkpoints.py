@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # необязательная зависимость
+    pa = None
+
+_ARROW_SUFFIX = ".arrow"
+_PICKLE_SUFFIX = ".pkl"
+# Описание данных контрольной точки (входные файлы, модули, настройки) рядом с ней
+_META_SUFFIX = ".json"
+# Виды значений столбца object (infer_dtype без пропусков), которые Arrow хранит без потерь
+_ARROW_OBJECT_KINDS = ("empty", "string")
+# Ключ метаданных файла Arrow: {позиция столбца object: пропуск в нём — "None" или "nan"}
+_OBJECT_COLUMNS_KEY = b"checkpoint_object_columns"
+
+
+class CheckpointMismatch(Exception):
+    """Контрольная точка получена из других входных данных или с другими настройками."""
+
+
+def _checkpoint_paths(folder: Path, stage: str) -> tuple[Path, Path]:
+    return folder / f"{stage}{_ARROW_SUFFIX}", folder / f"{stage}{_PICKLE_SUFFIX}"
+
+
+def _meta_path(folder: Path, stage: str) -> Path:
+    return folder / f"{stage}{_META_SUFFIX}"
+
+
+def _check_meta(folder: Path, stage: str, meta: dict) -> None:
+    """Сверяет описание сохранённой контрольной точки с описанием текущего запуска."""
+    path = _meta_path(folder, stage)
+    try:
+        with open(path, encoding="utf-8") as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        stored = None
+    except (OSError, ValueError) as e:
+        raise CheckpointMismatch(f"Описание контрольной точки '{stage}' не читается ({e}). "
+                                 f"Запустите обработку с начала.") from e
+    if stored is None:
+        raise CheckpointMismatch(f"У контрольной точки '{stage}' нет описания входных данных "
+                                 f"({path.name}). Запустите обработку с начала.")
+    expected = {"stage": stage, **meta}
+    changed = [key for key in expected if stored.get(key) != expected[key]]
+    if changed:
+        raise CheckpointMismatch(
+            f"Контрольная точка '{stage}' получена из других данных: отличаются {', '.join(changed)}. "
+            f"Запустите обработку с начала.")
+
+
+def _object_columns(df: pd.DataFrame) -> tuple[dict[str, str], list[str]]:
+    """
+    Столбцы типа object, которые Arrow сохраняет без потерь: только строки и/или пропуски.
+    Arrow читает их обратно как str с NaN или object с None, поэтому для каждого запоминается
+    вид пропуска, и load_checkpoint восстанавливает столбец типа object. Если в столбце
+    есть и None, и NaN (так бывает после concat модулей, в части которых столбца нет),
+    пропуски восстанавливаются как None — для обработки и выгрузки это один и тот же пропуск.
+
+    Returns:
+        tuple: {позиция столбца: "None" или "nan"} и имена столбцов, которые в Arrow не помещаются
+            (значения разных типов — Arrow привёл бы, например, целые с None к float с NaN).
+    """
+    restore, mixed = {}, []
+    for position, dtype in enumerate(df.dtypes):
+        if dtype != object:
+            continue
+        values = df.iloc[:, position].to_numpy()
+        if pd.api.types.infer_dtype(values, skipna=True) not in _ARROW_OBJECT_KINDS:
+            mixed.append(str(df.columns[position]))
+            continue
+        nulls = values[pd.isna(values)]
+        only_nan = len(nulls) and all(isinstance(value, float) for value in nulls)
+        restore[str(position)] = "nan" if only_nan else "None"
+    return restore, mixed
+
+
+def save_checkpoint(df: pd.DataFrame, folder, stage: str, meta: dict | None = None) -> Path:
+    """
+    Сохраняет результат этапа как контрольную точку.
+
+    Основной формат — файл Arrow IPC (Feather v2), который потом читается через memory map.
+    Столбцы object со строками и пустые столбцы сохраняются в Arrow (см. _object_columns).
+    Если pyarrow не установлен или таблицу нельзя без потерь представить в Arrow
+    (повторяющиеся имена столбцов, значения разных типов в одном столбце),
+    контрольная точка сохраняется через pickle.
+
+    Рядом сохраняется описание данных ({stage}.json): имя этапа и meta — например,
+    входные файлы, модули и отпечаток настроек; по нему load_checkpoint отказывается
+    загружать контрольную точку, полученную из других данных.
+
+    Args:
+        df: Результат этапа.
+        folder: Каталог контрольных точек.
+        stage: Имя этапа.
+        meta: Описание данных, из которых получен результат (значения, сериализуемые в JSON).
+
+    Returns:
+        Path: Путь к сохранённому файлу.
+    """
+    folder = Path(folder)
+    os.makedirs(folder, exist_ok=True)
+    arrow_path, pickle_path = _checkpoint_paths(folder, stage)
+    meta_path = _meta_path(folder, stage)
+    # Пока данные пишутся, старое описание не должно подходить к ним
+    meta_path.unlink(missing_ok=True)
+
+    path = None
+    restore, mixed = _object_columns(df) if pa is not None else ({}, [])
+    if pa is not None and mixed:
+        logging.info(f"Контрольная точка '{stage}': столбцы со значениями разных типов "
+                     f"({', '.join(mixed[:5])}), используется pickle")
+    elif pa is not None:
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=True)
+        except (pa.ArrowException, ValueError, TypeError) as e:
+            logging.info(f"Контрольная точка '{stage}' не помещается в Arrow ({e}), используется pickle")
+        else:
+            table = table.replace_schema_metadata(
+                {**table.schema.metadata, _OBJECT_COLUMNS_KEY: json.dumps(restore).encode()})
+            tmp = arrow_path.with_suffix(".tmp")
+            with pa.OSFile(str(tmp), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp, arrow_path)
+            path = arrow_path
+
+    if path is None:
+        tmp = pickle_path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, pickle_path)
+        path = pickle_path
+
+    # Удаляем контрольную точку этого этапа в другом формате, оставшуюся от прошлых запусков
+    for stale in _checkpoint_paths(folder, stage):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+
+    tmp = meta_path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"stage": stage, **(meta or {})}, f, ensure_ascii=False, indent=4)
+    os.replace(tmp, meta_path)
+
+    logging.info(f"Контрольная точка '{stage}' сохранена: {path}")
+    return path
+
+
+def load_checkpoint(folder, stage: str, meta: dict | None = None) -> pd.DataFrame:
+    """
+    Загружает контрольную точку этапа. Файл Arrow открывается через memory map,
+    без предварительного чтения в память, и преобразуется в DataFrame с split_blocks
+    и self_destruct: столбцы не склеиваются в общие блоки, а буферы Arrow освобождаются
+    по ходу преобразования, так что данные не лежат в памяти дважды. Числовые столбцы
+    без пропусков при этом ссылаются прямо на отображённый файл, остальные копируются.
+
+    Args:
+        folder: Каталог контрольных точек.
+        stage: Имя этапа.
+        meta: Описание данных текущего запуска, как у save_checkpoint; если задано,
+            контрольная точка загружается, только когда её описание с ним совпадает.
+
+    Raises:
+        FileNotFoundError: Если контрольной точки этапа нет.
+        CheckpointMismatch: Если описание контрольной точки не совпадает с meta или его нет.
+    """
+    arrow_path, pickle_path = _checkpoint_paths(Path(folder), stage)
+    if meta is not None and (arrow_path.exists() or pickle_path.exists()):
+        _check_meta(Path(folder), stage, meta)
+    if arrow_path.exists():
+        if pa is None:
+            raise RuntimeError(f"Для чтения {arrow_path} установите пакет pyarrow")
+        with pa.memory_map(str(arrow_path), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        restore = json.loads((table.schema.metadata or {}).get(_OBJECT_COLUMNS_KEY, b"{}"))
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        del table
+        for position, null in restore.items():
+            column = df.iloc[:, int(position)].astype(object)
+            column[column.isna()] = None if null == "None" else np.nan
+            df.isetitem(int(position), column)
+    elif pickle_path.exists():
+        with open(pickle_path, "rb") as f:
+            df = pickle.load(f)
+    else:
+        raise FileNotFoundError(
+            f"Нет контрольной точки этапа '{stage}' в {folder}. Запустите обработку с более раннего этапа.")
+
+    logging.info(f"Контрольная точка '{stage}' загружена: {df.shape[0]} строк, {df.shape[1]} столбцов")
+    return df
@@ -0,0 +1,277 @@
+import logging
+import time
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pandas as pd
+
+from functions import MERGE_KEYS, discover_input_files
+from identity import IdentityRules
+from schema import schemas
+from xlsx_tables import read_table_headers
+
+# Разделы config.json, без которых обработка не запускается
+REQUIRED_SECTIONS = ("RENAME_MAP", "REPLACE_ENERGYMAIN", "REPLACE_ACCESS", "MODULES")
+# Ключи config, столбцы которых объединяются (как main.COMBINE_KEYS)
+REPLACE_KEYS = ("REPLACE_ENERGYMAIN", "REPLACE_ACCESS")
+ERROR, WARNING = "error", "warning"
+LEVEL_TITLES = {ERROR: "Ошибка", WARNING: "Предупреждение"}
+
+
+@dataclass
+class Issue:
+    """Найденная проблема: ошибка (обработка упадёт) или предупреждение (результат будет не тем)."""
+    level: str
+    message: str
+    module: str | None = None
+    file: str | None = None
+
+    def __str__(self) -> str:
+        where = ", ".join(part for part in (self.module and f"модуль {self.module}", self.file) if part)
+        return f"{LEVEL_TITLES[self.level]}: {self.message}" + (f" ({where})" if where else "")
+
+
+@dataclass
+class TableCheck:
+    """
+    Таблица модуля в опросном листе.
+
+    Args:
+        module: Модуль MODULES.
+        file: Имя файла.
+        table: Имя таблицы из table_names.
+        sheet: Лист, на котором таблица найдена; None — таблицы в файле нет.
+        headers: Заголовки таблицы после нормализации.
+        columns: Столбцы таблицы после удаления columns_to_remove и переименования.
+        removed: Удаляемые столбцы, найденные в таблице.
+        collisions: Итоговые столбцы, в которые сводится несколько исходных.
+    """
+    module: str
+    file: str
+    table: str
+    sheet: str | None = None
+    headers: list = field(default_factory=list)
+    columns: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    collisions: dict = field(default_factory=dict)
+
+    @property
+    def found(self) -> bool:
+        return self.sheet is not None
+
+
+@dataclass
+class ConfigCheck:
+    """
+    Итог проверки настроек по заголовкам опросных листов.
+
+    Args:
+        input_folder: Каталог с опросными листами.
+        tables: Таблицы модулей по файлам.
+        modules: Предсказанные столбцы результата каждого модуля (Обработано_<модуль>).
+        columns: Предсказанные столбцы итогового файла.
+        issues: Ошибки и предупреждения.
+        file_times: Время проверки каждого файла, с.
+        seconds: Время всей проверки, с.
+    """
+    input_folder: Path
+    tables: list[TableCheck] = field(default_factory=list)
+    modules: dict[str, list] = field(default_factory=dict)
+    columns: list = field(default_factory=list)
+    issues: list[Issue] = field(default_factory=list)
+    file_times: dict[str, float] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    @property
+    def errors(self) -> list[Issue]:
+        return [issue for issue in self.issues if issue.level == ERROR]
+
+    @property
+    def warnings(self) -> list[Issue]:
+        return [issue for issue in self.issues if issue.level == WARNING]
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def format(self) -> str:
+        """Отчёт по модулям и файлам: найденные таблицы, столбцы результата, проблемы."""
+        lines = [f"Проверка настроек по заголовкам: {self.input_folder}"]
+        for module, columns in self.modules.items():
+            tables = [table for table in self.tables if table.module == module]
+            files = list(dict.fromkeys(table.file for table in tables))
+            lines.append(f"Модуль {module}: файлов {len(files)}")
+            for file in files:
+                lines.append(f"  {file} ({self.file_times.get(file, 0) * 1000:.0f} мс)")
+                for table in (table for table in tables if table.file == file):
+                    if not table.found:
+                        lines.append(f"    {table.table}: не найдена")
+                        continue
+                    line = f"    {table.table} (лист '{table.sheet}'): столбцов {len(table.headers)}"
+                    if table.removed:
+                        line += f", удаляются: {', '.join(table.removed)}"
+                    if table.collisions:
+                        line += ", сводятся: " + "; ".join(
+                            f"{', '.join(sources)} -> {target}" for target, sources in table.collisions.items())
+                    lines.append(line)
+            if columns:
+                lines.append(f"  Столбцы результата модуля: {', '.join(map(str, columns))}")
+        if self.columns:
+            lines.append(f"Столбцы итогового файла: {', '.join(map(str, self.columns))}")
+        lines.extend(str(issue) for issue in self.issues)
+        lines.append(f"Ошибок: {len(self.errors)}, предупреждений: {len(self.warnings)}, "
+                     f"время проверки {self.seconds:.2f} с")
+        return "\n".join(lines)
+
+
+def _structure_issues(raw: dict) -> list[Issue]:
+    """Разделы и формат значений config.json, без которых проверка по файлам не имеет смысла."""
+    issues = []
+    for section in REQUIRED_SECTIONS:
+        if not isinstance(raw.get(section), dict):
+            issues.append(Issue(ERROR, f"Раздел {section} отсутствует или не является словарём"))
+    if issues:
+        return issues
+
+    for module, module_config in raw["MODULES"].items():
+        if not isinstance(module_config, dict):
+            issues.append(Issue(ERROR, "Настройки модуля должны быть словарём с ключами "
+                                       "table_names и columns_to_remove", module))
+            continue
+        for key in ("table_names", "columns_to_remove"):
+            value = module_config.get(key)
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                issues.append(Issue(ERROR, f"{key} должен быть списком строк", module))
+        if isinstance(module_config.get("table_names"), list) and not module_config["table_names"]:
+            issues.append(Issue(WARNING, "Список table_names пуст", module))
+    for old, new in raw["RENAME_MAP"].items():
+        if not isinstance(new, str):
+            issues.append(Issue(ERROR, f"RENAME_MAP: новое имя для '{old}' должно быть строкой"))
+    for replace_key in REPLACE_KEYS:
+        for column, replacements in raw[replace_key].items():
+            if not isinstance(replacements, dict):
+                issues.append(Issue(ERROR, f"{replace_key}: замены для '{column}' должны быть словарём"))
+    identity = raw.get("IDENTITY", {})
+    if not isinstance(identity, dict):
+        issues.append(Issue(ERROR, "Раздел IDENTITY должен быть словарём"))
+    else:
+        try:
+            IdentityRules.from_config(identity)
+        except ValueError as e:
+            issues.append(Issue(ERROR, str(e)))
+    return issues
+
+
+def check_config(input_folder, raw: dict, replace_keys=REPLACE_KEYS) -> ConfigCheck:
+    """
+    Быстрая проверка настроек без обработки: из каждого опросного листа читаются только
+    описания таблиц и заголовки (read_table_headers), ячейки с данными не разбираются.
+
+    Проверяется то, из-за чего запуск падает или даёт не тот результат:
+    таблицы из table_names, которых нет в файле; столбцы columns_to_remove, которых нет
+    ни в одной таблице модуля; столбцы REPLACE_*, которых нет после переименования
+    по RENAME_MAP; отсутствие ключей 'ФИО' и 'УЗ'. Столбцы результата предсказываются
+    по тем же схемам заголовков (реестр schemas), что и при обработке.
+
+    Args:
+        input_folder: Каталог с опросными листами.
+        raw: Содержимое config.json — сохранённое или ещё не сохранённое (окно настроек).
+        replace_keys: Ключи config, столбцы которых объединяются.
+
+    Returns:
+        ConfigCheck: Итог проверки; ok — нет ошибок.
+    """
+    start = time.perf_counter()
+    check = ConfigCheck(Path(input_folder))
+    check.issues = _structure_issues(raw)
+    if check.errors:
+        check.seconds = time.perf_counter() - start
+        return check
+    if not check.input_folder.is_dir():
+        check.issues.append(Issue(ERROR, f"Каталог не найден: {check.input_folder}"))
+        check.seconds = time.perf_counter() - start
+        return check
+
+    rename_map = raw["RENAME_MAP"]
+    file_index = discover_input_files(check.input_folder, raw["MODULES"])
+    headers_by_file: dict[Path, dict] = {}
+    for path in dict.fromkeys(path for files in file_index.values() for path in files):
+        file_start = time.perf_counter()
+        try:
+            headers_by_file[path] = {d.name: d for d in read_table_headers(path)}
+        except (OSError, zipfile.BadZipFile, KeyError, ValueError) as e:
+            check.issues.append(Issue(ERROR, f"Файл не читается: {e}", file=path.name))
+        check.file_times[path.name] = time.perf_counter() - file_start
+
+    for module, files in file_index.items():
+        columns_to_remove = raw["MODULES"][module]["columns_to_remove"]
+        if not files:
+            check.issues.append(Issue(WARNING, "Нет опросных листов, в имени которых есть ключ модуля",
+                                      module))
+        module_tables = []
+        for path, table_names in files.items():
+            if path not in headers_by_file:
+                continue
+            definitions = headers_by_file[path]
+            for table_name in table_names:
+                table = TableCheck(module, path.name, table_name)
+                check.tables.append(table)
+                definition = definitions.get(table_name)
+                if definition is None:
+                    check.issues.append(Issue(
+                        ERROR, f"Таблица '{table_name}' не найдена; в файле есть: "
+                               f"{', '.join(definitions) or 'нет таблиц'}", module, path.name))
+                    continue
+                headers = schemas.normalize(pd.Index(definition.columns, dtype=object))
+                schema = schemas.resolve(headers, columns_to_remove, rename_map)
+                table.sheet = definition.sheet
+                table.headers = list(headers)
+                table.columns = list(schema.columns)
+                table.removed = [column for column in table.headers if column in set(columns_to_remove)]
+                table.collisions = {target: [table.headers[position] for position in positions]
+                                    for target, positions in schema.collisions.items()}
+                module_tables.append(table)
+
+        if not module_tables:
+            continue
+        # Столбцы модуля — как у pd.concat: по порядку появления в таблицах
+        check.modules[module] = list(dict.fromkeys(
+            column for table in module_tables for column in table.columns))
+        headers = {column for table in module_tables for column in table.headers}
+        unmatched = [column for column in columns_to_remove if column not in headers]
+        if unmatched:
+            check.issues.append(Issue(
+                WARNING, f"Столбцы columns_to_remove не встречаются ни в одной таблице: "
+                         f"{', '.join(unmatched)}", module))
+        missing_keys = [key for key in MERGE_KEYS if key not in check.modules[module]]
+        if missing_keys:
+            check.issues.append(Issue(
+                WARNING, f"Нет столбцов {', '.join(missing_keys)}: строки модуля не попадут в итог",
+                module))
+
+    merged = list(dict.fromkeys(column for columns in check.modules.values() for column in columns))
+    if check.modules:
+        missing_keys = [key for key in MERGE_KEYS if key not in merged]
+        if missing_keys:
+            check.issues.append(Issue(
+                ERROR, f"Ни в одном модуле нет столбцов {', '.join(missing_keys)} после переименования"))
+
+    # Итоговый файл: объединённые столбцы вместо исходных столбцов прав
+    combined_columns = set()
+    for replace_key in replace_keys:
+        replace_columns = list(raw.get(replace_key, {}))
+        if not replace_columns:
+            continue
+        missing = [column for column in replace_columns if column not in merged]
+        if missing and check.modules:
+            check.issues.append(Issue(
+                WARNING, f"Столбцы {replace_key} не найдены после переименования: {', '.join(missing)}"))
+        combined_columns.update(replace_columns)
+        merged.append(f"{replace_key}_combined")
+    check.columns = [column for column in merged if column not in combined_columns]
+
+    check.seconds = time.perf_counter() - start
+    logging.info(f"Проверка настроек: ошибок {len(check.errors)}, "
+                 f"предупреждений {len(check.warnings)}, {check.seconds:.2f} с")
+    return check
@@ -12,6 +12,10 @@ class AppConfig:
     ROOT = Path(__file__).parent
 
     def __init__(self):
+        self.reload()
+
+    def reload(self):
+        """Перечитывает config.json (например, после сохранения настроек в UI)."""
         path = self.ROOT / "config.json"
         with open(path, "r", encoding="utf-8") as f:
             config = json.load(f)
@@ -20,6 +24,14 @@ class AppConfig:
         self.REPLACE_ENERGYMAIN: dict[str, Any] = config["REPLACE_ENERGYMAIN"]
         self.REPLACE_ACCESS: dict[str, Any] = config["REPLACE_ACCESS"]
         self.MODULES: dict[str, dict[str, Any]] = config["MODULES"]
+        # Необязательный раздел: способ хранения столбцов {столбец: "category" | "string" | ...}
+        self.DTYPES: dict[str, str] = config.get("DTYPES", {})
+        # Необязательный раздел: правила сопоставления сотрудников (identity.IdentityRules)
+        self.IDENTITY: dict[str, Any] = config.get("IDENTITY", {})
+        # Необязательный раздел: параметры обработки, например {"engine": "pandas" | "polars"}
+        self.PROCESSING: dict[str, Any] = config.get("PROCESSING", {})
+        # Необязательный раздел: база SQLite с итогом {"path": "итог.sqlite", "table": "итог"}
+        self.SQLITE: dict[str, Any] = config.get("SQLITE", {})
 
     def get_config(self, key: str, default: Any = None):
         """
@@ -0,0 +1,143 @@
+import logging
+import re
+import warnings
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
+
+try:
+    import xlsxwriter
+except ImportError:  # необязательная зависимость
+    xlsxwriter = None
+
+# Имя листа и таблицы Excel в сохраняемых файлах
+SHEET_NAME = "Sheet1"
+TABLE_NAME = "Результат"
+TABLE_STYLE = "TableStyleMedium2"
+DATE_FORMAT = "yyyy-mm-dd hh:mm:ss"
+# Размер листа Excel: строк вместе с заголовком и столбцов
+EXCEL_MAX_ROWS = 1_048_576
+EXCEL_MAX_COLUMNS = 16_384
+
+
+def _column_values(series: pd.Series) -> np.ndarray:
+    """Значения столбца как объекты Python; пропуски (NaN, NaT, None) — пустые ячейки."""
+    values = series.to_numpy(dtype=object, copy=True)
+    values[pd.isna(values)] = None
+    return values
+
+
+def _iter_rows(df: pd.DataFrame) -> Iterator[tuple]:
+    """Построчно отдаёт значения таблицы, собирая строки из заранее подготовленных столбцов."""
+    columns = [_column_values(df.iloc[:, i]) for i in range(df.shape[1])]
+    return zip(*columns)
+
+
+def _check_size(df: pd.DataFrame) -> None:
+    """
+    Потоковая запись не проверяет размер листа сама и записала бы повреждённый файл:
+    таблица больше листа Excel — ошибка, как у DataFrame.to_excel.
+    """
+    rows, columns = df.shape[0] + 1, df.shape[1]
+    if rows > EXCEL_MAX_ROWS or columns > EXCEL_MAX_COLUMNS:
+        raise ValueError(
+            f"Таблица не помещается на лист Excel: строк {rows} (с заголовком), столбцов {columns}; "
+            f"наибольший размер листа — {EXCEL_MAX_ROWS} строк, {EXCEL_MAX_COLUMNS} столбцов")
+
+
+def _table_headers(df: pd.DataFrame):
+    """
+    Заголовки для таблицы Excel или None, если таблицу создать нельзя:
+    Excel требует непустые и уникальные (без учёта регистра) имена столбцов.
+    """
+    headers = [str(col) if col is not None else "" for col in df.columns]
+    normalized = [header.strip().lower() for header in headers]
+    if df.empty or "" in normalized or len(set(normalized)) != len(normalized):
+        return None
+    return headers
+
+
+def _table_name(name: str) -> str:
+    """Имя таблицы Excel: только буквы, цифры, '_' и '.', начинается с буквы или '_'."""
+    name = re.sub(r"[^\w.]", "_", name)
+    return name if re.match(r"[^\W\d]", name) else f"_{name}"
+
+
+def write_pandas(df: pd.DataFrame, path: str) -> None:
+    """Прежний способ: DataFrame.to_excel через openpyxl, вся книга строится в памяти."""
+    df.to_excel(path, index=False)
+
+
+def write_openpyxl_write_only(df: pd.DataFrame, path: str) -> None:
+    """
+    Потоковая запись в режиме openpyxl write-only: строки сразу уходят в файл,
+    память не зависит от числа строк. Данные оформляются таблицей Excel с автофильтром.
+    """
+    _check_size(df)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(SHEET_NAME)
+    ws.freeze_panes = "A2"
+
+    headers = _table_headers(df)
+    if headers is not None:
+        ref = f"A1:{get_column_letter(df.shape[1])}{df.shape[0] + 1}"
+        table = Table(displayName=_table_name(TABLE_NAME), ref=ref)
+        table.tableStyleInfo = TableStyleInfo(name=TABLE_STYLE, showRowStripes=True)
+        # В режиме write-only столбцы таблицы не берутся из ячеек, их задают явно
+        table.tableColumns = [TableColumn(id=i, name=header)
+                              for i, header in enumerate(headers, start=1)]
+        with warnings.catch_warnings():
+            # openpyxl всегда предупреждает о ручных столбцах в write-only — они уже заданы
+            warnings.simplefilter("ignore", UserWarning)
+            ws.add_table(table)
+    else:
+        logging.warning(
+            f"Файл {path}: имена столбцов пустые или повторяются, таблица Excel не создаётся")
+        if df.shape[1]:
+            ws.auto_filter.ref = f"A1:{get_column_letter(df.shape[1])}{df.shape[0] + 1}"
+
+    # Ячейки заголовка должны совпадать с именами столбцов таблицы, иначе Excel «восстанавливает» файл
+    ws.append(headers if headers is not None else list(df.columns))
+    for row in _iter_rows(df):
+        ws.append(row)
+    wb.save(path)
+
+
+def write_xlsxwriter(df: pd.DataFrame, path: str) -> None:
+    """
+    Запись через xlsxwriter в режиме constant_memory: каждая строка сбрасывается на диск
+    сразу после записи. В этом режиме xlsxwriter не умеет создавать таблицы Excel,
+    поэтому на данные ставится только автофильтр.
+    """
+    if xlsxwriter is None:
+        raise RuntimeError("Для записи через xlsxwriter установите пакет xlsxwriter")
+    _check_size(df)
+
+    wb = xlsxwriter.Workbook(path, {
+        "constant_memory": True,
+        "default_date_format": DATE_FORMAT,
+        "remove_timezone": True,
+        "nan_inf_to_errors": True,
+    })
+    try:
+        ws = wb.add_worksheet(SHEET_NAME)
+        ws.freeze_panes(1, 0)
+        ws.write_row(0, 0, [str(col) for col in df.columns], wb.add_format({"bold": True}))
+        for i, row in enumerate(_iter_rows(df), start=1):
+            ws.write_row(i, 0, row)
+        if df.shape[1]:
+            ws.autofilter(0, 0, df.shape[0], df.shape[1] - 1)
+    finally:
+        wb.close()
+
+
+# Способы записи для save_dataframe_to_excel
+EXCEL_WRITERS = {
+    "write_only": write_openpyxl_write_only,
+    "xlsxwriter": write_xlsxwriter,
+    "pandas": write_pandas,
+}
@@ -0,0 +1,134 @@
+import logging
+import os
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+from functions import save_dataframe_to_excel
+
+# Сколько памяти могут занимать снимки таблиц, ожидающие записи, по умолчанию
+DEFAULT_MAX_BYTES = 512 * 2 ** 20
+
+
+def _write_excel(df: pd.DataFrame, path: str, engine: str) -> float:
+    """Записывает таблицу в Excel в процессе записи и возвращает время записи в секундах."""
+    start = time.perf_counter()
+    save_dataframe_to_excel(df, path, engine=engine)
+    return time.perf_counter() - start
+
+
+class ExportQueue:
+    """
+    Фоновая выгрузка таблиц в Excel: обработка передаёт снимок таблицы и продолжает работу,
+    а файлы пишут отдельные процессы (запись openpyxl упирается в GIL, потоки не помогают).
+
+    Снимок — поверхностная копия таблицы: при copy-on-write в pandas последующие изменения
+    исходной таблицы его не затрагивают, а данные при этом не копируются. Очередь ограничена
+    по памяти: если снимки в очереди занимают больше max_bytes, submit ждёт завершения
+    записи (один снимок больше лимита всё равно принимается, когда очередь пуста).
+
+    Ошибки записи не прерывают обработку: они собираются и возвращаются из close().
+
+    Args:
+        workers: Число процессов записи; 0 — писать сразу в текущем процессе.
+            По умолчанию — до двух процессов, но не больше числа ядер минус одно:
+            на одноядерной машине фоновая запись только отнимает время у обработки.
+        max_bytes: Предельный объём снимков, ожидающих записи.
+        engine: Способ записи из EXCEL_WRITERS.
+        on_written: Вызывается после каждой успешной записи: on_written(path, seconds).
+    """
+
+    def __init__(self, workers: int | None = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 engine: str = "write_only", on_written=None):
+        if workers is None:
+            workers = max(0, min(2, (os.cpu_count() or 1) - 1))
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self.engine = engine
+        self.on_written = on_written
+        self.submitted = 0
+        self.executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+        self.written: list[tuple[str, float]] = []
+        self.failures: list[tuple[str, BaseException]] = []
+        self._pending: dict[Future, tuple[str, int]] = {}
+
+    @property
+    def queued_bytes(self) -> int:
+        return sum(size for _, size in self._pending.values())
+
+    def submit(self, df: pd.DataFrame, path) -> None:
+        """Ставит таблицу в очередь на запись в файл path."""
+        path = str(path)
+        self.submitted += 1
+        if self.executor is None:
+            self._record(path, lambda: _write_excel(df, path, self.engine))
+            return
+
+        snapshot = df.copy(deep=False)
+        size = int(snapshot.memory_usage(index=True, deep=True).sum())
+        # Ждём, пока в очереди освободится место под снимок
+        while self._pending and self.queued_bytes + size > self.max_bytes:
+            logging.debug(f"Очередь выгрузки заполнена ({self.queued_bytes / 2 ** 20:.1f} МБ), ожидание")
+            self._collect(FIRST_COMPLETED)
+
+        future = self.executor.submit(_write_excel, snapshot, path, self.engine)
+        self._pending[future] = (path, size)
+
+    def _collect(self, return_when) -> None:
+        """Дожидается завершения записей и разбирает их результаты."""
+        done, _ = wait(self._pending, return_when=return_when)
+        for future in done:
+            path, _ = self._pending.pop(future)
+            self._record(path, future.result)
+
+    def _record(self, path: str, result) -> None:
+        try:
+            seconds = result()
+        except Exception as e:
+            logging.error(f"Ошибка записи {path}: {e}")
+            self.failures.append((path, e))
+        else:
+            logging.info(f"Файл {path} записан за {seconds:.3f} с")
+            self.written.append((path, seconds))
+            if self.on_written is not None:
+                self.on_written(path, seconds)
+
+    def close(self) -> list[tuple[str, BaseException]]:
+        """Дожидается всех записей, останавливает процессы и возвращает ошибки записи."""
+        if self.executor is not None:
+            if self._pending:
+                self._collect(ALL_COMPLETED)
+            self.executor.shutdown()
+            self.executor = None
+        logging.info(
+            f"Выгрузка в Excel: записано файлов {len(self.written)}, ошибок {len(self.failures)}")
+        return self.failures
+
+    def cancel(self) -> None:
+        """
+        Отмена выгрузки: записи, которые ещё не начались, отменяются, начатые дописываются
+        (прерывать процесс посреди записи — значит оставить повреждённый файл).
+        """
+        if self.executor is None:
+            return
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.executor = None
+        for future, (path, _) in self._pending.items():
+            if future.cancelled():
+                logging.info(f"Запись {path} отменена")
+                continue
+            try:
+                seconds = future.result()
+            except Exception as e:
+                logging.error(f"Ошибка записи {path}: {e}")
+                self.failures.append((path, e))
+            else:
+                self.written.append((path, seconds))
+        self._pending.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,13 +1,18 @@
 import os
+import numpy as np
 import pandas as pd
-import re
 from openpyxl import load_workbook
 from pathlib import Path
-from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 import logging
+from datetime import datetime
 from logger_utils import log_decorator
 from config_manager import config
-from typing import Dict
+from xlsx_tables import read_tables
+from table_cache import WorkbookCache
+from excel_writer import EXCEL_WRITERS
+from permissions import PermissionMatrix, flag_columns
+from schema import schemas
 
 # Использование pathlib для работы с путями
 # input_folder = Path(config.INPUT_FOLDER)
@@ -15,9 +20,7 @@ from typing import Dict
 # log_folder = Path(config.LOG_FOLDER)
 
 
-@lru_cache(maxsize=10)
-def _load_workbook_cached(filepath: str):
-    """Кэшированная версия load_workbook для предотвращения многократных открытий одного и того же файла."""
+def _load_workbook(filepath):
     try:
         return load_workbook(filepath, data_only=True)
     except Exception as e:
@@ -25,6 +28,15 @@ def _load_workbook_cached(filepath: str):
         raise
 
 
+# Кэш полностью загруженных книг для engine="openpyxl", ограниченный по памяти
+_workbook_cache = WorkbookCache(_load_workbook)
+
+
+def _load_workbook_cached(filepath):
+    """Кэшированная версия load_workbook для предотвращения многократных открытий одного и того же файла."""
+    return _workbook_cache.get(filepath)
+
+
 def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     """
     Нормализует имена столбцов DataFrame: убирает лишние пробелы и переносы строк,
@@ -33,146 +45,620 @@ def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
     :param df: DataFrame
     :return: DataFrame с нормализованными именами столбцов
     """
-    df.columns = df.columns.str.replace(r'\s+', ' ', regex=True).str.strip()
+    df.columns = schemas.normalize(df.columns)
     return df
 
 
+def _read_tables_openpyxl(filepath, table_names=None) -> dict[str, pd.DataFrame]:
+    """Прежний способ чтения: полная загрузка книги openpyxl и срез sheet[tbl.ref]."""
+    wb = _load_workbook_cached(filepath)
+    tables = {}
+    for sheet in wb.worksheets:
+        for tbl in sheet._tables.values():
+            if table_names is not None and tbl.name not in table_names:
+                continue
+            data = sheet[tbl.ref]
+            rows = [[cell.value for cell in row] for row in data]
+            tables[tbl.name] = pd.DataFrame(rows[1:], columns=rows[0])
+    _workbook_cache.mark_extracted(filepath, tables)
+    if table_names is not None:
+        for table_name in table_names:
+            if table_name not in tables:
+                raise ValueError(f"Таблица '{table_name}' не найдена")
+    return tables
+
+
+# Способы чтения таблиц: "stream" — потоковое чтение только нужных диапазонов,
+# "openpyxl" — полная загрузка книги (оставлен для сравнения и отладки)
+TABLE_READERS = {
+    "stream": read_tables,
+    "openpyxl": _read_tables_openpyxl,
+}
+
+
 @log_decorator(level=logging.DEBUG)
-def load_named_table(filepath: str, table_name: str) -> pd.DataFrame:
+def load_named_table(filepath: str, table_name: str, engine: str = "stream") -> pd.DataFrame:
     """
     Загружает таблицу из Excel файла по имени.
 
     Args:
         filepath (str): Путь к Excel файлу.
         table_name (str): Имя таблицы для загрузки.
+        engine (str): Способ чтения из TABLE_READERS.
 
     Returns:
         pd.DataFrame: Таблица, загруженная в виде DataFrame.
     """
     try:
-        wb = _load_workbook_cached(filepath)
-        for sheet in wb.worksheets:
-            for tbl in sheet._tables.values():
-                if tbl.name == table_name:
-                    data = sheet[tbl.ref]
-                    rows = [[cell.value for cell in row] for row in data]
-                    # создаем DataFrame
-                    df = pd.DataFrame(rows[1:], columns=rows[0])
-                    # Применяем нормализацию столбцов
-                    return normalize_columns(df)
-        raise ValueError(f"Таблица '{table_name}' не найдена")
+        df = TABLE_READERS[engine](filepath, [table_name])[table_name]
+        # Применяем нормализацию столбцов
+        return normalize_columns(df)
     except Exception as e:
         raise RuntimeError(f"Ошибка загрузки: {e}")
 
 
+@log_decorator(level=logging.DEBUG)
+def load_named_tables(filepath, table_names: list[str], engine: str = "stream") -> dict[str, pd.DataFrame]:
+    """
+    Загружает несколько таблиц из Excel файла за одно открытие книги.
+
+    Args:
+        filepath: Путь к Excel файлу.
+        table_names (list[str]): Имена таблиц для загрузки.
+        engine (str): Способ чтения из TABLE_READERS.
+
+    Returns:
+        dict[str, pd.DataFrame]: Таблицы с нормализованными столбцами по именам.
+    """
+    try:
+        tables = TABLE_READERS[engine](filepath, table_names)
+        return {name: normalize_columns(df) for name, df in tables.items()}
+    except Exception as e:
+        raise RuntimeError(f"Ошибка загрузки {filepath}: {e}")
+
+
+def is_input_file(filename: str) -> bool:
+    """Проверяет, что файл — опросный лист, а не временный файл Excel, лог или результат обработки."""
+    if not filename.endswith(".xlsx"):
+        return False
+    return not ("~$" in filename or "log" in filename or "Обработано" in filename)
+
+
+@log_decorator(level=logging.DEBUG)
+def discover_input_files(input_folder, modules: dict) -> dict[str, dict[Path, list[str]]]:
+    """
+    Один раз просматривает каталог и строит индекс: модуль -> файл -> имена таблиц.
+
+    Файл относится к модулю, если ключ модуля входит в имя файла.
+
+    Args:
+        input_folder: Каталог с опросными листами.
+        modules (dict): Блок MODULES из config.json.
+
+    Returns:
+        dict[str, dict[Path, list[str]]]: Индекс в порядке модулей конфигурации.
+    """
+    input_folder = Path(input_folder)
+    filenames = sorted(name for name in os.listdir(input_folder) if is_input_file(name))
+    index = {}
+    for module_key, module_config in modules.items():
+        index[module_key] = {
+            input_folder / filename: list(module_config["table_names"])
+            for filename in filenames if module_key in filename
+        }
+    return index
+
+
+@log_decorator(level=logging.INFO)
+def load_indexed_tables(index: dict[str, dict[Path, list[str]]], engine: str = "stream",
+                        workers: int = 1, cache=None, progress=None) -> dict[Path, dict[str, pd.DataFrame]]:
+    """
+    Открывает каждый файл из индекса ровно один раз и загружает все таблицы,
+    которые запрашивает хотя бы один модуль.
+
+    При workers > 1 файлы разбираются параллельно в пуле процессов. Таблицы возвращаются
+    из процессов как DataFrame — pickle передаёт их блоками столбцов, а не списками строк.
+    Порядок результата не зависит от порядка завершения задач.
+
+    Args:
+        index: Индекс из discover_input_files.
+        engine (str): Способ чтения из TABLE_READERS.
+        workers (int): Число процессов для чтения файлов.
+        cache: TableCache; таблицы из кэша не разбираются, новые в него записываются.
+        progress: Вызывается после каждого готового файла: progress(path, done, total).
+            Если progress бросает исключение, ещё не начатый разбор файлов отменяется.
+
+    Returns:
+        dict[Path, dict[str, pd.DataFrame]]: Таблицы по файлам и именам.
+    """
+    requests: dict[Path, list[str]] = {}
+    for files in index.values():
+        for path, table_names in files.items():
+            requested = requests.setdefault(path, [])
+            requested.extend(name for name in table_names if name not in requested)
+
+    loaded: dict[Path, dict[str, pd.DataFrame]] = {}
+    pending: dict[Path, list[str]] = {}
+    for path, table_names in requests.items():
+        loaded[path] = cache.get(path, table_names) if cache is not None else {}
+        missing = [name for name in table_names if name not in loaded[path]]
+        if missing:
+            pending[path] = missing
+
+    paths = list(pending)
+    workers = min(workers, len(paths))
+    # Книги целиком загружает только читатель openpyxl, и кэш книг — в этом процессе:
+    # такая книга освобождается, как только извлечены все её таблицы
+    if engine == "openpyxl" and workers <= 1:
+        for path in paths:
+            _workbook_cache.expect(path, pending[path])
+    # Файлы, целиком взятые из кэша, готовы сразу
+    done = len(requests) - len(paths)
+    if progress is not None and done:
+        progress(None, done, len(requests))
+
+    def parsed(path, tables):
+        nonlocal done
+        loaded[path].update(tables)
+        if cache is not None:
+            cache.put(path, tables)
+        done += 1
+        if progress is not None:
+            progress(path, done, len(requests))
+
+    if workers <= 1:
+        for path in paths:
+            parsed(path, load_named_tables(path, pending[path], engine=engine))
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            results = executor.map(load_named_tables, paths,
+                                   [pending[path] for path in paths],
+                                   [engine] * len(paths))
+            for path, tables in zip(paths, results):
+                parsed(path, tables)
+        except BaseException:
+            # Прерванная загрузка не ждёт разбора оставшихся файлов
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        executor.shutdown()
+    if cache is not None:
+        cache.evict()
+        cache.log_stats()
+    if _workbook_cache.misses:
+        _workbook_cache.log_stats()
+
+    # Таблицы файла — в порядке запроса, независимо от того, взяты они из кэша или разобраны
+    return {path: {name: loaded[path][name] for name in table_names}
+            for path, table_names in requests.items()}
+
+
 @log_decorator(level=logging.INFO)
-def load_all_tables_from_file(filepath: str, verbose: bool = False) -> list[pd.DataFrame]:
-    tables = []
+def load_all_tables_from_file(filepath: str, verbose: bool = False, engine: str = "stream") -> list[pd.DataFrame]:
     try:
-        wb = _load_workbook_cached(filepath)
-        all_table_names = []
-
-        for sheet in wb.worksheets:
-            for tbl in sheet._tables.values():
-                all_table_names.append(tbl.name)
-                data = sheet[tbl.ref]
-                rows = [[cell.value for cell in row] for row in data]
-                headers = rows[0]
-                values = rows[1:]
-                df = pd.DataFrame(values, columns=headers)
-                tables.append(df)
+        tables = TABLE_READERS[engine](filepath)
+        all_table_names = list(tables.keys())
 
         msg = f"В файле '{filepath}' найдены таблицы: \n{all_table_names}"
         if verbose:
             print(msg)
         logging.info(msg)
-        return tables
+        return list(tables.values())
     except Exception as e:
         raise RuntimeError(
             f"Ошибка при чтении всех таблиц из файла {filepath}: {e}")
 
 
 @log_decorator(level=logging.DEBUG)
-def combine_dataframes(dfs, columns_to_remove, rename_map):
-    combined = pd.concat(dfs, ignore_index=True)
-    combined = combined.copy()
-    combined.drop(columns=[
-                  col for col in columns_to_remove if col in combined.columns], errors='ignore', inplace=True)
-    combined.rename(columns=rename_map, inplace=True)
-    return combined
+def combine_dataframes(dfs, columns_to_remove, rename_map, collisions: str = "first"):
+    """
+    Объединяет таблицы модуля в одну: каждая таблица сразу проецируется в итоговый набор
+    столбцов её сигнатуры заголовка (реестр schemas) — без columns_to_remove, с именами
+    из rename_map, — и только потом таблицы склеиваются.
+
+    Args:
+        dfs: Таблицы модуля.
+        columns_to_remove: Столбцы, которые не попадают в результат.
+        rename_map: Словарь для переименования столбцов.
+        collisions: Что делать, если несколько столбцов таблицы получают одно имя
+            (schema.COLLISION_POLICIES): "first" — свести в один столбец с первым непустым
+            значением слева направо, "raise" — выбросить ValueError.
+    """
+    table_schemas = [schemas.resolve(df.columns, columns_to_remove, rename_map, collisions) for df in dfs]
+    # Обычно у всех таблиц модуля один заголовок: тогда таблицы склеиваются как есть
+    # и проецируются один раз. Проекция не меняет исходные таблицы (они могут лежать
+    # в кэше в памяти), а concat всегда возвращает новую таблицу
+    if all(schema is table_schemas[0] for schema in table_schemas):
+        return table_schemas[0].project(pd.concat(dfs, ignore_index=True))
+    return pd.concat([schema.project(df) for schema, df in zip(table_schemas, dfs)],
+                     ignore_index=True)
+
+
+# Способы хранения столбцов в compact_dtypes (значения раздела DTYPES в config.json)
+DTYPE_KINDS = ("category", "string", "datetime", "number", "keep")
+# Строковый столбец хранится как category, если уникальных значений не больше этой доли строк
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+
+def _infer_dtype_kind(series: pd.Series) -> str:
+    """
+    Способ хранения столбца по его значениям: даты и числа из столбцов object — в родные
+    типы, строки с небольшим числом уникальных значений (права, подразделения) — в category.
+    Столбцы со значениями разных типов остаются как есть.
+    """
+    if series.dtype == object:
+        values = series.dropna().to_numpy()
+        if not len(values):
+            return "keep"
+        types = set(map(type, values))
+        # Только datetime: datetime.date при переводе в Timestamp получил бы время 00:00:00
+        if all(issubclass(t, datetime) for t in types):
+            return "datetime"
+        # Целые и дробные вместе не сводятся: 1 и 1.0 по-разному выглядят при объединении столбцов
+        if all(issubclass(t, (int, np.integer)) and not issubclass(t, (bool, np.bool_)) for t in types) \
+                or all(issubclass(t, (float, np.floating)) for t in types):
+            return "number"
+        return "keep"
+
+    if pd.api.types.is_string_dtype(series.dtype):
+        present = series.count()
+        if present and series.nunique() <= CATEGORY_MAX_UNIQUE_RATIO * present:
+            return "category"
+    return "keep"
+
+
+def _convert_column(series: pd.Series, kind: str) -> pd.Series:
+    if kind == "category":
+        return series.astype("category")
+    if kind == "string":
+        return series.astype("str")
+    if kind == "datetime":
+        return pd.to_datetime(series)
+    if kind == "number":
+        values = series.dropna()
+        if len(values) and all(isinstance(value, (int, np.integer)) for value in values):
+            return series.astype("Int64")
+        return pd.to_numeric(series)
+    return series
+
+
+@log_decorator()
+def compact_dtypes(df: pd.DataFrame, schema: dict[str, str] | None = None,
+                   keep: list[str] | None = None) -> pd.DataFrame:
+    """
+    Переводит столбцы в компактные типы: повторяющиеся строки — в category,
+    даты и числа из столбцов object — в datetime64, Int64 и float64.
+
+    Args:
+        df: Таблица.
+        schema: Способ хранения по имени столбца (DTYPE_KINDS); для остальных столбцов
+            он определяется по значениям.
+        keep: Столбцы, которые не переводятся в category без явного указания в schema
+            (по умолчанию ключи 'ФИО' и 'УЗ').
+
+    Returns:
+        pd.DataFrame: Таблица с теми же значениями в компактных типах.
+    """
+    schema = schema or {}
+    keep = MERGE_KEYS if keep is None else keep
+    for kind in schema.values():
+        if kind not in DTYPE_KINDS:
+            raise ValueError(f"Неизвестный тип столбца в DTYPES: {kind}")
+
+    df = df.copy(deep=False)
+    for position, column in enumerate(df.columns):
+        series = df.iloc[:, position]
+        kind = schema.get(column)
+        if kind is None:
+            kind = _infer_dtype_kind(series)
+            if kind == "category" and column in keep:
+                kind = "keep"
+        if kind == "keep":
+            continue
+        try:
+            df.isetitem(position, _convert_column(series, kind))
+        except (ValueError, TypeError) as e:
+            logging.warning(f"Столбец '{column}' не переведён в {kind}: {e}")
+    return df
 
 
 @log_decorator(level=logging.INFO)
-def save_dataframe_to_excel(df: pd.DataFrame, path: str, verbose=False) -> None:
-    df.to_excel(path, index=False)
+def save_dataframe_to_excel(df: pd.DataFrame, path: str, verbose=False, engine: str = "write_only") -> None:
+    """
+    Сохраняет DataFrame в Excel.
+
+    Args:
+        df: Данные для сохранения.
+        path: Путь к файлу.
+        verbose: Печатать сообщение о сохранении.
+        engine: Способ записи из EXCEL_WRITERS. По умолчанию "write_only" — потоковая
+            запись openpyxl с оформлением данных таблицей Excel с автофильтром.
+    """
+    EXCEL_WRITERS[engine](df, path)
     msg = f"Результат сохранён: {path}"
     if verbose:
         print(msg)
     logging.info(msg)
 
 
+# Столбцы, по которым строки считаются дубликатами
+MERGE_KEYS = ['ФИО', 'УЗ']
+# Что делать со строками, где 'ФИО' или 'УЗ' пусты
+NA_KEYS_POLICIES = ("drop", "keep", "raise")
+
+
 @log_decorator(level=logging.DEBUG)
-def smart_merge(df: pd.DataFrame, rename_map: dict[str, str]) -> pd.DataFrame:
+def smart_merge(df: pd.DataFrame, rename_map: dict[str, str], na_keys: str = "drop", sort: bool = True,
+                flags_as_bits: bool = False) -> pd.DataFrame:
     """
     Удаляет дубликаты по комбинации столбцов 'ФИО' и 'УЗ', сохраняет первое вхождение как оригинал,
     заполняет пропуски у оригинала значениями из дубликатов, удаляет дубли.
 
+    Для каждой группы берётся первое непустое значение каждого столбца (groupby().first()),
+    строки внутри группы просматриваются в исходном порядке.
+
     Args:
         df: Входной DataFrame
         rename_map: Словарь для переименования столбцов
+        na_keys: Строки с пустым 'ФИО' или 'УЗ': "drop" — отбросить (с предупреждением в логе),
+            "keep" — оставить, считая пустое значение обычным значением ключа,
+            "raise" — выбросить ValueError
+        sort: True — группы упорядочены по ключам, False — по первому появлению в исходных данных
+        flags_as_bits: Столбцы-флаги (права '+' или один код права) сводятся побитовым ИЛИ
+            по группам в битовой матрице — результат тот же, что у first(). По умолчанию
+            выключено: все столбцы идут через groupby().first() (см. benchmark.py permissions)
 
     Returns:
         DataFrame без дубликатов с заполненными пропусками
     """
-    df = df.copy()
-    df.rename(columns=rename_map, inplace=True)
+    if na_keys not in NA_KEYS_POLICIES:
+        raise ValueError(f"Неизвестный режим na_keys: {na_keys}")
+
+    df = df.rename(columns=rename_map)
+
+    na_mask = df[MERGE_KEYS].isna().any(axis=1)
+    na_count = int(na_mask.sum())
+    if na_count:
+        msg = f"Строк с пустым 'ФИО' или 'УЗ': {na_count}"
+        if na_keys == "raise":
+            raise ValueError(msg)
+        if na_keys == "drop":
+            logging.warning(f"{msg}. Они не попадут в результат.")
+        else:
+            logging.info(f"{msg}. Они объединяются как обычные ключи.")
 
     # Группируем по 'ФИО' и 'УЗ'
-    grouped = df.groupby(['ФИО', 'УЗ'], as_index=False)
+    dropna = na_keys == "drop"
+    flags = flag_columns(df, exclude=MERGE_KEYS) if flags_as_bits and df.columns.is_unique else {}
+    grouped = df.drop(columns=df.columns[list(flags)]).groupby(
+        MERGE_KEYS, sort=sort, dropna=dropna, observed=True)
+
+    # Первое непустое значение каждого столбца в группе
+    final_df = grouped.first().reset_index()
+    if flags:
+        # Для флага первое непустое значение есть, если флаг стоит хотя бы в одной строке группы
+        group_codes = grouped.ngroup().to_numpy(dtype=float, na_value=-1).astype(np.int64)
+        matrix = PermissionMatrix.from_frame(df, flags).group_or(group_codes, grouped.ngroups)
+        flag_df = matrix.to_frame(df.iloc[:, list(flags)], list(flags.values()), final_df.index)
+        final_df = pd.concat([final_df, flag_df], axis=1)
+    # Ключи и флаги возвращаем на исходные места
+    final_df = final_df[df.columns]
+    # Индекс — как у первой строки группы
+    first_labels = df.index.to_series().groupby(
+        [df[key] for key in MERGE_KEYS], sort=sort, dropna=dropna, observed=True).first()
+    final_df.index = first_labels.to_numpy()
 
-    # Для каждой группы обрабатываем дубликаты
-    final_rows = []
+    return final_df
 
-    for _, group in grouped:
-        # Оставляем первую строку как оригинал
-        original = group.iloc[0].copy()
 
-        # Проходим по остальным строкам в группе (дубликаты)
-        for _, duplicate in group.iloc[1:].iterrows():
-            # Если у оригинала отсутствуют значения, подставляем их из дубликатов
-            for col in df.columns:
-                if pd.isna(original[col]) and not pd.isna(duplicate[col]):
-                    original[col] = duplicate[col]
+def compile_replacements(*replace_dicts: dict) -> dict[str, dict]:
+    """
+    Сводит словари замен в один план: столбец -> {исходное значение: итоговое значение}.
 
-        # Добавляем обработанную строку в финальный список
-        final_rows.append(original)
+    Словари и пары внутри них применяются по порядку, как последовательные вызовы
+    Series.replace: если одна замена даёт значение, которое заменяет следующая,
+    в плане сразу записывается итоговое значение.
 
-    # Создаем новый DataFrame из обработанных строк
-    final_df = pd.DataFrame(final_rows)
+    :param replace_dicts: словари замен в формате {столбец: {старое значение: новое значение}}
+    :return: план замен по столбцам
+    """
+    plan: dict[str, dict] = {}
+    for replace_dict in replace_dicts:
+        for column, replacements in replace_dict.items():
+            mapping = plan.setdefault(column, {})
+            for old_value, new_value in replacements.items():
+                for source, target in mapping.items():
+                    if target == old_value:
+                        mapping[source] = new_value
+                if old_value not in mapping:
+                    mapping[old_value] = new_value
+    return plan
 
-    return final_df
+
+def _replace_column(series: pd.Series, mapping: dict) -> tuple[pd.Series, dict]:
+    """
+    Заменяет значения столбца за один проход: значения кодируются словарём (factorize),
+    замена выполняется по уникальным значениям, а не по ячейкам.
+
+    :return: новый столбец и число изменённых ячеек по каждому исходному значению
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return _replace_categories(series, mapping)
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+
+    new_uniques = np.empty(len(uniques), dtype=object)
+    changed = {}
+    for code, value in enumerate(uniques):
+        new_value = mapping.get(value, value)
+        new_uniques[code] = new_value
+        if value in mapping and new_value != value:
+            changed[code] = value
+
+    if not changed:
+        return series, {}
+
+    counts = np.bincount(codes, minlength=len(uniques))
+    changes = {value: int(counts[code]) for code, value in changed.items()}
+
+    # Строковый тип столбца сохраняем, если все новые значения — строки (как Series.replace)
+    keep_string_dtype = series.dtype != object and pd.api.types.is_string_dtype(series.dtype) and all(
+        isinstance(new_uniques[code], str) for code in changed)
+    if keep_string_dtype:
+        # Собираем столбец из уже типизированных уникальных значений, не разбирая каждую ячейку заново
+        new_values = pd.array(new_uniques, dtype=series.dtype).take(codes)
+    else:
+        new_values = new_uniques.take(codes)
+        # factorize сводит None и NaN к одному значению — возвращаем пропуски как были
+        original = series.to_numpy(dtype=object)
+        na_mask = pd.isna(original)
+        new_values[na_mask] = original[na_mask]
+        if series.dtype == object:
+            # Столбец object остаётся object (как после Series.replace), без вывода типа str
+            return pd.Series(new_values, index=series.index, name=series.name, dtype=object), changes
+    return pd.Series(new_values, index=series.index, name=series.name), changes
+
+
+def _replace_categories(series: pd.Series, mapping: dict) -> tuple[pd.Series, dict]:
+    """Замена в столбце category: заменяются категории, коды строк пересчитываются один раз."""
+    categorical = series.array
+    categories = categorical.categories
+    new_categories = [mapping.get(value, value) for value in categories]
+    changed = [code for code, value in enumerate(categories)
+               if value in mapping and new_categories[code] != value]
+    if not changed:
+        return series, {}
+
+    codes = categorical.codes
+    counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+    changes = {categories[code]: int(counts[code]) for code in changed}
+
+    # Разные категории могут перейти в одно значение — категории сводятся заново
+    remap, uniques = pd.factorize(pd.Index(new_categories))
+    new_codes = np.where(codes >= 0, remap[codes], -1)
+    new_values = pd.Categorical.from_codes(new_codes, categories=uniques)
+    return pd.Series(new_values, index=series.index, name=series.name), changes
 
 
 @log_decorator(level=logging.INFO)
-def apply_replacements(df, replace_dict):
+def apply_replacements(df, *replace_dicts):
     """
-    Заменяет значения в DataFrame по указанному словарю замен.
+    Заменяет значения в DataFrame по указанным словарям замен.
     Убирает лишние пробелы и переносы строк в именах столбцов перед применением замен.
 
+    Все словари сводятся в один план (compile_replacements), и каждый столбец
+    обрабатывается один раз. Число изменённых ячеек по каждому правилу пишется в лог.
+
     :param df: DataFrame, с данными
-    :param replace_dict: словарь замен в формате {столбец: {старое значение: новое значение}}
+    :param replace_dicts: словари замен в формате {столбец: {старое значение: новое значение}}
     :return: DataFrame с применёнными заменами
     """
 
-    # Убираем лишние пробелы и переносы строк из имен столбцов
-    df.columns = df.columns.str.replace(r'\s+', ' ', regex=True).str.strip()
+    # Убираем лишние пробелы и переносы строк из имен столбцов; у загруженных таблиц они
+    # уже нормализованы, и реестр сигнатур отдаёт готовый результат
+    df.columns = schemas.normalize(df.columns)
 
-    # Проходим по всем столбцам и заменяем их значения
-    for column, replacements in replace_dict.items():
-        if column in df.columns:
-            for old_value, new_value in replacements.items():
-                # Заменяем значения в столбце
-                df[column] = df[column].replace(old_value, new_value)
+    plan = compile_replacements(*replace_dicts)
+
+    # Проходим по всем столбцам плана и заменяем их значения
+    for column, mapping in plan.items():
+        # Столбцов с одинаковым именем может быть несколько — обрабатываем каждый
+        for position in np.flatnonzero(df.columns == column):
+            new_column, changes = _replace_column(df.iloc[:, position], mapping)
+            if changes:
+                df.isetitem(position, new_column)
+            for old_value, count in changes.items():
+                logging.info(
+                    f"Замена в столбце '{column}': '{old_value}' -> '{mapping[old_value]}', ячеек: {count}")
+
+    return df
+
+
+def _strip_pieces(values: np.ndarray) -> np.ndarray:
+    """'!' + str(значение).strip() для непустых значений, '' для пропусков и пустых строк."""
+    pieces = np.full(len(values), "", dtype=object)
+    present = np.flatnonzero(pd.notna(values))
+    stripped = [str(value).strip() for value in values[present]]
+    pieces[present] = ["!" + value if value else "" for value in stripped]
+    return pieces
+
+
+def _combine_piece(series: pd.Series) -> np.ndarray:
+    """
+    Готовит часть объединённой строки для одного столбца.
+
+    Для однотипных столбцов (строки, целые, даты) str() вызывается только для уникальных
+    значений. В object и float столбцах разные по str() значения могут совпадать при
+    сравнении (1 и 1.0, 0.0 и -0.0), поэтому там строки строятся для каждой ячейки.
+    """
+    if series.dtype == object or pd.api.types.is_float_dtype(series.dtype):
+        return _strip_pieces(series.to_numpy(dtype=object))
+
+    codes, uniques = pd.factorize(series)
+    # Последний элемент — пустая строка для пропусков (код -1)
+    unique_pieces = np.append(_strip_pieces(uniques.to_numpy(dtype=object)), "")
+    return unique_pieces.take(codes)
+
+
+@log_decorator()
+def combine_columns_by_replace_keys(df: pd.DataFrame, replace_keys: list[str], config, drop: bool = False,
+                                    flags_as_bits: bool = True) -> pd.DataFrame:
+    """
+    Объединяет столбцы сразу для нескольких ключей replace_keys из config за один проход по данным.
+
+    Для каждого ключа создаётся столбец f"{replace_key}_combined". Каждый исходный столбец
+    переводится в строки один раз, даже если он нужен нескольким ключам; строки собираются
+    сложением массивов по столбцам, без построчного DataFrame.apply.
+
+    При drop=True столбцы, уже объединённые предыдущим ключом, в следующие ключи не входят —
+    так же, как при последовательных вызовах combine_columns_by_replace_key.
+
+    Если все столбцы ключа — флаги (одно значение или пусто, как права '+' после замены),
+    они собираются в битовую матрицу, и строка строится один раз для каждого сочетания прав.
+    flags_as_bits=False отключает этот путь (для сравнения).
+    """
+    pieces: dict[str, np.ndarray] = {}
+    consumed: set[str] = set()
+    flags: dict[str, object] = {}
+    if flags_as_bits and df.columns.is_unique:
+        candidates = df[list(dict.fromkeys(
+            col for replace_key in replace_keys
+            for col in getattr(config, replace_key, {}) if col in df.columns))]
+        flags = {candidates.columns[position]: value
+                 for position, value in flag_columns(candidates).items()}
+
+    for replace_key in replace_keys:
+        replace_config = getattr(config, replace_key, {})
+        columns_to_combine = list(replace_config.keys())
+
+        if not columns_to_combine:
+            continue
+
+        present = [col for col in columns_to_combine if col in df.columns and col not in consumed]
+        if present and all(col in flags for col in present):
+            # Часть строки для каждого права — '!' + код; сцепляются части установленных битов
+            matrix = PermissionMatrix.from_frame(df, [df.columns.get_loc(col) for col in present])
+            combined = matrix.join([_strip_pieces(np.array([flags[col]], dtype=object))[0]
+                                    for col in present])
+        else:
+            combined = np.full(len(df), "", dtype=object)
+            for col in present:
+                if col not in pieces:
+                    pieces[col] = _combine_piece(df[col])
+                combined = combined + pieces[col]
+
+        # Убираем разделитель перед первым значением
+        new_column_name = f"{replace_key}_combined"
+        df[new_column_name] = pd.Series(combined, index=df.index).str[1:]
+
+        # Удаление столбцов, которые были объединены
+        if drop:
+            for col in columns_to_combine:
+                if col in df.columns:
+                    logging.debug(
+                        f"Удаляем столбец '{col}', так как он был объединен.")
+                    df.drop(columns=[col], inplace=True)
+                    consumed.add(col)
 
     return df
 
@@ -193,32 +679,4 @@ def combine_columns_by_replace_key(df: pd.DataFrame, replace_key: str, config, d
 
     Значения из этих двух столбцов будут объединены через "!".
     """
-    replace_config = getattr(config, replace_key, {})
-    columns_to_combine = list(replace_config.keys())
-
-    if not columns_to_combine:
-        return df
-
-    # Объединяем значения по строкам
-    def combine_row_values(row):
-        values = []
-        for col in columns_to_combine:
-            val = row.get(col)
-            if pd.notna(val) and str(val).strip():
-                values.append(str(val).strip())
-        return "!".join(values)
-
-    # Новый столбец, по replace_key
-    new_column_name = f"{replace_key}_combined"
-
-    df[new_column_name] = df.apply(combine_row_values, axis=1)
-
-    # Удаление столбцов, которые были объединены
-    if drop:
-        for col in replace_config.keys():
-            if col in df.columns:
-                logging.debug(
-                    f"Удаляем столбец '{col}', так как он был объединен.")
-                df.drop(columns=[col], inplace=True)
-
-    return df
+    return combine_columns_by_replace_keys(df, [replace_key], config, drop=drop)
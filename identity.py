@@ -0,0 +1,408 @@
+import logging
+import zlib
+from dataclasses import dataclass, fields
+from itertools import chain, combinations, product
+
+import numpy as np
+import pandas as pd
+
+# Столбцы, которые определяют сотрудника
+FIO, LOGIN = "ФИО", "УЗ"
+
+# Виды совпадений в отчёте сопоставления
+MATCH_KINDS = {
+    "normalized": "совпадают без учёта регистра, пробелов, ё/е и домена УЗ",
+    "missing": "пустой УЗ или ФИО, остальное совпадает с единственным сотрудником",
+    "same_login": "один УЗ, ФИО совпадают с точностью до инициалов",
+    "login_conflict": "один УЗ, разные ФИО",
+    "similar": "ФИО совпадают с точностью до опечатки или инициалов, УЗ не противоречат",
+}
+
+# Модуль хэш-функций MinHash (простое число 2^61 - 1); коэффициенты задаются постоянным
+# начальным значением, поэтому блоки не зависят от запуска
+_PRIME = np.uint64((1 << 61) - 1)
+_NGRAM = 3
+
+
+@dataclass
+class IdentityRules:
+    """
+    Правила сопоставления сотрудников (раздел IDENTITY в config.json).
+
+    Args:
+        enabled: Сопоставлять сотрудников перед smart_merge.
+        normalize: Объединять ФИО/УЗ, совпадающие без учёта регистра, лишних пробелов,
+            ё/е и домена в УЗ ('DOMAIN\\user', 'user@domain').
+        fill_missing: Искать для строки с пустым УЗ (или ФИО) сотрудника с тем же ФИО (УЗ),
+            если такой сотрудник один.
+        fill_missing_merge: Относить такую строку к найденному сотруднику автоматически; иначе
+            пара только попадает в отчёт. Единственный видимый сотрудник с этим ФИО может
+            оказаться однофамильцем того, чей УЗ не заполнен.
+        merge_same_login: Объединять записи с одним УЗ, если ФИО совпадают с точностью
+            до инициалов ('Иванов И.И.' и 'Иванов Иван Иванович').
+        fuzzy: Искать ФИО, которые различаются одной опечаткой в одном слове
+            (замена, пропуск, лишняя буква или перестановка соседних букв).
+        fuzzy_merge: Объединять похожие ФИО автоматически; иначе они только попадают в отчёт.
+        max_block_size: Блоки индекса больше этого размера пропускаются: частая фамилия
+            не должна давать квадратичного числа сравнений.
+        minhash_bands: Число полос MinHash.
+        minhash_rows: Хэшей в полосе MinHash; больше — строже отбор кандидатов.
+    """
+    enabled: bool = False
+    normalize: bool = True
+    fill_missing: bool = True
+    fill_missing_merge: bool = False
+    merge_same_login: bool = True
+    fuzzy: bool = True
+    fuzzy_merge: bool = False
+    max_block_size: int = 100
+    minhash_bands: int = 8
+    minhash_rows: int = 4
+
+    @classmethod
+    def from_config(cls, section: dict | None) -> "IdentityRules":
+        """
+        Правила из раздела config.json; отсутствующие ключи — по умолчанию.
+
+        Raises:
+            ValueError: Неизвестный ключ раздела.
+        """
+        section = section or {}
+        types = {field.name: field.type for field in fields(cls)}
+        unknown = sorted(set(section) - set(types))
+        if unknown:
+            raise ValueError(f"Неизвестные правила IDENTITY: {', '.join(unknown)}")
+        return cls(**{name: _coerce(name, value, types[name]) for name, value in section.items()})
+
+
+def _coerce(name: str, value, kind: type):
+    """Значение правила нужного типа; окно настроек может сохранить его строкой ('False', '50')."""
+    if kind is bool:
+        if isinstance(value, str) and value.strip().lower() in ("true", "false", "1", "0"):
+            return value.strip().lower() in ("true", "1")
+        if isinstance(value, (bool, int)):
+            return bool(value)
+    else:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            pass
+    raise ValueError(f"Недопустимое значение правила IDENTITY {name}: {value!r}")
+
+
+def normalize_fio(values: pd.Series) -> pd.Series:
+    """ФИО в нижнем регистре, ё -> е, знаки препинания и лишние пробелы убраны."""
+    return (values.astype(object).fillna("").astype(str).str.lower().str.replace("ё", "е")
+            .str.replace(r"[^0-9a-zа-я]+", " ", regex=True).str.strip())
+
+
+def normalize_login(values: pd.Series) -> pd.Series:
+    """УЗ в нижнем регистре, без домена ('DOMAIN\\user', 'user@domain') и пробелов."""
+    return (values.astype(object).fillna("").astype(str).str.lower().str.replace("ё", "е")
+            .str.replace(r"^.*\\", "", regex=True).str.replace(r"@.*$", "", regex=True)
+            .str.replace(r"\s+", "", regex=True))
+
+
+def _one_edit(x: str, y: str) -> bool:
+    """Слова различаются одной заменой, пропуском, лишней буквой или перестановкой соседних букв."""
+    if abs(len(x) - len(y)) > 1 or x == y:
+        return False
+    if len(x) > len(y):
+        x, y = y, x
+    i = 0
+    while i < len(x) and x[i] == y[i]:
+        i += 1
+    if len(x) < len(y):
+        return x[i:] == y[i + 1:]
+    return x[i + 1:] == y[i + 1:] or (x[i + 1:i + 2] == y[i:i + 1] and x[i] == y[i + 1]
+                                       and x[i + 2:] == y[i + 2:])
+
+
+def _name_differences(a: list[str], b: list[str]) -> int | None:
+    """
+    Сколько слов ФИО различаются опечаткой: фамилия, имя и отчество сравниваются попарно,
+    имя и отчество могут быть инициалами. None — ФИО разные.
+    """
+    if len(a) < 2 or len(b) < 2:
+        return None
+    typos = 0
+    for position, (x, y) in enumerate(zip(a[:3], b[:3])):
+        if x == y or (position > 0 and (len(x) == 1 or len(y) == 1) and x[0] == y[0]):
+            continue
+        if min(len(x), len(y)) < 3 or not _one_edit(x, y):
+            return None
+        typos += 1
+    return typos
+
+
+def _dice(a: set, b: set) -> float:
+    return 2 * len(a & b) / (len(a) + len(b)) if a or b else 0.0
+
+
+class _DisjointSet:
+    """Система непересекающихся множеств с сжатием путей."""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        root = item
+        while parent[root] != root:
+            root = parent[root]
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, a: int, b: int) -> bool:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        # Корень — меньший номер, то есть запись, встретившаяся раньше
+        if b < a:
+            a, b = b, a
+        self.parent[b] = a
+        return True
+
+    def roots(self) -> np.ndarray:
+        return np.array([self.find(item) for item in range(len(self.parent))], dtype=np.int64)
+
+
+def _match_kind(item: int, target: int, fio: np.ndarray, login: np.ndarray) -> str:
+    """Почему написание item сведено к написанию target (для отчёта)."""
+    if fio[item] == fio[target] and login[item] == login[target]:
+        return "normalized"
+    if not fio[item] or not login[item]:
+        return "missing"
+    if login[item] == login[target]:
+        return "same_login"
+    return "similar"
+
+
+def _ngrams(text: str) -> set[str]:
+    padded = f" {text} "
+    return {padded[i:i + _NGRAM] for i in range(len(padded) - _NGRAM + 1)}
+
+
+def _minhash_buckets(texts: list[str], bands: int, rows: int) -> np.ndarray:
+    """
+    Ключи полос MinHash по триграммам каждой строки: массив (строки, полосы).
+    Похожие строки с высокой вероятностью совпадают хотя бы в одной полосе.
+    Одинаковые строки и триграммы хэшируются один раз.
+    """
+    unique_texts, inverse = np.unique(np.asarray(texts, dtype=object), return_inverse=True)
+    gram_hashes: dict[str, int] = {}
+    hashes, lengths = [], []
+    for text in unique_texts:
+        grams = _ngrams(text)
+        lengths.append(len(grams))
+        for gram in grams:
+            value = gram_hashes.get(gram)
+            if value is None:
+                value = gram_hashes[gram] = zlib.crc32(gram.encode("utf-8"))
+            hashes.append(value)
+    hashes = np.array(hashes, dtype=np.uint64)
+    starts = np.r_[0, np.cumsum(lengths)[:-1]]
+
+    rng = np.random.default_rng(0)
+    count = bands * rows
+    a = rng.integers(1, 1 << 31, count, dtype=np.uint64)
+    b = rng.integers(0, 1 << 31, count, dtype=np.uint64)
+    signatures = np.empty((len(unique_texts), count), dtype=np.uint64)
+    for k in range(count):
+        signatures[:, k] = np.minimum.reduceat((a[k] * hashes + b[k]) % _PRIME, starts)
+    # Полоса — rows подряд идущих хэшей, сведённых в одно число
+    banded = signatures.reshape(len(unique_texts), bands, rows)
+    keys = np.zeros((len(unique_texts), bands), dtype=np.uint64)
+    for r in range(rows):
+        keys = keys * np.uint64(1_000_003) + banded[:, :, r]
+    return keys[inverse.ravel()]
+
+
+def _block_pairs(blocks: dict, has_login: np.ndarray, max_block_size: int
+                 ) -> tuple[set[tuple[int, int]], int]:
+    """
+    Пары записей внутри блоков; блоки больше max_block_size пропускаются.
+    В блоках ФИО пары с двумя разными непустыми УЗ не составляются: это разные сотрудники.
+    """
+    pairs = set()
+    skipped = 0
+    for (kind, *_), members in blocks.items():
+        if len(members) < 2:
+            continue
+        if kind == "login":
+            candidates = combinations(members, 2)
+        else:
+            missing = [item for item in members if not has_login[item]]
+            if not missing:
+                continue
+            present = [item for item in members if has_login[item]]
+            candidates = chain(combinations(missing, 2), product(missing, present))
+        if len(members) > max_block_size:
+            skipped += 1
+            continue
+        pairs.update((a, b) if a < b else (b, a) for a, b in candidates)
+    return pairs, skipped
+
+
+def resolve_identities(df: pd.DataFrame, rules: IdentityRules) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Сопоставление сотрудников: записи одного сотрудника, которые различаются написанием
+    'ФИО'/'УЗ' (регистр, пробелы, ё/е, домен в УЗ, инициалы вместо имени, пустой УЗ),
+    получают одно написание — самое частое среди полных пар 'ФИО'/'УЗ' сотрудника, —
+    и дальше smart_merge объединяет их как дубликаты.
+
+    Сравниваются не строки, а уникальные пары 'ФИО'/'УЗ', и не все со всеми, а только
+    внутри блоков индекса: УЗ без домена, фамилия с инициалами и полосы MinHash
+    по триграммам ФИО. Записи с разными непустыми УЗ считаются разными сотрудниками
+    и в пары не составляются. Поэтому время растёт почти линейно с числом строк.
+
+    Args:
+        df: Таблица со столбцами 'ФИО' и 'УЗ'.
+        rules: Правила сопоставления.
+
+    Returns:
+        Таблица с приведёнными 'ФИО'/'УЗ' и отчёт сопоставления: по строке на каждое
+        изменённое написание и на каждую пару, оставленную на проверку.
+    """
+    keys = df[[FIO, LOGIN]].reset_index(drop=True)
+    codes = keys.groupby([FIO, LOGIN], sort=False, dropna=False, observed=True).ngroup().to_numpy()
+    first_rows = np.unique(codes, return_index=True)[1]
+    uniques = keys.iloc[first_rows].reset_index(drop=True)
+    counts = np.bincount(codes, minlength=len(uniques))
+    fio = normalize_fio(uniques[FIO]).to_numpy(dtype=object)
+    login = normalize_login(uniques[LOGIN]).to_numpy(dtype=object)
+    complete = uniques.notna().all(axis=1).to_numpy()
+
+    sets = _DisjointSet(len(uniques))
+    review = []
+
+    # Одинаковые после нормализации
+    if rules.normalize:
+        first_of = {}
+        for item, key in enumerate(zip(fio, login)):
+            if key in first_of:
+                sets.union(first_of[key], item)
+            else:
+                first_of[key] = item
+
+    # Пустой УЗ или ФИО: единственный сотрудник с тем же ФИО или УЗ
+    if rules.fill_missing:
+        for present, missing in ((fio, login), (login, fio)):
+            owners: dict[str, set] = {}
+            for item in np.flatnonzero((present != "") & (missing != "")):
+                owners.setdefault(present[item], set()).add(sets.find(item))
+            for item in np.flatnonzero((present != "") & (missing == "")):
+                candidates = owners.get(present[item], set())
+                if len(candidates) == 1:
+                    owner = next(iter(candidates))
+                    if rules.fill_missing_merge:
+                        sets.union(owner, item)
+                    else:
+                        review.append((item, owner, "missing"))
+
+    # Кандидаты по блокам индекса: по одному представителю на сотрудника
+    if rules.merge_same_login or rules.fuzzy:
+        roots = sets.roots()
+        representatives = np.flatnonzero(roots == np.arange(len(roots)))
+        tokens = {item: fio[item].split() for item in representatives}
+        blocks: dict[tuple, list[int]] = {}
+        for item in representatives:
+            if login[item]:
+                blocks.setdefault(("login", login[item]), []).append(item)
+            if len(tokens[item]) >= 2:
+                initials = "".join(token[0] for token in tokens[item][1:3])
+                blocks.setdefault(("name", tokens[item][0], initials), []).append(item)
+        if rules.fuzzy:
+            named = [item for item in representatives if fio[item]]
+            if named:
+                buckets = _minhash_buckets([fio[item] for item in named],
+                                           rules.minhash_bands, rules.minhash_rows)
+                for item, row in zip(named, buckets):
+                    for band, key in enumerate(row):
+                        blocks.setdefault(("minhash", band, int(key)), []).append(item)
+
+        pairs, skipped = _block_pairs(blocks, login != "", rules.max_block_size)
+        if skipped:
+            logging.info(f"Блоков индекса больше {rules.max_block_size} записей пропущено: {skipped}")
+        logging.info(f"Сотрудников: {len(representatives)}, блоков: {len(blocks)}, "
+                     f"пар-кандидатов: {len(pairs)}")
+
+        for a, b in sorted(pairs):
+            if sets.find(a) == sets.find(b):
+                continue
+            same_login = bool(login[a]) and login[a] == login[b]
+            # Разные непустые УЗ — разные сотрудники, даже при одинаковых ФИО
+            if not same_login and login[a] and login[b]:
+                continue
+            differences = _name_differences(tokens[a], tokens[b])
+            if same_login and differences == 0:
+                if rules.merge_same_login:
+                    sets.union(a, b)
+            elif differences is not None and rules.fuzzy:
+                if rules.fuzzy_merge and differences:
+                    sets.union(a, b)
+                else:
+                    review.append((a, b, "similar"))
+            elif same_login:
+                review.append((a, b, "login_conflict"))
+
+    roots = sets.roots()
+    # Пара на проверку — одна на пару сотрудников, и только если они так и остались разными
+    seen = set()
+    unique_review = []
+    for a, b, kind in review:
+        pair = frozenset((roots[a], roots[b]))
+        if len(pair) == 2 and pair not in seen:
+            seen.add(pair)
+            unique_review.append((a, b, kind))
+    review = unique_review
+
+    # Написание сотрудника — самая частая полная пара, при равенстве — встреченная раньше
+    order = np.lexsort((np.arange(len(roots)), -counts, ~complete, roots))
+    canonical = np.empty(len(roots), dtype=np.int64)
+    group_starts = np.flatnonzero(np.r_[True, roots[order][1:] != roots[order][:-1]])
+    chosen = order[group_starts]
+    canonical[roots[chosen]] = chosen
+    target = canonical[roots]
+    # Сотрудник без единой полной пары остаётся как есть
+    target = np.where(complete[target], target, np.arange(len(roots)))
+
+    changed = np.flatnonzero(target != np.arange(len(roots)))
+    names = uniques[FIO].to_numpy(dtype=object)
+    accounts = uniques[LOGIN].to_numpy(dtype=object)
+    report_rows = []
+    for item in changed:
+        kind = _match_kind(item, target[item], fio, login)
+        report_rows.append({
+            "Действие": "объединено", "Правило": MATCH_KINDS[kind],
+            "ФИО": names[item], "УЗ": accounts[item],
+            "ФИО (итог)": names[target[item]], "УЗ (итог)": accounts[target[item]],
+            "Сходство": None, "Строк": int(counts[item]),
+        })
+    for a, b, kind in review:
+        similarity = _dice(_ngrams(fio[a]), _ngrams(fio[b]))
+        report_rows.append({
+            "Действие": "проверить", "Правило": MATCH_KINDS[kind],
+            "ФИО": names[a], "УЗ": accounts[a], "ФИО (итог)": names[b], "УЗ (итог)": accounts[b],
+            "Сходство": round(similarity, 3),
+            "Строк": int(counts[a] + counts[b]),
+        })
+    report = pd.DataFrame(report_rows, columns=[
+        "Действие", "Правило", "ФИО", "УЗ", "ФИО (итог)", "УЗ (итог)", "Сходство", "Строк"])
+    logging.info(f"Сопоставление сотрудников: изменено написаний {len(changed)}, "
+                 f"строк {int(counts[changed].sum())}, на проверку {len(review)}")
+
+    if not len(changed):
+        return df, report
+    row_target = target[codes]
+    df = df.copy(deep=False)
+    for column in (FIO, LOGIN):
+        values = uniques[column].to_numpy(dtype=object)[row_target]
+        series = df[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            new_column = pd.Series(pd.Categorical(values), index=df.index, name=column)
+        else:
+            new_column = pd.Series(pd.array(values, dtype=series.dtype), index=df.index, name=column)
+        df[column] = new_column
+    return df, report
@@ -0,0 +1,211 @@
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import functions
+import xlsx_tables
+from checkpoints import load_checkpoint, save_checkpoint
+from functions import MERGE_KEYS, combine_columns_by_replace_keys, smart_merge
+from table_cache import file_digest
+
+# Увеличивается при изменении формата манифеста
+MANIFEST_VERSION = 1
+
+_MANIFEST_NAME = "manifest.pkl"
+
+
+def _logic_fingerprint(config) -> str:
+    """Отпечаток настроек и логики обработки: при его изменении нужна полная пересборка."""
+    settings = {key: getattr(config, key) for key in
+                ("RENAME_MAP", "REPLACE_ENERGYMAIN", "REPLACE_ACCESS", "MODULES", "DTYPES",
+                 "IDENTITY")}
+    return hashlib.sha256("\n".join([
+        str(MANIFEST_VERSION),
+        pd.__version__,
+        json.dumps(settings, sort_keys=True, ensure_ascii=False, default=str),
+        inspect.getsource(functions),
+        inspect.getsource(xlsx_tables),
+    ]).encode("utf-8")).hexdigest()
+
+
+def _key_index(df: pd.DataFrame) -> pd.MultiIndex:
+    return pd.MultiIndex.from_arrays([df[key] for key in MERGE_KEYS], names=MERGE_KEYS)
+
+
+def _in_keys(df: pd.DataFrame, keys: set) -> np.ndarray:
+    """Маска строк, ключ ('ФИО', 'УЗ') которых входит в keys."""
+    if not keys:
+        return np.zeros(len(df), dtype=bool)
+    return _key_index(df).isin(list(keys))
+
+
+def _keys_by_file(df: pd.DataFrame, row_files: np.ndarray) -> dict[str, set]:
+    """Ключи ('ФИО', 'УЗ'), которые дал каждый файл; строки с пустым ключом не учитываются."""
+    keys = df[MERGE_KEYS].reset_index(drop=True)
+    keys["_file"] = row_files
+    keys = keys[keys[MERGE_KEYS].notna().all(axis=1)].drop_duplicates()
+    return {
+        path: set(zip(*(group[key] for key in MERGE_KEYS)))
+        for path, group in keys.groupby("_file", sort=False)
+    }
+
+
+class IncrementalState:
+    """
+    Состояние инкрементальной обработки: манифест предыдущего запуска и его результаты.
+
+    Манифест хранит отпечаток каждого входного файла (размер и хэш содержимого) и ключи
+    ('ФИО', 'УЗ') строк, которые файл дал в объединённую таблицу. При следующем запуске
+    затронутыми считаются ключи удалённых и изменённых файлов (старые) и новых и изменённых
+    файлов (текущие). smart_merge и объединение столбцов пересчитываются только для
+    затронутых групп, остальные группы берутся из результата прошлого запуска.
+    Порядок групп и индекс — как у полной сборки.
+
+    Полная сборка выполняется, если состояния нет, изменились настройки или код обработки,
+    или имена столбцов повторяются.
+
+    Объект можно использовать для нескольких запусков подряд (режим наблюдения за каталогом):
+    результаты последнего запуска тогда берутся из памяти, а хэш файла пересчитывается,
+    только если изменились его размер или время изменения.
+
+    Args:
+        folder: Каталог состояния (манифест и контрольные точки прошлого запуска).
+        config: Настройки обработки, входят в отпечаток.
+    """
+
+    def __init__(self, folder, config):
+        self.folder = Path(folder)
+        self.fingerprint = _logic_fingerprint(config)
+        self.manifest = self._load_manifest()
+        self._files: dict[str, dict] = {}
+        self._previous: dict[str, pd.DataFrame] = {}
+        self._digests: dict[str, tuple[int, int, str]] = {}
+
+    def _digest(self, path: str) -> tuple[int, str]:
+        """Размер и хэш содержимого файла; хэш не пересчитывается для неизменённого файла."""
+        stat = os.stat(path)
+        known = self._digests.get(path)
+        if known is None or known[:2] != (stat.st_size, stat.st_mtime_ns):
+            known = self._digests[path] = (stat.st_size, stat.st_mtime_ns, file_digest(Path(path)))
+        return known[0], known[2]
+
+    def _load_manifest(self):
+        path = self.folder / _MANIFEST_NAME
+        try:
+            with open(path, "rb") as f:
+                manifest = pickle.load(f)
+        except FileNotFoundError:
+            logging.info(f"Состояние инкрементальной обработки в {self.folder} не найдено")
+            return None
+        except Exception as e:
+            logging.warning(f"Повреждённый манифест {path} пропущен: {e}")
+            return None
+        if manifest.get("fingerprint") != self.fingerprint:
+            logging.info("Настройки или код обработки изменились, нужна полная сборка")
+            return None
+        return manifest
+
+    def affected_keys(self, df: pd.DataFrame, row_files: np.ndarray) -> set | None:
+        """
+        Запоминает текущие входные файлы и возвращает затронутые ключи ('ФИО', 'УЗ').
+
+        Args:
+            df: Объединённая таблица всех модулей после замен (до smart_merge).
+            row_files: Путь к исходному файлу для каждой строки df.
+
+        Returns:
+            Множество затронутых ключей или None, если нужна полная сборка.
+        """
+        keys_by_file = _keys_by_file(df, row_files)
+        self._files = {}
+        for path in map(str, dict.fromkeys(row_files)):
+            size, digest = self._digest(path)
+            self._files[path] = {"size": size, "digest": digest, "keys": keys_by_file.get(path, set())}
+
+        if self.manifest is None:
+            return None
+        if not self._previous:
+            try:
+                self._previous = {stage: load_checkpoint(self.folder, stage)
+                                  for stage in ("merge", "combine_columns")}
+            except FileNotFoundError as e:
+                logging.info(f"{e} Нужна полная сборка")
+                return None
+        if not all(frame.columns.is_unique for frame in (df, *self._previous.values())):
+            logging.info("Имена столбцов повторяются, нужна полная сборка")
+            return None
+
+        previous = self.manifest["files"]
+        affected = set()
+        changed = 0
+        for path in previous.keys() | self._files.keys():
+            old, new = previous.get(path), self._files.get(path)
+            if old is not None and new is not None and \
+                    (old["size"], old["digest"]) == (new["size"], new["digest"]):
+                continue
+            changed += 1
+            for entry in (old, new):
+                if entry is not None:
+                    affected |= entry["keys"]
+
+        logging.info(f"Изменено входных файлов: {changed}, затронуто групп 'ФИО'/'УЗ': {len(affected)}")
+        return affected
+
+    def _splice(self, df: pd.DataFrame, stage: str, fresh: pd.DataFrame,
+                affected: set) -> pd.DataFrame:
+        """
+        Собирает результат из незатронутых групп прошлого запуска и пересчитанных групп.
+        Порядок групп и индекс (метка первой строки группы) берутся из df, как в smart_merge.
+        """
+        first_labels = df.index.to_series().groupby(
+            [df[key] for key in MERGE_KEYS], sort=True, dropna=True, observed=True).first()
+
+        previous = self._previous[stage]
+        kept = previous[~_in_keys(previous, affected)].reindex(columns=fresh.columns)
+        # Пустые части не участвуют в concat, чтобы не менять типы столбцов
+        parts = [part for part in (kept, fresh) if len(part)] or [fresh]
+        result = pd.concat(parts) if len(parts) > 1 else parts[0].copy(deep=False)
+        result.index = _key_index(result)
+        result = result.reindex(first_labels.index)
+        result.index = first_labels.to_numpy()
+
+        # Типы столбцов — как при полной сборке: у пересчитанных групп, а если их нет —
+        # как у исходной таблицы (groupby().first() тип столбца не меняет)
+        dtypes = fresh.dtypes if len(fresh) else df.dtypes
+        return result.astype({col: dtype for col, dtype in dtypes.items() if col in result.columns})
+
+    def merge(self, df: pd.DataFrame, affected: set, rename_map: dict[str, str]) -> pd.DataFrame:
+        """smart_merge только для затронутых групп."""
+        fresh = smart_merge(df[_in_keys(df, affected)], rename_map)
+        return self._splice(df, "merge", fresh, affected)
+
+    def combine(self, df: pd.DataFrame, merged: pd.DataFrame, affected: set,
+                replace_keys: list[str], config) -> pd.DataFrame:
+        """Объединение столбцов только для строк затронутых групп."""
+        fresh = combine_columns_by_replace_keys(
+            merged[_in_keys(merged, affected)], replace_keys, config)
+        return self._splice(df, "combine_columns", fresh, affected)
+
+    def save(self, merged: pd.DataFrame, combined: pd.DataFrame) -> None:
+        """Сохраняет результаты запуска и манифест (манифест — последним)."""
+        os.makedirs(self.folder, exist_ok=True)
+        save_checkpoint(merged, self.folder, "merge")
+        save_checkpoint(combined, self.folder, "combine_columns")
+
+        manifest = {"version": MANIFEST_VERSION, "fingerprint": self.fingerprint,
+                    "files": self._files}
+        path = self.folder / _MANIFEST_NAME
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(manifest, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self.manifest = manifest
+        self._previous = {"merge": merged, "combine_columns": combined}
+        logging.info(f"Состояние инкрементальной обработки сохранено: {self.folder}")
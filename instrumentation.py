@@ -0,0 +1,207 @@
+import cProfile
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss() -> Optional[int]:
+    """Пиковый объём резидентной памяти процесса в байтах (None, если недоступно)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # В Linux ru_maxrss в килобайтах, в macOS — в байтах
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _frame_bytes(frames) -> Optional[int]:
+    """Память, занятая данными таблицы или списка таблиц (memory_usage(deep=True))."""
+    if frames is None:
+        return None
+    if hasattr(frames, "shape"):
+        frames = [frames]
+    return int(sum(frame.memory_usage(index=True, deep=True).sum() for frame in frames))
+
+
+def _frame_shape(frames) -> tuple[Optional[int], Optional[int]]:
+    """Число строк и столбцов таблицы или списка таблиц (строки суммируются)."""
+    if frames is None:
+        return None, None
+    if hasattr(frames, "shape"):
+        frames = [frames]
+    frames = list(frames)
+    rows = sum(frame.shape[0] for frame in frames)
+    columns = max((frame.shape[1] for frame in frames), default=0)
+    return rows, columns
+
+
+@dataclass
+class StageRecord:
+    """Замеры одного этапа обработки."""
+    stage: str
+    module: Optional[str] = None
+    started_at: str = ""
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    rows_in: Optional[int] = None
+    columns_in: Optional[int] = None
+    rows_out: Optional[int] = None
+    columns_out: Optional[int] = None
+    frame_bytes_out: Optional[int] = None
+    memory_delta: Optional[int] = None
+    memory_peak: Optional[int] = None
+    peak_rss: Optional[int] = None
+    profile_path: Optional[str] = None
+    # memory_usage(deep=True) проходит все строковые значения таблицы: только по запросу
+    measure_bytes: bool = field(default=True, repr=False)
+
+    def set_input(self, frames) -> None:
+        """Запоминает размер входных данных этапа (таблица или список таблиц)."""
+        self.rows_in, self.columns_in = _frame_shape(frames)
+
+    def set_output(self, frames) -> None:
+        """
+        Запоминает размер результата этапа (таблица или список таблиц) и, если включено
+        measure_bytes, занятую им память.
+        """
+        self.rows_out, self.columns_out = _frame_shape(frames)
+        if self.measure_bytes:
+            self.frame_bytes_out = _frame_bytes(frames)
+
+    def to_dict(self) -> dict:
+        record = asdict(self)
+        del record["measure_bytes"]
+        return record
+
+
+@dataclass
+class RunReport:
+    """
+    Собирает замеры этапов запуска: время (настенное и процессорное), память
+    (прирост и пик по tracemalloc, пиковый RSS процесса) и размеры данных на входе и выходе.
+
+    Args:
+        trace_memory: Замерять память этапов: tracemalloc и память результата каждого этапа.
+            Заметно замедляет обработку больших таблиц, поэтому выключено по умолчанию.
+        profile_stage: Имя этапа, для которого сохраняется дамп cProfile.
+        profile_dir: Каталог для дампов cProfile.
+        listener: Получатель событий хода обработки (словари с ключом "event"): начало
+            и конец этапов, найденные и загруженные файлы, доля выполненной работы.
+            Исключение из listener прерывает обработку — так работает отмена запуска.
+    """
+    trace_memory: bool = False
+    profile_stage: Optional[str] = None
+    profile_dir: Optional[Path] = None
+    listener: Optional[Callable[[dict], None]] = field(default=None, repr=False)
+    stages: list[StageRecord] = field(default_factory=list)
+    started_at: str = field(default_factory=lambda: datetime.now().isoformat(timespec="seconds"))
+
+    _started_tracing: bool = field(default=False, init=False, repr=False)
+
+    def __post_init__(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        """
+        Выключает tracemalloc, если его включил этот отчёт: в постоянном процессе
+        следующие запуски не должны замедляться из-за замеров предыдущего.
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def event(self, kind: str, **data) -> None:
+        """Передаёт событие хода обработки получателю listener, если он задан."""
+        if self.listener is not None:
+            self.listener({"event": kind, **data})
+
+    @contextmanager
+    def stage(self, name: str, module: Optional[str] = None, inputs=None):
+        """
+        Замеряет этап обработки.
+
+        Пример:
+            with report.stage("smart_merge", inputs=df) as stage:
+                df = smart_merge(df, RENAME_MAP)
+                stage.set_output(df)
+        """
+        record = StageRecord(stage=name, module=module,
+                             started_at=datetime.now().isoformat(timespec="seconds"),
+                             measure_bytes=self.trace_memory)
+        record.set_input(inputs)
+        self.event("stage_started", stage=name, module=module, rows_in=record.rows_in)
+
+        profiler = None
+        if self.profile_stage == name:
+            profiler = cProfile.Profile()
+
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            memory_before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record.wall_time = round(time.perf_counter() - wall_start, 6)
+            record.cpu_time = round(time.process_time() - cpu_start, 6)
+            if tracing:
+                memory_after, memory_peak = tracemalloc.get_traced_memory()
+                record.memory_delta = memory_after - memory_before
+                record.memory_peak = memory_peak - memory_before
+            record.peak_rss = _peak_rss()
+            if profiler is not None:
+                record.profile_path = str(self._dump_profile(profiler, record))
+
+            self.stages.append(record)
+            logging.info(
+                "Этап %s%s: %.3f с (CPU %.3f с), строк %s -> %s, данные %s",
+                name, f" [{module}]" if module else "", record.wall_time,
+                record.cpu_time, record.rows_in, record.rows_out,
+                "-" if record.frame_bytes_out is None else f"{record.frame_bytes_out / 2 ** 20:.2f} МБ")
+        # Только для успешно завершённых этапов: ошибку этапа событие не должно подменять
+        self.event("stage_finished", **record.to_dict())
+
+    def _dump_profile(self, profiler: cProfile.Profile, record: StageRecord) -> Path:
+        profile_dir = Path(self.profile_dir or ".")
+        os.makedirs(profile_dir, exist_ok=True)
+        suffix = f" {record.module}" if record.module else ""
+        timestamp = datetime.now().strftime('%Y-%m-%d %H-%M-%S')
+        path = profile_dir / f"profile {record.stage}{suffix} {timestamp}.prof"
+        profiler.dump_stats(str(path))
+        return path
+
+    def to_dict(self) -> dict:
+        return {
+            "started_at": self.started_at,
+            "trace_memory": self.trace_memory,
+            "total_wall_time": round(sum(s.wall_time for s in self.stages), 6),
+            "peak_rss": _peak_rss(),
+            "stages": [s.to_dict() for s in self.stages],
+        }
+
+    def save(self, path) -> None:
+        """Сохраняет отчёт в JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=4, ensure_ascii=False)
+        logging.info("Отчёт о производительности сохранён: %s", path)
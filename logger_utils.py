@@ -1,5 +1,7 @@
 import logging
+import time
 from functools import wraps
+from pathlib import PurePath
 
 log_file_path = None
 
@@ -24,26 +26,75 @@ def set_log_level(level: int):
     else:
         log_level = logging.DEBUG
 
+    # force: при повторном запуске обработки в том же процессе лог пишется в новый файл
     logging.basicConfig(
         filename=log_file_path,
         level=log_level,
-        format="%(asctime)s - %(levelname)s - %(message)s"
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        force=True
     )
 
 
+# Строки и коллекции длиннее этого порога в лог не выводятся целиком
+_MAX_REPR_LENGTH = 200
+
+
+def _summarize_arg(value) -> str:
+    """
+    Краткое описание аргумента для лога. Таблицы не выводятся целиком:
+    вместо repr пишутся размер, число столбцов и занимаемая память.
+    """
+    if hasattr(value, "shape") and hasattr(value, "memory_usage"):
+        rows = value.shape[0]
+        columns = value.shape[1] if len(value.shape) > 1 else 1
+        memory = value.memory_usage(index=True)
+        memory = memory.sum() if hasattr(memory, "sum") else memory
+        return f"<{type(value).__name__} {rows}x{columns}, {memory / 2 ** 20:.1f} МБ>"
+    if isinstance(value, PurePath):
+        return f"<путь {value}>"
+    if isinstance(value, (list, tuple)) and any(hasattr(item, "shape") for item in value):
+        items = ", ".join(_summarize_arg(item) for item in value[:3])
+        more = ", ..." if len(value) > 3 else ""
+        return f"<{type(value).__name__} из {len(value)}: {items}{more}>"
+
+    text = repr(value)
+    if len(text) > _MAX_REPR_LENGTH:
+        return f"{text[:_MAX_REPR_LENGTH]}... ({len(text)} символов)"
+    return text
+
+
+class _LazyArgs:
+    """Откладывает описание аргументов до момента, когда запись действительно пишется в лог."""
+
+    def __init__(self, args, kwargs):
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        parts = [_summarize_arg(arg) for arg in self.args]
+        parts += [f"{key}={_summarize_arg(value)}" for key, value in self.kwargs.items()]
+        return ", ".join(parts)
+
+
 def log_decorator(level=logging.INFO):
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            logging.log(
-                level, f"Вызов функции {func.__name__} с аргументами: {args}, {kwargs}")
+            logger = logging.getLogger()
+            enabled = logger.isEnabledFor(level)
+            if enabled:
+                logger.log(level, "Вызов функции %s с аргументами: %s",
+                           func.__name__, _LazyArgs(args, kwargs))
+            start = time.perf_counter()
             try:
                 result = func(*args, **kwargs)
-                logging.log(
-                    level, f"Функция {func.__name__} завершена успешно.")
-                return result
             except Exception as e:
-                logging.exception(f"Ошибка в функции {func.__name__}: {e}")
+                logger.exception("Ошибка в функции %s через %.3f с: %s",
+                                 func.__name__, time.perf_counter() - start, e)
                 raise
+            if enabled:
+                logger.log(level, "Функция %s завершена успешно за %.3f с.",
+                           func.__name__, time.perf_counter() - start)
+            return result
         return wrapper
     return decorator
@@ -1,130 +1,648 @@
+import argparse
+import hashlib
+import json
 import os
+import sqlite3
+import time
 from datetime import datetime
+import numpy as np
 import pandas as pd
 from functions import (
-    load_named_table,
+    discover_input_files,
+    load_indexed_tables,
+    normalize_columns,
     combine_dataframes,
+    compact_dtypes,
     save_dataframe_to_excel,
     smart_merge,
     apply_replacements,
-    combine_columns_by_replace_key
+    combine_columns_by_replace_keys
 )
 from logger_utils import (set_log_file_path, set_log_level)
 from config_manager import config
+from instrumentation import RunReport
+from table_cache import TableCache
+from schema import schemas
+from checkpoints import save_checkpoint, load_checkpoint
+from export_queue import ExportQueue
+from incremental import IncrementalState
+from identity import IdentityRules, resolve_identities
+from config_check import check_config
+from sqlite_store import DEFAULT_TABLE, export_to_sqlite
+from pipeline import RunCancelled, RunResult
 from pathlib import Path
 import logging
 
 # --- Константы ---
+# Каталоги по умолчанию; входной каталог можно задать и переменной окружения INPUT_FOLDER
 INPUT_FOLDER = config.ROOT / "Обрабатываемые"
 PROCESSED_FOLDER = config.ROOT / "Обработанные"
 LOG_FOLDER = config.ROOT / "log"
+CACHE_FOLDER = config.ROOT / "cache"
+CHECKPOINT_FOLDER = config.ROOT / "checkpoints"
+INCREMENTAL_FOLDER = config.ROOT / "incremental"
+# Разобранные сигнатуры заголовков (SchemaRegistry) между запусками, в каталоге кэша
+SCHEMA_FILE = "schemas.json"
 
-# Создаем папку для обработанных файлов
-os.makedirs(PROCESSED_FOLDER, exist_ok=True)
-os.makedirs(LOG_FOLDER, exist_ok=True)  # Создаем папку для логов
-
-log_filename = f"log {datetime.now().strftime('%Y-%m-%d %H-%M-%S')}.log"
-# Используем Path для формирования пути
-log_file_path = LOG_FOLDER / log_filename
-set_log_file_path(str(log_file_path))  # Конвертируем в строку перед передачей
-set_log_level(2)
 RENAME_MAP = config.RENAME_MAP
 REPLACE_ENERGYMAIN = config.REPLACE_ENERGYMAIN
 REPLACE_ACCESS = config.REPLACE_ACCESS
 MODULES = config.MODULES
-MERGE_REPLACEMENTS = {**REPLACE_ENERGYMAIN, **REPLACE_ACCESS}
 
+# Этапы обработки по порядку; после каждого сохраняется контрольная точка
+PIPELINE_STAGES = ["load", "replace", "merge", "combine_columns"]
+# Разделы config.json, от которых зависят данные контрольных точек
+CHECKPOINT_SETTINGS = ["RENAME_MAP", "REPLACE_ENERGYMAIN", "REPLACE_ACCESS", "MODULES", "DTYPES", "IDENTITY"]
+# Выгрузка в Excel: все промежуточные файлы, только итог или ничего
+EXCEL_EXPORTS = ["all", "final", "none"]
+# Ключи config, столбцы которых объединяются на этапе combine_columns
+COMBINE_KEYS = ["REPLACE_ENERGYMAIN", "REPLACE_ACCESS"]
+# Итоговый файл — результат объединения столбцов access
+FINAL_EXPORT = "итог_после_объединения_access"
+# Отчёт сопоставления сотрудников выгружается вместе с итогом
+MATCH_REPORT = "отчёт_сопоставления_сотрудников"
+# Движки обработки: pandas — по этапам, с контрольными точками; polars — один ленивый план
+# (polars_engine, импортируется только при выборе этого движка)
+ENGINES = ["pandas", "polars"]
+# Движок обработки по умолчанию (раздел PROCESSING в config.json)
+ENGINE = config.PROCESSING.get("engine", "pandas")
+# База SQLite с итоговой таблицей (раздел SQLITE в config.json): пустой путь — без базы,
+# относительный — от каталога выгрузок
+SQLITE_PATH = config.SQLITE.get("path") or None
+SQLITE_TABLE = config.SQLITE.get("table") or DEFAULT_TABLE
 
-# replace_energymain_keys = list(config.REPLACE_ENERGYMAIN.keys())
-# replace_access_keys = list(config.REPLACE_ACCESS.keys())
-# print(replace_energymain_keys)
 
-# --- Основная обработка ---
-all_dfs = []
-all_combined_data = []  # Для сохранения исходных данных до smart_merge
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Обработка опросных листов")
+    parser.add_argument("--input-folder", type=Path, default=None,
+                        help="каталог с опросными листами (по умолчанию — переменная окружения "
+                             "INPUT_FOLDER или папка 'Обрабатываемые')")
+    parser.add_argument("--output-folder", type=Path, default=None,
+                        help="каталог для выгрузок Excel (по умолчанию — папка 'Обработанные')")
+    parser.add_argument("--modules", nargs="+", choices=list(MODULES), default=None,
+                        help="обработать только эти модули")
+    parser.add_argument("--profile-stage", default=None,
+                        help="имя этапа, для которого сохраняется дамп cProfile в папку log")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="замерять память этапов (tracemalloc и память результатов); "
+                             "заметно замедляет обработку")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="число процессов для параллельного чтения опросных листов")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="не использовать кэш разобранных таблиц")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="очистить кэш разобранных таблиц и заполнить его заново")
+    parser.add_argument("--cache-size-mb", type=int, default=1024,
+                        help="предельный размер кэша разобранных таблиц, МБ")
+    parser.add_argument("--from-stage", choices=PIPELINE_STAGES, default=PIPELINE_STAGES[0],
+                        help="начать с этого этапа, взяв результат предыдущего из контрольной точки")
+    parser.add_argument("--until-stage", choices=PIPELINE_STAGES, default=PIPELINE_STAGES[-1],
+                        help="остановиться после этого этапа")
+    parser.add_argument("--excel", choices=EXCEL_EXPORTS, default="all",
+                        help="выгрузка в Excel: all — все промежуточные файлы, "
+                             "final — только итог, none — без выгрузки")
+    parser.add_argument("--export-workers", type=int, default=None,
+                        help="число процессов фоновой записи Excel; 0 — писать без очереди "
+                             "(по умолчанию до двух, в зависимости от числа ядер)")
+    parser.add_argument("--export-queue-mb", type=int, default=512,
+                        help="предельный объём таблиц, ожидающих записи в Excel, МБ")
+    parser.add_argument("--incremental", action="store_true",
+                        help="пересчитать smart_merge и объединение столбцов только для групп "
+                             "'ФИО'/'УЗ' из новых, изменённых и удалённых файлов")
+    parser.add_argument("--no-compact-dtypes", action="store_true",
+                        help="не переводить столбцы в компактные типы (category, даты, числа)")
+    parser.add_argument("--engine", choices=ENGINES, default=None,
+                        help="движок обработки: pandas — по этапам, с контрольными точками; "
+                             "polars — все этапы одним ленивым планом Polars "
+                             "(по умолчанию — engine из раздела PROCESSING в config.json)")
+    parser.add_argument("--sqlite", type=Path, default=SQLITE_PATH,
+                        help="записать итог в базу SQLite (upsert по 'ФИО' и 'УЗ'); относительный "
+                             "путь — от каталога выгрузок (по умолчанию — path из раздела SQLITE "
+                             "в config.json)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="только проверить config.json по заголовкам таблиц опросных листов, "
+                             "не читая данные: найденные таблицы, несовпавшие столбцы "
+                             "и столбцы результата")
+    # Объекты, которые переживают запуск (режим наблюдения за каталогом); задаются только из Python:
+    # TableCache для чтения таблиц и IncrementalState для --incremental
+    parser.set_defaults(table_cache=None, incremental_state=None)
+    return parser.parse_args(argv)
 
-for module_key, module_config in MODULES.items():
-    table_names = module_config["table_names"]
-    columns_to_remove = module_config["columns_to_remove"]
 
-    dfs = []
-    for filename in os.listdir(INPUT_FOLDER):
-        if not filename.endswith(".xlsx"):
-            continue
+def report_progress(report: RunReport, stage: str, part: float = 0.0) -> None:
+    """
+    Событие "progress" с долей выполненной работы: шкала делится поровну между этапами
+    PIPELINE_STAGES и ожиданием выгрузки Excel ("export"); part — доля текущего этапа.
+    """
+    steps = PIPELINE_STAGES + ["export"]
+    report.event("progress", stage=stage, fraction=(steps.index(stage) + part) / len(steps))
+
+
+def resolve_folders(args) -> None:
+    """Заполняет каталоги и модули, не заданные явно, значениями по умолчанию."""
+    if args.input_folder is None:
+        args.input_folder = os.environ.get("INPUT_FOLDER") or INPUT_FOLDER
+    args.input_folder = Path(args.input_folder)
+    args.output_folder = Path(args.output_folder or PROCESSED_FOLDER)
+    if args.modules is None:
+        args.modules = list(MODULES)
+    unknown = [module for module in args.modules if module not in MODULES]
+    if unknown:
+        raise ValueError(f"Неизвестные модули: {', '.join(unknown)}")
+
+
+def checkpoint_meta(args) -> dict:
+    """
+    Описание данных контрольных точек запуска: входной каталог, размер и время изменения
+    каждого файла выбранных модулей, модули и отпечаток настроек обработки.
+    С --from-stage контрольная точка загружается, только если описание совпадает.
+    """
+    modules = {module: MODULES[module] for module in args.modules}
+    paths = sorted({path for files in discover_input_files(args.input_folder, modules).values()
+                    for path in files})
+    settings = {key: getattr(config, key) for key in CHECKPOINT_SETTINGS}
+    settings["compact_dtypes"] = not args.no_compact_dtypes
+    return {
+        "input_folder": str(args.input_folder.resolve()),
+        "files": [[path.name, path.stat().st_size, path.stat().st_mtime_ns] for path in paths],
+        "modules": list(args.modules),
+        "settings": hashlib.sha256(json.dumps(
+            settings, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest(),
+    }
+
+
+def exported(excel: str, name: str) -> bool:
+    """Выгружается ли файл name при режиме выгрузки excel (EXCEL_EXPORTS)."""
+    return excel == "all" or (excel == "final" and name in (FINAL_EXPORT, MATCH_REPORT))
+
+
+def load_tables(args, report: RunReport) -> tuple[dict, dict]:
+    """
+    Чтение опросных листов: какие файлы и таблицы нужны каждому модулю
+    и разобранные таблицы каждого файла.
+    """
+    cache = args.table_cache
+    if cache is None and not args.no_cache:
+        cache = TableCache(CACHE_FOLDER, normalize_columns,
+                           max_bytes=args.cache_size_mb * 2 ** 20)
+        if args.rebuild_cache:
+            cache.clear()
+    if not args.no_cache:
+        schemas.load(CACHE_FOLDER / SCHEMA_FILE)
+        if args.rebuild_cache:
+            schemas.clear_stored()
 
-        if "~$" in filename or "log" in filename or "Обработано" in filename:
+    modules = {module: MODULES[module] for module in args.modules}
+
+    # Один проход по каталогу: какие файлы и таблицы нужны каждому модулю
+    with report.stage("discover"):
+        file_index = discover_input_files(args.input_folder, modules)
+    report.event("files_discovered",
+                 files=len({path for files in file_index.values() for path in files}),
+                 modules={module: {"files": len(files),
+                                   "tables": sum(len(names) for names in files.values())}
+                          for module, files in file_index.items()})
+
+    def file_loaded(path, done: int, total: int) -> None:
+        report.event("file_loaded", path=None if path is None else str(path), done=done, total=total)
+        report_progress(report, "load", done / total)
+
+    # Каждый файл открывается один раз, даже если он нужен нескольким модулям
+    with report.stage("load") as stage:
+        loaded_tables = load_indexed_tables(
+            file_index, workers=args.workers, cache=cache, progress=file_loaded)
+        stage.set_output([df for tables in loaded_tables.values()
+                          for df in tables.values()])
+    return file_index, loaded_tables
+
+
+def stage_load(args, report: RunReport, export, tables=None) -> tuple[pd.DataFrame | None, np.ndarray]:
+    """
+    Этап load: чтение опросных листов и объединение таблиц всех модулей в одну.
+    Кроме таблицы возвращает путь к исходному файлу для каждой её строки.
+    tables — уже прочитанные таблицы (load_tables), если они есть.
+    """
+    file_index, loaded_tables = tables or load_tables(args, report)
+    all_dfs = []
+    row_files = []
+    modules = {module: MODULES[module] for module in args.modules}
+
+    for module_key, module_config in modules.items():
+        columns_to_remove = module_config["columns_to_remove"]
+
+        dfs = []
+        for file_path, table_names in file_index[module_key].items():
+            for table_name in table_names:
+                dfs.append(loaded_tables[file_path][table_name])
+                row_files.append(np.repeat(str(file_path), len(dfs[-1])))
+
+        if not dfs:
+            print(f"Не загружено ни одной таблицы для модуля {module_key}")
+            logging.warning(
+                f"Не загружено ни одной таблицы для модуля {module_key}")
             continue
 
-        # Если ключ модуля не совпадает, пропускаем файл
-        if module_key not in filename:
+        # Объединяем все DataFrame
+        with report.stage("combine_dataframes", module=module_key, inputs=dfs) as stage:
+            combined_df = combine_dataframes(dfs, columns_to_remove, RENAME_MAP)
+            stage.set_output(combined_df)
+
+        # Промежуточный результат для каждого модуля
+        export(f"Обработано_{module_key}", combined_df)
+        all_dfs.append(combined_df)
+
+    if not all_dfs:
+        return None, np.array([], dtype=object)
+
+    # Объединяем все DataFrame в один
+    with report.stage("concat", inputs=all_dfs) as stage:
+        final_combined_df = pd.concat(all_dfs, ignore_index=True)
+        stage.set_output(final_combined_df)
+
+    # Повторяющиеся строки — в category, даты и числа — в родные типы (раздел DTYPES в config.json)
+    if not args.no_compact_dtypes:
+        with report.stage("compact_dtypes", inputs=final_combined_df) as stage:
+            final_combined_df = compact_dtypes(final_combined_df, config.DTYPES)
+            stage.set_output(final_combined_df)
+    return final_combined_df, np.concatenate(row_files)
+
+
+def stage_replace(df: pd.DataFrame, report: RunReport, export) -> pd.DataFrame:
+    """Этап replace: замены REPLACE_ENERGYMAIN и REPLACE_ACCESS за один проход."""
+    report_progress(report, "replace")
+    with report.stage("apply_replacements", inputs=df) as stage:
+        df = apply_replacements(df, REPLACE_ENERGYMAIN, REPLACE_ACCESS)
+        stage.set_output(df)
+    # Итоговый файл до применения smart_merge
+    export("итог_до_удаления_дубликатов", df)
+    return df
+
+
+def identity_rules() -> IdentityRules:
+    """
+    Правила сопоставления сотрудников перед smart_merge (раздел IDENTITY, по умолчанию выключено).
+    Разбираются при запуске, а не при импорте: ошибка в разделе не мешает импортировать main,
+    а проверка настроек (check_config) сообщает о ней заранее.
+    """
+    return IdentityRules.from_config(config.IDENTITY)
+
+
+def stage_merge(df: pd.DataFrame, report: RunReport, export) -> pd.DataFrame:
+    """
+    Этап merge: удаление дубликатов по 'ФИО' и 'УЗ'. Если включено сопоставление
+    сотрудников (IDENTITY), разные написания одного сотрудника сначала приводятся к одному.
+    """
+    report_progress(report, "merge")
+    rules = identity_rules()
+    if rules.enabled:
+        with report.stage("resolve_identities", inputs=df) as stage:
+            df, matches = resolve_identities(df, rules)
+            stage.set_output(df)
+        export(MATCH_REPORT, matches)
+    with report.stage("smart_merge", inputs=df) as stage:
+        df = smart_merge(df, RENAME_MAP)
+        stage.set_output(df)
+    export("итог_после_удаления_дубликатов", df)
+    return df
+
+
+def stage_combine_columns(df: pd.DataFrame, report: RunReport, export) -> pd.DataFrame:
+    """
+    Этап combine_columns: объединение столбцов energymain и access за один проход.
+    Контрольная точка хранит и исходные, и объединённые столбцы — из неё строятся обе выгрузки.
+    """
+    report_progress(report, "combine_columns")
+    with report.stage("combine_columns", inputs=df) as stage:
+        # combine_columns_by_replace_keys добавляет столбцы на месте, а снимок результата
+        # merge может ещё ждать выгрузки — работаем с поверхностной копией
+        df = combine_columns_by_replace_keys(
+            df.copy(deep=False), COMBINE_KEYS, config)
+        stage.set_output(df)
+
+    export_combined(df, export)
+    return df
+
+
+def export_combined(df: pd.DataFrame, export) -> None:
+    """Выгрузки после объединения столбцов energymain и access."""
+    energymain_columns = [
+        col for col in REPLACE_ENERGYMAIN if col in df.columns]
+    access_columns = [
+        col for col in REPLACE_ACCESS if col in df.columns]
+
+    # После объединения столбцов energymain
+    export("итог_после_объединения_energymain", df.drop(
+        columns=energymain_columns + ["REPLACE_ACCESS_combined"],
+        errors="ignore"))
+    # После объединения столбцов access: удаляем столбцы, которые были объединены
+    export(FINAL_EXPORT, df.drop(columns=energymain_columns + access_columns))
+
+
+def run_polars(args, tables: tuple[dict, dict], report: RunReport, export) -> pd.DataFrame | None:
+    """
+    Этапы после чтения таблиц одним ленивым планом Polars (polars_engine): склейка таблиц,
+    замены, smart_merge и объединение столбцов считаются без промежуточных таблиц pandas,
+    в pandas переводятся только выгружаемые в Excel результаты. Контрольные точки не сохраняются.
+
+    Raises:
+        polars_engine.EngineFallback: Данные, которые нужно обработать движком pandas;
+            до этого ничего не выгружается.
+    """
+    import polars_engine
+
+    file_index, loaded_tables = tables
+    module_tables = {}
+    for module_key in args.modules:
+        dfs = [loaded_tables[file_path][table_name]
+               for file_path, table_names in file_index[module_key].items()
+               for table_name in table_names]
+        if not dfs:
+            print(f"Не загружено ни одной таблицы для модуля {module_key}")
+            logging.warning(
+                f"Не загружено ни одной таблицы для модуля {module_key}")
             continue
+        module_tables[module_key] = dfs
+    if not module_tables:
+        return None
+
+    report_progress(report, "replace")
+    with report.stage("polars_plan"):
+        plan = polars_engine.build_plan(
+            module_tables, {module: MODULES[module]["columns_to_remove"] for module in module_tables},
+            RENAME_MAP, (REPLACE_ENERGYMAIN, REPLACE_ACCESS), COMBINE_KEYS, config)
+
+    # Промежуточные результаты собираются вместе с итогом, только если их выгружают
+    outputs = {f"Обработано_{module_key}": frame for module_key, frame in plan.modules.items()}
+    outputs["итог_до_удаления_дубликатов"] = plan.replaced
+    outputs["итог_после_удаления_дубликатов"] = plan.merged
+    names = [name for name in outputs if exported(args.excel, name)]
+    with report.stage("polars_collect") as stage:
+        *frames, combined = plan.collect([outputs[name] for name in names] + [plan.combined])
+        combined = polars_engine.to_pandas(combined)
+        stage.set_output(combined)
+
+    report_progress(report, "combine_columns")
+    for name, frame in zip(names, frames):
+        export(name, polars_engine.to_pandas(frame))
+    export_combined(combined, export)
+    return combined
+
+
+def select_engine(args, first: int, last: int) -> str:
+    """
+    Движок обработки: --engine или engine из раздела PROCESSING в config.json.
+    Движок polars выполняет обработку целиком, поэтому с --incremental, --from-stage
+    и --until-stage, при сопоставлении сотрудников (IDENTITY) и без пакета polars
+    работает движок pandas.
+    """
+    engine = args.engine or ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Неизвестный движок обработки: {engine}")
+    if engine == "pandas":
+        return engine
+    reason = None
+    if args.incremental or (first, last) != (0, len(PIPELINE_STAGES) - 1):
+        reason = "--incremental, --from-stage и --until-stage выполняются по этапам"
+    elif identity_rules().enabled:
+        reason = "сопоставление сотрудников (IDENTITY) выполняется в pandas"
+    else:
+        # polars загружается только здесь: запуски движком pandas его не импортируют
+        try:
+            import polars_engine  # noqa: F401
+        except ImportError as e:
+            reason = f"пакет polars не загружается ({e})"
+    if reason:
+        logging.warning(f"Движок polars не используется: {reason}. Обработка идёт движком pandas")
+        return "pandas"
+    return engine
+
+
+STAGE_FUNCTIONS = {
+    "replace": stage_replace,
+    "merge": stage_merge,
+    "combine_columns": stage_combine_columns,
+}
+
+
+def run_incremental(args, df: pd.DataFrame, row_files: np.ndarray, report: RunReport,
+                    export, meta: dict) -> pd.DataFrame:
+    """
+    Этапы replace, merge и combine_columns в инкрементальном режиме: smart_merge и объединение
+    столбцов пересчитываются только для затронутых групп, остальное берётся из прошлого запуска.
+    """
+    state = args.incremental_state or IncrementalState(INCREMENTAL_FOLDER, config)
+    df = stage_replace(df, report, export)
+    save_checkpoint(df, CHECKPOINT_FOLDER, "replace", meta)
+
+    affected = state.affected_keys(df, row_files)
+    if affected is not None and identity_rules().enabled:
+        # Новая строка может связать сотрудников из неизменённых файлов — пересчитываем всё
+        logging.info("Включено сопоставление сотрудников: smart_merge пересчитывается полностью")
+        affected = None
+    if affected is None:
+        merged = stage_merge(df, report, export)
+        save_checkpoint(merged, CHECKPOINT_FOLDER, "merge", meta)
+        combined = stage_combine_columns(merged, report, export)
+    else:
+        report_progress(report, "merge")
+        with report.stage("smart_merge_incremental", inputs=df) as stage:
+            merged = state.merge(df, affected, RENAME_MAP)
+            stage.set_output(merged)
+        export("итог_после_удаления_дубликатов", merged)
+        save_checkpoint(merged, CHECKPOINT_FOLDER, "merge", meta)
+
+        report_progress(report, "combine_columns")
+        with report.stage("combine_columns_incremental", inputs=merged) as stage:
+            combined = state.combine(df, merged, affected, COMBINE_KEYS, config)
+            stage.set_output(combined)
+        export_combined(combined, export)
+    save_checkpoint(combined, CHECKPOINT_FOLDER, "combine_columns", meta)
+    state.save(merged, combined)
+    return combined
+
+
+def run_stages(args, report: RunReport, export) -> pd.DataFrame | None:
+    """
+    Выполняет этапы с --from-stage по --until-stage, сохраняя контрольные точки.
+    Возвращает результат последнего этапа или None, если входных данных нет.
+    """
+    resolve_folders(args)
+    first = PIPELINE_STAGES.index(args.from_stage)
+    last = PIPELINE_STAGES.index(args.until_stage)
+    if first > last:
+        raise SystemExit(
+            f"Этап --from-stage {args.from_stage} идёт после --until-stage {args.until_stage}")
+    if args.incremental and (first, last) != (0, len(PIPELINE_STAGES) - 1):
+        raise SystemExit("--incremental нельзя сочетать с --from-stage и --until-stage")
+
+    engine = select_engine(args, first, last)
+    meta = checkpoint_meta(args)
+
+    if first == 0:
+        report_progress(report, "load")
+        tables = load_tables(args, report)
+        if engine == "polars":
+            from polars_engine import EngineFallback
+            try:
+                return run_polars(args, tables, report, export)
+            except EngineFallback as e:
+                logging.warning(f"Движок polars не используется: {e}. Обработка идёт движком pandas")
+        final_combined_df, row_files = stage_load(args, report, export, tables)
+        if final_combined_df is None:
+            print("Нет данных для объединения.")
+            return None
+        save_checkpoint(final_combined_df, CHECKPOINT_FOLDER, "load", meta)
+        if args.incremental:
+            return run_incremental(args, final_combined_df, row_files, report, export, meta)
+    else:
+        # Результат предыдущего этапа берём из контрольной точки
+        previous = PIPELINE_STAGES[first - 1]
+        with report.stage("load_checkpoint", module=previous) as stage:
+            final_combined_df = load_checkpoint(CHECKPOINT_FOLDER, previous, meta)
+            stage.set_output(final_combined_df)
+
+    for stage_name in PIPELINE_STAGES[max(first, 1):last + 1]:
+        final_combined_df = STAGE_FUNCTIONS[stage_name](final_combined_df, report, export)
+        save_checkpoint(final_combined_df, CHECKPOINT_FOLDER, stage_name, meta)
+    return final_combined_df
+
+
+def run(input_folder=None, output_folder=None, modules=None, listener=None,
+        **options) -> RunResult:
+    """
+    Запуск обработки из Python: из UI, PipelineWorker или скрипта.
+
+    Args:
+        input_folder: Каталог с опросными листами. По умолчанию — переменная окружения
+            INPUT_FOLDER, а если она не задана — папка 'Обрабатываемые'.
+        output_folder: Каталог для выгрузок Excel, по умолчанию — папка 'Обработанные'.
+        modules: Ключи модулей из MODULES; по умолчанию — все модули.
+        listener: Получатель событий хода обработки (см. RunReport). Если он бросает
+            RunCancelled, обработка останавливается, а несделанные записи Excel отменяются.
+        **options: Параметры командной строки по имени, например excel="final",
+            incremental=True, trace_memory=True.
+
+    Returns:
+        RunResult: Итог запуска; ошибки записи Excel не прерывают обработку и попадают в failures.
+    """
+    args = parse_args([])
+    unknown = sorted(set(options) - set(vars(args)))
+    if unknown:
+        raise TypeError(f"Неизвестные параметры обработки: {', '.join(unknown)}")
+    vars(args).update(options)
+    args.input_folder = input_folder
+    args.output_folder = output_folder
+    args.modules = list(modules) if modules is not None else None
+    return execute(args, listener)
+
+
+def execute(args: argparse.Namespace, listener=None) -> RunResult:
+    """Выполняет обработку с разобранными параметрами командной строки."""
+    start = time.perf_counter()
+    resolve_folders(args)
+
+    # Создаем папку для обработанных файлов
+    os.makedirs(args.output_folder, exist_ok=True)
+    os.makedirs(LOG_FOLDER, exist_ok=True)  # Создаем папку для логов
+
+    log_filename = f"log {datetime.now().strftime('%Y-%m-%d %H-%M-%S')}.log"
+    # Используем Path для формирования пути
+    log_file_path = LOG_FOLDER / log_filename
+    set_log_file_path(str(log_file_path))  # Конвертируем в строку перед передачей
+    set_log_level(2)
+    # Отчёт о времени и памяти по этапам сохраняется рядом с логом
+    report = RunReport(trace_memory=args.trace_memory,
+                       profile_stage=args.profile_stage, profile_dir=LOG_FOLDER,
+                       listener=listener)
+    report_path = log_file_path.with_suffix(".json")
+
+    # --- Основная обработка ---
+    # Выгрузка в Excel идёт в фоне, пока считаются следующие этапы
+    waiting = False
+
+    def file_written(path: str, seconds: float) -> None:
+        done, total = len(exporter.written), exporter.submitted
+        report.event("file_written", path=path, seconds=seconds, done=done, total=total)
+        # Шкалу двигают только записи, которых обработка уже дожидается
+        if waiting:
+            report_progress(report, "export", done / total)
+
+    exporter = ExportQueue(workers=args.export_workers,
+                           max_bytes=args.export_queue_mb * 2 ** 20, on_written=file_written)
+
+    sqlite_failures = []
+
+    def export(name: str, df: pd.DataFrame) -> None:
+        if exported(args.excel, name):
+            exporter.submit(df, args.output_folder / f"{name}.xlsx")
+        if name == FINAL_EXPORT and args.sqlite is not None:
+            export_sqlite(df)
+
+    def export_sqlite(df: pd.DataFrame) -> None:
+        """Итог в базу SQLite; ошибка записи, как и ошибка записи Excel, не прерывает обработку."""
+        path = args.output_folder / args.sqlite
+        try:
+            with report.stage("sqlite_export", inputs=df):
+                stats = export_to_sqlite(df, path, SQLITE_TABLE)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            logging.exception(f"Ошибка записи {path}: {e}")
+            sqlite_failures.append((str(path), f"{type(e).__name__}: {e}"))
+            return
+        report.event("sqlite_written", path=str(path), **stats)
+
+    try:
+        final_df = run_stages(args, report, export)
+        schemas.save()
+        waiting = True
+        report_progress(report, "export", len(exporter.written) / max(exporter.submitted, 1))
+    except RunCancelled:
+        exporter.cancel()
+        raise
+    finally:
+        try:
+            # Дожидаемся записи всех файлов, даже если обработка прервалась
+            with report.stage("export_wait"):
+                failures = exporter.close()
+        except RunCancelled:
+            exporter.cancel()
+            raise
+        finally:
+            report.save(report_path)
+            report.stop()
+    report.event("progress", stage="export", fraction=1.0)
+
+    return RunResult(
+        input_folder=str(args.input_folder),
+        output_folder=str(args.output_folder),
+        rows=None if final_df is None else len(final_df),
+        written=[path for path, _ in exporter.written],
+        failures=[(path, str(error)) for path, error in failures] + sqlite_failures,
+        log_path=str(log_file_path),
+        report_path=str(report_path),
+        wall_time=round(time.perf_counter() - start, 6),
+    )
+
+
+def dry_run(args) -> int:
+    """Проверка настроек по заголовкам (--dry-run): печатает отчёт, возвращает код завершения."""
+    resolve_folders(args)
+    raw = config.read_raw()
+    raw["MODULES"] = {module: raw["MODULES"][module] for module in args.modules}
+    check = check_config(args.input_folder, raw, COMBINE_KEYS)
+    print(check.format())
+    return 0 if check.ok else 1
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.dry_run:
+        raise SystemExit(dry_run(args))
+    result = execute(args)
+    if result.failures:
+        for path, error in result.failures:
+            print(f"Ошибка записи {path}: {error}")
+        raise SystemExit(f"Не удалось записать файлов: {len(result.failures)}")
+
 
-        file_path = INPUT_FOLDER / filename  # Используем Path для формирования пути
-        for table_name in table_names:
-            df = load_named_table(file_path, table_name)
-            if df is not None:
-                dfs.append(df)
-
-    if not dfs:
-        print(
-            f"Не загружено ни одной таблицы из файла {filename} для модуля {module_key}")
-        logging.warning(
-            f"Не загружено ни одной таблицы из файла {filename} для модуля {module_key}")
-        continue
-
-    # Объединяем все DataFrame
-    combined_df = combine_dataframes(dfs, columns_to_remove, RENAME_MAP)
-
-    # Добавляем объединённые данные в список для сохранения
-    all_combined_data.append(combined_df)
-
-    # Сохраняем промежуточный результат для каждого модуля
-    processed_path = PROCESSED_FOLDER / f"Обработано_{module_key}.xlsx"
-    save_dataframe_to_excel(combined_df, str(processed_path))
-
-    all_dfs.append(combined_df)
-
-if not all_dfs:
-    print("Нет данных для объединения.")
-    exit()
-
-# Объединяем все DataFrame в один
-final_combined_df = pd.concat(all_dfs, ignore_index=True)
-
-# Применение замен для REPLACE_ENERGYMAIN
-final_combined_df = apply_replacements(final_combined_df, REPLACE_ENERGYMAIN)
-
-# Применение замен для REPLACE_ACCESS
-final_combined_df = apply_replacements(final_combined_df, REPLACE_ACCESS)
-
-# Сохраняем итоговый файл до применения smart_merge
-final_path = PROCESSED_FOLDER / "итог_до_удаления_дубликатов.xlsx"
-save_dataframe_to_excel(final_combined_df, str(final_path))
-
-# Применение smart_merge для итогового DataFrame
-final_combined_df = smart_merge(final_combined_df, RENAME_MAP)
-
-# Сохраняем итоговый файл после применения smart_merge (удаления дубликатов)
-final_path = PROCESSED_FOLDER / "итог_после_удаления_дубликатов.xlsx"
-save_dataframe_to_excel(final_combined_df, str(final_path))
-# Применяем combine_columns_by_replace_key для energymain
-final_combined_df = combine_columns_by_replace_key(final_combined_df,
-                                                   "REPLACE_ENERGYMAIN",
-                                                   config,
-                                                   drop=True)
-
-# Сохраняем после объединения столбцов energymain
-final_path = PROCESSED_FOLDER / \
-    "итог_после_объединения_energymain.xlsx"
-save_dataframe_to_excel(final_combined_df, str(final_path))
-# Применяем combine_columns_by_replace_key для access
-final_combined_df = combine_columns_by_replace_key(final_combined_df,
-                                                   "REPLACE_ACCESS",
-                                                   config,
-                                                   drop=True)
-
-# Сохраняем после объединения столбцов access
-final_path = PROCESSED_FOLDER / \
-    "итог_после_объединения_access.xlsx"
-
-save_dataframe_to_excel(final_combined_df, str(final_path))
+if __name__ == "__main__":
+    main()
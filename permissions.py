@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+
+def _present(series: pd.Series) -> np.ndarray:
+    """Маска заполненных ячеек; для category — по кодам, без перебора значений."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.array.codes >= 0
+    return series.notna().to_numpy()
+
+
+def _flag_value(series: pd.Series):
+    """
+    Единственное непустое значение столбца-флага, None для пустого столбца
+    или _NOT_FLAG, если значений больше одного или столбец не строковый и не category.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.dtype.categories
+        if len(categories) > 1:
+            # Категорий может быть больше, чем значений в столбце — считаем только используемые
+            codes = series.array.codes
+            used = np.flatnonzero(np.bincount(codes[codes >= 0], minlength=len(categories)))
+            categories = categories[used]
+        if len(categories) > 1:
+            return _NOT_FLAG
+        return categories[0] if len(categories) and (series.array.codes >= 0).any() else None
+
+    if series.dtype == object or not pd.api.types.is_string_dtype(series.dtype):
+        return _NOT_FLAG
+    values = series.dropna().unique()
+    if len(values) > 1:
+        return _NOT_FLAG
+    return values[0] if len(values) else None
+
+
+_NOT_FLAG = object()
+
+
+def flag_columns(df: pd.DataFrame, exclude=()) -> dict[int, object]:
+    """
+    Столбцы-флаги: строковые или category, где все непустые значения одинаковы
+    (права '+' или код права после замены) или непустых значений нет. Такой столбец без потерь
+    хранится одним битом на строку: значение известно, важно только, заполнена ли ячейка.
+
+    Returns:
+        dict: позиция столбца -> его единственное значение (None для пустого столбца).
+    """
+    flags = {}
+    for position, (column, series) in enumerate(df.items()):
+        if column in exclude:
+            continue
+        value = _flag_value(series)
+        if value is not _NOT_FLAG:
+            flags[position] = value
+    return flags
+
+
+class PermissionMatrix:
+    """
+    Битовая матрица прав: строка таблицы — строка матрицы, столбец-флаг — один бит
+    (np.packbits по столбцам, 8 прав в байте).
+
+    Args:
+        bits: Упакованные биты, массив uint8 формы (строки, ceil(столбцы / 8)).
+        n_columns: Число столбцов-флагов.
+    """
+
+    def __init__(self, bits: np.ndarray, n_columns: int):
+        self.bits = bits
+        self.n_columns = n_columns
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, positions) -> "PermissionMatrix":
+        """Матрица заполненности столбцов positions."""
+        positions = list(positions)
+        # Маска собирается по столбцам (каждая строка массива — столбец таблицы) и транспонируется
+        mask = np.empty((len(positions), len(df)), dtype=bool)
+        for j, (_, series) in enumerate(df.iloc[:, positions].items()):
+            mask[j] = _present(series)
+        return cls(np.packbits(np.ascontiguousarray(mask.T), axis=1), len(positions))
+
+    def __len__(self) -> int:
+        return len(self.bits)
+
+    def group_or(self, group_codes: np.ndarray, n_groups: int) -> "PermissionMatrix":
+        """
+        Побитовое ИЛИ строк по группам: право есть у группы, если оно есть хотя бы в одной строке.
+        Строки с отрицательным кодом группы не учитываются.
+        """
+        valid = group_codes >= 0
+        codes = group_codes[valid]
+        bits = self.bits[valid]
+        order = np.argsort(codes, kind="stable")
+        codes, bits = codes[order], bits[order]
+
+        result = np.zeros((n_groups, self.bits.shape[1]), dtype=np.uint8)
+        if len(codes):
+            starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+            result[codes[starts]] = np.bitwise_or.reduceat(bits, starts, axis=0)
+        return PermissionMatrix(result, self.n_columns)
+
+    def unpack(self) -> np.ndarray:
+        """Матрица заполненности как массив bool формы (строки, столбцы)."""
+        return np.unpackbits(self.bits, axis=1, count=self.n_columns).astype(bool)
+
+    def to_frame(self, template: pd.DataFrame, values: list, index) -> pd.DataFrame:
+        """
+        Столбцы-флаги обратно в таблицу: значение столбца там, где бит установлен.
+        Типы и имена столбцов — как у template.
+        """
+        mask = self.unpack()
+        columns = {}
+        for j, ((column, series), value) in enumerate(zip(template.items(), values)):
+            present = mask[:, j]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                code = series.dtype.categories.get_loc(value) if value is not None else -1
+                columns[column] = pd.Categorical.from_codes(
+                    np.where(present, code, -1), dtype=series.dtype, validate=False)
+            else:
+                array = np.full(len(present), None, dtype=object)
+                array[present] = value
+                columns[column] = pd.array(array, dtype=series.dtype)
+        return pd.DataFrame(columns, index=index)
+
+    def join(self, pieces: list[str]) -> np.ndarray:
+        """
+        Строка для каждой строки матрицы: сцепление pieces[j] для установленных битов j.
+        Строки собираются по таблице уникальных сочетаний прав, а не для каждой строки.
+        """
+        if not len(self.bits):
+            return np.empty(0, dtype=object)
+        width = self.bits.shape[1]
+        rows = np.ascontiguousarray(self.bits).view(np.dtype((np.void, width))).ravel()
+        uniques, inverse = np.unique(rows, return_inverse=True)
+        unique_mask = PermissionMatrix(
+            uniques.view(np.uint8).reshape(len(uniques), width), self.n_columns).unpack()
+
+        # Части установленных битов подряд по строкам; границы строк — по номерам строк
+        row_numbers, column_numbers = np.nonzero(unique_mask)
+        selected = np.asarray(pieces, dtype=object)[column_numbers]
+        bounds = np.searchsorted(row_numbers, np.arange(len(uniques) + 1))
+        table = np.array(["".join(selected[start:end]) for start, end in zip(bounds[:-1], bounds[1:])],
+                         dtype=object)
+        return table[inverse.ravel()]
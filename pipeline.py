@@ -0,0 +1,201 @@
+import atexit
+import multiprocessing
+import os
+import queue
+from dataclasses import dataclass, field
+from typing import Optional
+
+# Модуль лёгкий: pandas, openpyxl и код обработки (main) импортируются только при запуске
+# обработки, поэтому UI и другие программы, которые его импортируют, открываются сразу.
+
+
+class RunCancelled(Exception):
+    """Запуск обработки отменён."""
+
+
+@dataclass
+class RunResult:
+    """Итог запуска обработки."""
+    input_folder: str
+    output_folder: str
+    # Строк в итоговой таблице; None — входных данных не нашлось
+    rows: Optional[int] = None
+    written: list[str] = field(default_factory=list)
+    # Файлы, которые не удалось записать, и текст ошибки
+    failures: list[tuple[str, str]] = field(default_factory=list)
+    log_path: str = ""
+    report_path: str = ""
+    wall_time: float = 0.0
+
+
+def run_pipeline(input_folder=None, output_folder=None, modules=None, **options) -> RunResult:
+    """
+    Запускает обработку в текущем процессе. Параметры — как у main.run.
+    Код обработки импортируется при первом вызове.
+    """
+    import main
+    return main.run(input_folder, output_folder, modules, **options)
+
+
+def _config_mtime() -> int:
+    from config_manager import config
+    return os.stat(config.ROOT / "config.json").st_mtime_ns
+
+
+def _serve(requests, responses, cancel) -> None:
+    """Цикл процесса PipelineWorker: импорт обработки один раз, затем запуски по запросу."""
+    import importlib
+
+    import main
+    from config_manager import config
+
+    def listener(event: dict) -> None:
+        responses.put(("event", event))
+        # Отмена срабатывает на ближайшем событии: между этапами, файлами и записями Excel
+        if cancel.is_set():
+            raise RunCancelled("Обработка отменена")
+
+    loaded = _config_mtime()
+    responses.put(("ready", None))
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        cancel.clear()
+        try:
+            # Настройки изменились (например, сохранены в UI) — перечитываем их и константы main
+            mtime = _config_mtime()
+            if mtime != loaded:
+                config.reload()
+                main = importlib.reload(main)
+                loaded = mtime
+            responses.put(("ok", main.run(**request, listener=listener)))
+        except RunCancelled as e:
+            responses.put(("cancelled", str(e)))
+        except (Exception, SystemExit) as e:
+            responses.put(("error", f"{type(e).__name__}: {e}"))
+
+
+class PipelineWorker:
+    """
+    Постоянный процесс обработки. Импорт pandas и openpyxl и чтение настроек выполняются
+    один раз при старте процесса, а не при каждом запуске, как у `python main.py`:
+    повторные небольшие запуски из UI в основном состоят из этой подготовки.
+
+    Процесс запускается через spawn (как в Windows) и не является демоном, чтобы внутри
+    него работала фоновая запись Excel в отдельных процессах. При изменении config.json
+    настройки перечитываются перед следующим запуском.
+
+    run блокирует вызывающий поток до конца запуска, поэтому UI вызывает его из отдельного
+    потока, а cancel — из своего: запуск останавливается на ближайшем событии хода обработки,
+    несделанные записи Excel отменяются, начатые дописываются.
+
+    Пример:
+        with PipelineWorker() as worker:
+            result = worker.run(input_folder="Обрабатываемые", excel="final")
+    """
+
+    def __init__(self):
+        self._process = None
+        self._requests = None
+        self._responses = None
+        self._cancel = None
+        self._ready = False
+
+    def start(self) -> None:
+        """Запускает процесс, не дожидаясь его готовности."""
+        if self._process is not None and self._process.is_alive():
+            return
+        context = multiprocessing.get_context("spawn")
+        self._requests = context.Queue()
+        self._responses = context.Queue()
+        self._cancel = context.Event()
+        self._ready = False
+        self._process = context.Process(
+            target=_serve, args=(self._requests, self._responses, self._cancel),
+            name="pipeline-worker")
+        self._process.start()
+        atexit.register(self.close)
+
+    def _receive(self) -> tuple[str, object]:
+        """Следующий ответ процесса; ошибка, если процесс завершился, не ответив."""
+        while True:
+            try:
+                return self._responses.get(timeout=1)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    code = self._process.exitcode
+                    self._process = None
+                    raise RuntimeError(f"Процесс обработки завершился с кодом {code}")
+
+    def wait_ready(self) -> None:
+        """Дожидается, пока процесс импортирует обработку."""
+        self.start()
+        if not self._ready:
+            status, _ = self._receive()
+            self._ready = status == "ready"
+
+    def run(self, input_folder=None, output_folder=None, modules=None, on_event=None,
+            **options) -> RunResult:
+        """
+        Выполняет запуск обработки в процессе и возвращает его итог. Параметры — как у main.run.
+
+        Args:
+            on_event: Вызывается в потоке вызывающего для каждого события хода обработки.
+
+        Raises:
+            RunCancelled: Если запуск отменён через cancel.
+            RuntimeError: Если обработка завершилась ошибкой или процесс аварийно завершился.
+        """
+        self.wait_ready()
+        self._requests.put({
+            "input_folder": str(input_folder) if input_folder is not None else None,
+            "output_folder": str(output_folder) if output_folder is not None else None,
+            "modules": modules,
+            **options,
+        })
+        while True:
+            status, payload = self._receive()
+            if status != "event":
+                break
+            if on_event is not None:
+                on_event(payload)
+        if status == "cancelled":
+            raise RunCancelled(payload)
+        if status == "error":
+            raise RuntimeError(payload)
+        return payload
+
+    def cancel(self) -> None:
+        """Просит процесс остановить текущий запуск; можно вызывать из любого потока."""
+        if self._cancel is not None:
+            self._cancel.set()
+
+    def terminate(self) -> None:
+        """
+        Принудительно завершает процесс, если он не откликается на cancel (например, долго
+        разбирает один большой файл). Следующий run запустит новый процесс.
+        """
+        if self._process is not None and self._process.is_alive():
+            self._process.terminate()
+
+    def close(self, timeout: float = 30) -> None:
+        """Останавливает процесс после текущего запуска."""
+        if self._process is None:
+            return
+        if self._process.is_alive():
+            self.cancel()
+            self._requests.put(None)
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join()
+        self._process = None
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,277 @@
+import logging
+from dataclasses import dataclass, field
+
+import pandas as pd
+import polars as pl
+
+from functions import MERGE_KEYS, compile_replacements
+from schema import schemas
+
+# Значения столбцов object, которые переводятся в Arrow без изменения вида в выгрузке.
+# Смесь типов (например, 1 и 2.5 или строки и числа) Arrow свёл бы к одному типу
+ARROW_VALUE_KINDS = ("string", "integer", "floating", "boolean", "datetime", "date", "empty")
+# Пробельные символы str.strip(): у Rust-версии strip_chars набор немного другой (\x1c-\x1f)
+_WHITESPACE = "".join(ch for ch in map(chr, range(0x3001)) if ch.isspace())
+
+
+class EngineFallback(Exception):
+    """Данные, которые движок polars не обработает так же, как pandas: обработка идёт движком pandas."""
+
+
+def _to_polars(df: pd.DataFrame, source: str) -> "pl.DataFrame":
+    """
+    Таблица pandas в Polars по позициям столбцов ('0', '1', ...): в исходной таблице имена
+    могут повторяться, а итоговые имена задаёт проекция схемы.
+
+    Raises:
+        EngineFallback: Столбец category или столбец object со значениями разных типов.
+    """
+    for position, dtype in enumerate(df.dtypes):
+        column = df.columns[position]
+        if isinstance(dtype, pd.CategoricalDtype):
+            raise EngineFallback(f"{source}: столбец '{column}' типа category")
+        if dtype == object:
+            kind = pd.api.types.infer_dtype(df.iloc[:, position], skipna=True)
+            if kind not in ARROW_VALUE_KINDS:
+                raise EngineFallback(f"{source}: в столбце '{column}' значения разных типов ({kind})")
+    try:
+        return pl.from_pandas(df.set_axis([str(i) for i in range(df.shape[1])], axis=1))
+    except (TypeError, ValueError, pl.exceptions.PolarsError) as e:
+        raise EngineFallback(f"{source}: {e}") from e
+
+
+def _common_dtype(dtypes, what: str):
+    """
+    Общий тип столбца нескольких таблиц: пустые столбцы (Null) принимают тип остальных.
+
+    Raises:
+        EngineFallback: Типы различаются — pandas собрал бы столбец object со значениями разных типов.
+    """
+    kinds = {dtype for dtype in dtypes if dtype != pl.Null}
+    if len(kinds) > 1:
+        raise EngineFallback(f"{what}: разные типы {', '.join(sorted(map(str, kinds)))}")
+    return kinds.pop() if kinds else pl.Null
+
+
+def _project(frame: "pl.DataFrame", schema, headers, source: str) -> "pl.LazyFrame":
+    """Проекция таблицы в итоговый набор столбцов схемы, как TableSchema.project."""
+    dtypes = frame.dtypes
+    expressions = []
+    for column, positions in zip(schema.columns, schema.sources):
+        if len(positions) == 1:
+            expressions.append(pl.col(str(positions[0])).alias(column))
+            continue
+        _common_dtype([dtypes[position] for position in positions], f"{source}, столбец '{column}'")
+        # Первое непустое значение слева направо; расхождения пишутся в лог, как в pandas
+        values = pl.col(str(positions[0]))
+        for position in positions[1:]:
+            other = pl.col(str(position))
+            conflicts = frame.select(
+                (values.is_not_null() & other.is_not_null() & (values != other)).sum()).item()
+            if conflicts:
+                logging.warning(
+                    f"Столбец '{column}': значения '{headers[positions[0]]}' и "
+                    f"'{headers[position]}' различаются, строк: {conflicts}; "
+                    f"взято значение первого")
+            values = pl.coalesce(values, other)
+        expressions.append(values.alias(column))
+    return frame.lazy().select(expressions)
+
+
+def _concat(frames: list, what: str) -> "pl.LazyFrame":
+    """
+    Склейка таблиц с объединением столбцов, как pd.concat: столбцы первой таблицы,
+    затем новые столбцы следующих по порядку появления.
+    """
+    schemas_ = [frame.collect_schema() for frame in frames]
+    for column in dict.fromkeys(name for schema in schemas_ for name in schema):
+        _common_dtype([schema[column] for schema in schemas_ if column in schema],
+                      f"{what}, столбец '{column}'")
+    return pl.concat(frames, how="diagonal_relaxed")
+
+
+def _replacement(column: str, dtype, mapping: dict):
+    """
+    Выражение замен столбца по плану compile_replacements или None, если заменять нечего.
+
+    Raises:
+        EngineFallback: Замена дала бы столбец со значениями разных типов.
+    """
+    if dtype == pl.Null:
+        return None
+    if dtype != pl.String:
+        if any(not isinstance(old, str) for old in mapping):
+            raise EngineFallback(f"Замены в столбце '{column}' типа {dtype}")
+        # Строковые значения в столбце другого типа не встречаются
+        return None
+    mapping = {old: new for old, new in mapping.items() if isinstance(old, str) and old != new}
+    if any(not isinstance(new, str) for new in mapping.values()):
+        raise EngineFallback(f"Замены в столбце '{column}' дают значения не строкового типа")
+    if not mapping:
+        return None
+    return pl.col(column).replace(mapping)
+
+
+def _piece(column: str, dtype):
+    """Часть объединённой строки для столбца: '!' + значение без пробелов по краям или ''."""
+    if dtype == pl.Null:
+        return pl.lit("")
+    if dtype != pl.String and not dtype.is_integer():
+        # str() в Python и приведение к строке в Polars по-разному пишут дроби, даты и логические
+        raise EngineFallback(f"Объединение столбца '{column}' типа {dtype}")
+    stripped = pl.col(column).cast(pl.String).str.strip_chars(_WHITESPACE)
+    return pl.when(stripped.is_not_null() & (stripped != "")).then("!" + stripped).otherwise(pl.lit(""))
+
+
+def _first_in_groups(frame: "pl.DataFrame") -> "pl.DataFrame":
+    """
+    Первое непустое значение каждого столбца в группах 'ФИО'/'УЗ', группы по порядку ключей,
+    столбцы — в исходном порядке (как smart_merge).
+
+    Агрегируются не значения, а номера строк: min по целым намного дешевле first(ignore_nulls)
+    по строкам, а значения потом берутся одним gather на столбец. Для столбцов без пропусков
+    первая непустая строка группы — просто её первая строка.
+    """
+    row = "__row"
+    while row in frame.columns:
+        row = f"_{row}"
+    first_row = pl.col(row).min()
+    sources = {}
+    for column in frame.columns:
+        if column in MERGE_KEYS:
+            continue
+        if frame[column].null_count():
+            sources[column] = pl.when(pl.col(column).is_not_null()).then(pl.col(row)).min()
+        else:
+            sources[column] = first_row
+    firsts = (frame.lazy().with_row_index(row)
+              .group_by(MERGE_KEYS)
+              .agg([first_row.alias(row), *(source.alias(column) for column, source in sources.items()
+                                             if source is not first_row)])
+              .sort(MERGE_KEYS)
+              .collect())
+    return firsts.select([
+        pl.col(column) if column in MERGE_KEYS
+        else pl.lit(frame[column].gather(firsts[column if sources[column] is not first_row else row]))
+        for column in frame.columns])
+
+
+@dataclass
+class PolarsPlan:
+    """
+    Ленивый план Polars для этапов combine_dataframes, concat, apply_replacements, smart_merge
+    и combine_columns_by_replace_keys. Результаты этапов — ленивые таблицы одного плана:
+    собранные вместе (collect), они считаются за один проход, общие части — один раз.
+
+    Args:
+        modules: Таблица каждого модуля после combine_dataframes.
+        replaced: Все модули после замен.
+        merged: Результат smart_merge.
+        combined: Результат объединения столбцов.
+        replacements: Замены, число которых пишется в лог: (столбец, старое значение, новое значение).
+        counts: Счётчики для лога: строки с пустыми ключами и изменённые замены ячейки.
+    """
+    modules: dict
+    replaced: "pl.LazyFrame"
+    merged: "pl.LazyFrame"
+    combined: "pl.LazyFrame"
+    replacements: list = field(default_factory=list)
+    counts: "pl.LazyFrame | None" = None
+
+    def collect(self, frames: list) -> list:
+        """
+        Собирает ленивые таблицы frames одним вызовом collect_all и пишет в лог счётчики
+        замен и пустых ключей, как apply_replacements и smart_merge.
+        """
+        *results, counts = pl.collect_all([*frames, self.counts])
+        counts = counts.row(0)
+        for (column, old_value, new_value), count in zip(self.replacements, counts[1:]):
+            if count:
+                logging.info(f"Замена в столбце '{column}': '{old_value}' -> '{new_value}', ячеек: {count}")
+        if counts[0]:
+            logging.warning(f"Строк с пустым 'ФИО' или 'УЗ': {counts[0]}. Они не попадут в результат.")
+        return results
+
+
+def build_plan(module_tables: dict[str, list[pd.DataFrame]], columns_to_remove: dict[str, list],
+               rename_map: dict, replace_dicts: tuple, replace_keys: list[str], config) -> PolarsPlan:
+    """
+    Строит ленивый план обработки с тем же результатом, что у этапов pandas:
+    проекция таблиц по схемам заголовков (реестр schemas), склейка модулей, замены
+    по compile_replacements, первое непустое значение каждого столбца в группах 'ФИО'/'УЗ'
+    (строки с пустыми ключами отбрасываются, группы упорядочены по ключам) и объединение
+    столбцов ключей replace_keys через '!'.
+
+    Args:
+        module_tables: Таблицы каждого модуля.
+        columns_to_remove: Удаляемые столбцы каждого модуля.
+        rename_map: Словарь для переименования столбцов.
+        replace_dicts: Словари замен, как у apply_replacements.
+        replace_keys: Ключи config, столбцы которых объединяются.
+        config: Настройки.
+
+    Raises:
+        EngineFallback: Данные, которые Polars обработал бы иначе, чем pandas.
+    """
+    modules = {}
+    for module, tables in module_tables.items():
+        projected = []
+        for number, df in enumerate(tables, start=1):
+            source = f"модуль {module}, таблица {number}"
+            schema = schemas.resolve(df.columns, columns_to_remove[module], rename_map)
+            projected.append(_project(_to_polars(df, source), schema, df.columns, source))
+        modules[module] = _concat(projected, f"модуль {module}")
+    combined = _concat(list(modules.values()), "все модули")
+
+    # Замены: у загруженных таблиц имена столбцов уже нормализованы
+    schema = combined.collect_schema()
+    replacements, counters, expressions = [], [], []
+    for column, mapping in compile_replacements(*replace_dicts).items():
+        if column not in schema:
+            continue
+        expression = _replacement(column, schema[column], mapping)
+        if expression is None:
+            continue
+        expressions.append(expression)
+        for old_value, new_value in mapping.items():
+            if isinstance(old_value, str) and old_value != new_value:
+                replacements.append((column, old_value, new_value))
+                counters.append((pl.col(column) == old_value).sum().alias(str(len(counters))))
+    replaced = combined.with_columns(expressions) if expressions else combined
+
+    # smart_merge: переименование, отбрасывание пустых ключей, первое непустое значение в группе
+    renames = {old: new for old, new in rename_map.items() if old in schema and old != new}
+    columns = [renames.get(column, column) for column in schema]
+    if len(set(columns)) != len(columns):
+        raise EngineFallback("После переименования столбцов по RENAME_MAP имена повторяются")
+    missing = [key for key in MERGE_KEYS if key not in columns]
+    if missing:
+        raise EngineFallback(f"Нет столбцов {', '.join(missing)}")
+    renamed = replaced.rename(renames) if renames else replaced
+    has_na = pl.any_horizontal([pl.col(key).is_null() for key in MERGE_KEYS])
+    merged = renamed.filter(~has_na).map_batches(_first_in_groups)
+    counts = pl.concat([renamed.select(has_na.sum().alias("na_keys")), combined.select(counters)],
+                       how="horizontal")
+
+    # Объединение столбцов каждого ключа через '!'
+    merged_schema = dict(zip(columns, [schema[column] for column in schema]))
+    joined = []
+    for replace_key in replace_keys:
+        columns_to_combine = list(getattr(config, replace_key, {}).keys())
+        if not columns_to_combine:
+            continue
+        pieces = [_piece(column, merged_schema[column])
+                  for column in columns_to_combine if column in merged_schema]
+        value = pl.concat_str(pieces).str.slice(1) if pieces else pl.lit("")
+        joined.append(value.alias(f"{replace_key}_combined"))
+    result = merged.with_columns(joined) if joined else merged
+
+    return PolarsPlan(modules, replaced, merged, result, replacements, counts)
+
+
+def to_pandas(frame: "pl.DataFrame") -> pd.DataFrame:
+    """
+    Таблица Polars в pandas для выгрузки Excel. Столбцы остаются в Arrow (ArrowDtype):
+    целые с пропусками не превращаются в дробные, строки не копируются в объекты Python.
+    """
+    return frame.to_pandas(use_pyarrow_extension_array=True)
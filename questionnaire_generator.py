@@ -0,0 +1,195 @@
+import argparse
+import os
+import warnings
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
+
+from config_manager import config
+
+SURNAMES = ["Иванов", "Петров", "Сидоров", "Смирнов", "Кузнецов", "Попов", "Васильев", "Соколов",
+            "Михайлов", "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев",
+            "Семёнов", "Егоров", "Павлов", "Козлов", "Степанов", "Николаев", "Орлов", "Андреев",
+            "Макаров", "Никитин", "Захаров", "Зайцев", "Соловьёв", "Борисов", "Яковлев"]
+INITIALS = "АБВГДЕЖИКЛМНОПРСТФЮЯ"
+ORGANIZATIONS = ["ТЭЦ-8", "ТЭЦ-12", "ТЭЦ-16", "ТЭЦ-20", "ТЭЦ-21", "ТЭЦ-22", "ТЭЦ-23", "ТЭЦ-27"]
+DEPARTMENTS = ["Блок главного инженера", "Управление оперативной эксплуатации",
+               "Цех тепловой автоматики и измерений", "Электрический цех", "Котлотурбинный цех",
+               "Химический цех", "Служба охраны труда"]
+POSITIONS = ["Главный инженер", "Заместитель главного инженера", "Начальник смены станции",
+             "Начальник цеха", "Мастер", "Инженер", "Ведущий инженер", "Диспетчер", "Машинист"]
+
+# Оформление, как в опросных листах: строки заголовка листа над таблицей
+TITLE_ROWS = 4
+TABLE_STYLE = "TableStyleLight15"
+
+TRANSLIT = dict(zip("абвгдеёжзийклмнопрстуфхцчшщъыьэюя",
+                     ["a", "b", "v", "g", "d", "e", "e", "zh", "z", "i", "y", "k", "l", "m", "n",
+                      "o", "p", "r", "s", "t", "u", "f", "kh", "ts", "ch", "sh", "sch", "", "y", "",
+                      "e", "yu", "ya"]))
+
+
+def translit(text: str) -> str:
+    return "".join(TRANSLIT.get(ch, ch) if ch.islower() else TRANSLIT.get(ch.lower(), ch).capitalize()
+                   for ch in text)
+
+
+@dataclass
+class GeneratorOptions:
+    """
+    Масштаб синтетических опросных листов.
+
+    Args:
+        rows: Строк в каждой таблице.
+        columns: Столбцов в каждой таблице: служебные столбцы, затем столбцы прав
+            (сначала права из REPLACE_ENERGYMAIN и REPLACE_ACCESS, затем 'Право N').
+        duplicate_rate: Доля строк с уже встречавшейся парой ('ФИО', 'УЗ') — в той же
+            таблице или в других таблицах и файлах.
+        plus_share: Доля ячеек прав со значением '+'.
+        files_per_module: Файлов на каждый модуль MODULES.
+        seed: Начальное значение генератора случайных чисел.
+    """
+    rows: int = 1000
+    columns: int = 20
+    duplicate_rate: float = 0.3
+    plus_share: float = 0.3
+    files_per_module: int = 1
+    seed: int = 0
+
+
+# Служебные столбцы, как в опросных листах
+BASE_COLUMNS = ["№", "Организация", "Подразделение", "ФИО", "Столбец1", "Учетная запись в MS AD",
+                "Должность", "Мобильный телефон*", "Электронная почта*"]
+
+
+def _permission_columns(count: int) -> list[str]:
+    known = list(dict.fromkeys([*config.REPLACE_ENERGYMAIN, *config.REPLACE_ACCESS]))
+    return (known + [f"Право {i}" for i in range(1, count + 1)])[:max(count, 0)]
+
+
+class QuestionnaireGenerator:
+    """
+    Пишет синтетические опросные листы: по файлу 'Опросный лист <модуль>.xlsx' на модуль
+    (или несколько, если files_per_module > 1), в каждом — именованные таблицы модуля
+    из MODULES на отдельных листах, под строками заголовка, как в настоящих опросных листах.
+
+    Ячейки, которые в опросных листах вычисляются формулами ('№', 'Столбец1'), записываются
+    значениями: так их видит обработка, читающая сохранённые значения формул.
+    Все таблицы одного запуска берут людей из общего списка, поэтому дубли ('ФИО', 'УЗ')
+    встречаются и внутри таблицы, и между таблицами и файлами.
+    """
+
+    def __init__(self, options: GeneratorOptions | None = None):
+        self.options = options or GeneratorOptions()
+        self.rng = np.random.default_rng(self.options.seed)
+        self.columns = list(BASE_COLUMNS)
+        self.columns += _permission_columns(self.options.columns - len(self.columns))
+        self._people: list[tuple[str, str, str]] = []
+
+    def _new_person(self) -> tuple[str, str, str]:
+        surname = SURNAMES[self.rng.integers(len(SURNAMES))]
+        first, middle = (INITIALS[i] for i in self.rng.integers(len(INITIALS), size=2))
+        # Номер отличает однофамильцев с одинаковыми инициалами
+        number = len(self._people)
+        fio = f"{surname} {first}.{middle}."
+        login = f"{translit(surname)}{translit(first)}{translit(middle)}{number}"
+        email = f"{login}@example.ru"
+        return fio, login, email
+
+    def _people_for_table(self, rows: int) -> list[tuple[str, str, str]]:
+        """Люди для строк таблицы: доля duplicate_rate — уже встречавшиеся."""
+        people = []
+        for _ in range(rows):
+            if self._people and self.rng.random() < self.options.duplicate_rate:
+                people.append(self._people[self.rng.integers(len(self._people))])
+            else:
+                self._people.append(self._new_person())
+                people.append(self._people[-1])
+        return people
+
+    def table_rows(self, rows: int) -> list[list]:
+        """Строки одной таблицы без заголовка."""
+        permissions = len(self.columns) - len(BASE_COLUMNS)
+        plus = self.rng.random((rows, permissions)) < self.options.plus_share
+        result = []
+        for i, (fio, login, email) in enumerate(self._people_for_table(rows)):
+            phone = f"8 (9{self.rng.integers(10, 100)}) {self.rng.integers(100, 1000)}-" \
+                    f"{self.rng.integers(10, 100)}-{self.rng.integers(10, 100)}"
+            result.append([
+                i + 1,
+                ORGANIZATIONS[self.rng.integers(len(ORGANIZATIONS))],
+                DEPARTMENTS[self.rng.integers(len(DEPARTMENTS))],
+                fio,
+                True,
+                login,
+                POSITIONS[self.rng.integers(len(POSITIONS))],
+                phone if self.rng.random() < 0.7 else None,
+                email if self.rng.random() < 0.8 else None,
+                *("+" if flag else None for flag in plus[i]),
+            ])
+        return result
+
+    def write_workbook(self, path, table_names: list[str]) -> None:
+        """Книга с таблицами table_names, каждая на своём листе."""
+        wb = Workbook(write_only=True)
+        for table_name in table_names:
+            ws = wb.create_sheet(table_name[:31])
+            rows = self.table_rows(self.options.rows)
+            first_row = TITLE_ROWS + 1
+            ref = f"A{first_row}:{get_column_letter(len(self.columns))}{first_row + max(len(rows), 1)}"
+            table = Table(displayName=table_name, ref=ref)
+            table.tableStyleInfo = TableStyleInfo(name=TABLE_STYLE, showRowStripes=True)
+            # В режиме write-only столбцы таблицы задаются явно
+            table.tableColumns = [TableColumn(id=i, name=name)
+                                  for i, name in enumerate(self.columns, start=1)]
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)
+                ws.add_table(table)
+
+            ws.append([f"Опросный лист: {table_name}"])
+            for _ in range(TITLE_ROWS - 1):
+                ws.append([])
+            ws.append(self.columns)
+            for row in rows or [[None] * len(self.columns)]:
+                ws.append(row)
+        wb.save(path)
+
+    def write(self, folder) -> list[Path]:
+        """Пишет опросные листы всех модулей MODULES в каталог folder и возвращает пути."""
+        folder = Path(folder)
+        os.makedirs(folder, exist_ok=True)
+        paths = []
+        for module_key, module_config in config.MODULES.items():
+            for number in range(1, self.options.files_per_module + 1):
+                suffix = f" {number}" if number > 1 else ""
+                path = folder / f"Опросный лист {module_key}{suffix}.xlsx"
+                self.write_workbook(path, list(module_config["table_names"]))
+                paths.append(path)
+        return paths
+
+
+def generate(folder, options: GeneratorOptions | None = None) -> list[Path]:
+    """Синтетические опросные листы в каталоге folder."""
+    return QuestionnaireGenerator(options).write(folder)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Синтетические опросные листы с таблицами модулей из config.json")
+    parser.add_argument("folder", type=Path, help="каталог для опросных листов")
+    parser.add_argument("--rows", type=int, default=1000, help="строк в каждой таблице")
+    parser.add_argument("--columns", type=int, default=20, help="столбцов в каждой таблице")
+    parser.add_argument("--duplicate-rate", type=float, default=0.3,
+                        help="доля строк с уже встречавшейся парой ФИО/УЗ")
+    parser.add_argument("--plus-share", type=float, default=0.3, help="доля прав '+'")
+    parser.add_argument("--files-per-module", type=int, default=1, help="файлов на модуль")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    paths = generate(args.folder, GeneratorOptions(
+        rows=args.rows, columns=args.columns, duplicate_rate=args.duplicate_rate,
+        plus_share=args.plus_share, files_per_module=args.files_per_module, seed=args.seed))
+    print(f"Записано файлов: {len(paths)} в {args.folder}")
@@ -0,0 +1,206 @@
+import hashlib
+import inspect
+import json
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+# Что делать, если несколько исходных столбцов таблицы получают одно итоговое имя
+# (например, 'Учетная запись в MS AD' и 'Учетная запись MS AD' -> 'УЗ'):
+# "first" — свести в один столбец, взяв первое непустое значение слева направо,
+# "raise" — выбросить ValueError
+COLLISION_POLICIES = ("first", "raise")
+# Увеличивается при изменении формата файла сохранённых сигнатур
+SCHEMA_FILE_VERSION = 1
+
+
+@dataclass(frozen=True)
+class TableSchema:
+    """
+    Итоговый набор столбцов для таблиц с одной сигнатурой заголовка.
+
+    Args:
+        columns: Итоговые имена столбцов по порядку.
+        sources: Для каждого итогового столбца — позиции исходных столбцов; больше одной,
+            если исходные столбцы сводятся в один.
+        identity: Таблица уже в итоговом виде: ничего не удаляется, не переименовывается
+            и не сводится.
+    """
+    columns: tuple
+    sources: tuple[tuple[int, ...], ...]
+    identity: bool = False
+
+    def __post_init__(self):
+        # Готовые позиции, имена и сводимые столбцы: проекция таблицы — один take
+        object.__setattr__(self, "_positions", [positions[0] for positions in self.sources])
+        object.__setattr__(self, "_index", pd.Index(self.columns))
+        object.__setattr__(self, "_collisions", {
+            self.columns.index(column): positions
+            for column, positions in zip(self.columns, self.sources) if len(positions) > 1})
+
+    @property
+    def collisions(self) -> dict:
+        """Итоговые столбцы, в которые сводится несколько исходных."""
+        return {self.columns[target]: positions for target, positions in self._collisions.items()}
+
+    def project(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Таблица в итоговом наборе столбцов. Исходная таблица не меняется."""
+        if self.identity:
+            return df
+        result = df.take(self._positions, axis=1)
+        result.columns = self._index
+        for target, positions in self._collisions.items():
+            column = self.columns[target]
+            values = df.iloc[:, positions[0]]
+            for position in positions[1:]:
+                other = df.iloc[:, position]
+                if values.dtype != other.dtype:
+                    values, other = values.astype(object), other.astype(object)
+                conflicts = int((values.notna() & other.notna() & (values != other)).sum())
+                if conflicts:
+                    logging.warning(
+                        f"Столбец '{column}': значения '{df.columns[positions[0]]}' и "
+                        f"'{df.columns[position]}' различаются, строк: {conflicts}; "
+                        f"взято значение первого")
+                values = values.mask(values.isna(), other)
+            result.isetitem(target, values.rename(column))
+        return result
+
+
+class SchemaRegistry:
+    """
+    Реестр сигнатур заголовков: каждый набор заголовков таблицы разбирается один раз —
+    нормализация имён, удаление лишних столбцов, переименование по RENAME_MAP и сведение
+    столбцов, получивших одно имя. Таблицы с уже встречавшейся сигнатурой сразу
+    проецируются в готовый набор столбцов.
+
+    В постоянном процессе обработки (PipelineWorker) и в службе наблюдения за каталогом
+    реестр живёт между запусками. После load разобранные сигнатуры сохраняются и в файл
+    (save), и следующий запуск берёт их оттуда. В файле ключ — хэш сигнатуры, настроек
+    (RENAME_MAP, удаляемые столбцы, политика) и логики разбора, поэтому после изменения
+    config.json или этого модуля сигнатуры разбираются заново.
+    """
+
+    def __init__(self):
+        self._normalized: dict[tuple, pd.Index] = {}
+        self._schemas: dict[tuple, TableSchema] = {}
+        self._path: Path | None = None
+        self._stored: dict[str, dict] = {}
+        self._changed = False
+
+    def load(self, path) -> None:
+        """
+        Подключает файл сохранённых сигнатур. Повреждённый файл или файл другой версии
+        не используется — сигнатуры разбираются заново и файл перезаписывается при save.
+        """
+        path = Path(path)
+        if path == self._path:
+            return
+        self._path, self._stored, self._changed = path, {}, False
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logging.warning(f"Файл сигнатур заголовков {path} не читается ({e}), сигнатуры разбираются заново")
+            return
+        if isinstance(data, dict) and data.get("version") == SCHEMA_FILE_VERSION:
+            self._stored = data.get("schemas", {})
+
+    def save(self) -> None:
+        """Записывает сигнатуры в файл из load, если появились новые."""
+        if self._path is None or not self._changed:
+            return
+        os.makedirs(self._path.parent, exist_ok=True)
+        tmp = self._path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": SCHEMA_FILE_VERSION, "schemas": self._stored}, f, ensure_ascii=False)
+        os.replace(tmp, self._path)
+        self._changed = False
+
+    def clear_stored(self) -> None:
+        """Забывает сохранённые сигнатуры (пересборка кэша): файл перезаписывается при save."""
+        self._schemas.clear()
+        self._stored = {}
+        self._changed = self._path is not None
+
+    def normalize(self, columns: pd.Index) -> pd.Index:
+        """
+        Имена столбцов без лишних пробелов и переносов строк, несколько пробелов — в один.
+        Index неизменяем, поэтому один результат отдаётся всем таблицам с той же сигнатурой.
+        """
+        key = (tuple(columns), str(columns.dtype))
+        normalized = self._normalized.get(key)
+        if normalized is None:
+            normalized = self._normalized[key] = columns.str.replace(r'\s+', ' ', regex=True).str.strip()
+        return normalized
+
+    def resolve(self, columns, columns_to_remove, rename_map: dict, collisions: str = "first"
+                ) -> TableSchema:
+        """
+        Итоговый набор столбцов для заголовка columns.
+
+        Raises:
+            ValueError: Неизвестная политика или сведение столбцов при collisions="raise".
+        """
+        if collisions not in COLLISION_POLICIES:
+            raise ValueError(f"Неизвестная политика сведения столбцов: {collisions}")
+        key = (tuple(columns), tuple(columns_to_remove), tuple(rename_map.items()), collisions)
+        schema = self._schemas.get(key)
+        if schema is None:
+            schema = self._schemas[key] = self._resolve_stored(key, rename_map)
+        return schema
+
+    def _resolve_stored(self, key: tuple, rename_map: dict) -> TableSchema:
+        """Схема из файла сигнатур, а если её там нет — разобранная и добавленная в файл."""
+        headers, columns_to_remove, _, collisions = key
+        signature = _signature(key) if self._path is not None else None
+        stored = self._stored.get(signature)
+        if stored is not None:
+            sources = tuple(tuple(positions) for positions in stored["sources"])
+            columns = tuple(rename_map.get(headers[positions[0]], headers[positions[0]])
+                            for positions in sources)
+            return TableSchema(columns, sources, identity=stored["identity"])
+
+        schema = self._build(headers, set(columns_to_remove), rename_map, collisions)
+        if signature is not None:
+            self._stored[signature] = {"sources": [list(positions) for positions in schema.sources],
+                                       "identity": schema.identity}
+            self._changed = True
+        return schema
+
+    @staticmethod
+    def _build(headers: tuple, columns_to_remove: set, rename_map: dict, collisions: str
+               ) -> TableSchema:
+        targets: dict = {}
+        for position, header in enumerate(headers):
+            if header in columns_to_remove:
+                continue
+            targets.setdefault(rename_map.get(header, header), []).append(position)
+
+        collided = {target: positions for target, positions in targets.items() if len(positions) > 1}
+        for target, positions in collided.items():
+            names = ", ".join(f"'{headers[position]}'" for position in positions)
+            if collisions == "raise":
+                raise ValueError(f"Столбцы {names} получают одно имя '{target}'")
+            logging.info(f"Столбцы {names} сводятся в '{target}'")
+        columns = tuple(targets)
+        return TableSchema(columns, tuple(tuple(positions) for positions in targets.values()),
+                           identity=columns == headers)
+
+
+def _signature(key: tuple) -> str:
+    """Хэш сигнатуры заголовка вместе с настройками и исходным кодом разбора (_build)."""
+    text = json.dumps([[repr(item) for item in part] if isinstance(part, tuple) else part for part in key],
+                      ensure_ascii=False)
+    return hashlib.sha256((_BUILD_SOURCE + text).encode("utf-8")).hexdigest()
+
+
+_BUILD_SOURCE = inspect.getsource(SchemaRegistry._build)
+
+# Общий реестр процесса
+schemas = SchemaRegistry()
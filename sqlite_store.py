@@ -0,0 +1,213 @@
+import argparse
+import logging
+import sqlite3
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from functions import MERGE_KEYS
+
+# Таблица итогового файла в базе по умолчанию
+DEFAULT_TABLE = "итог"
+# Строк в одном вызове executemany
+BATCH_SIZE = 5000
+# Служебный столбец: хэш значений строки, по нему находятся изменённые строки
+HASH_COLUMN = "_hash"
+
+
+def _quote(name) -> str:
+    """Имя столбца или таблицы в SQL: в кавычках, с удвоенными кавычками внутри."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _sql_type(dtype) -> str:
+    """Тип столбца SQLite по типу столбца pandas (у SQLite он лишь подсказка хранения)."""
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+
+def _column_values(series: pd.Series) -> list:
+    """Значения столбца для sqlite3: пропуски — None, даты — строки ISO, числа numpy — числа Python."""
+    values = series.to_numpy(dtype=object, copy=True)
+    values[pd.isna(values)] = None
+    result = values.tolist()
+    for i, value in enumerate(result):
+        if isinstance(value, (datetime, date)):
+            result[i] = value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+        elif isinstance(value, np.generic):
+            result[i] = value.item()
+    return result
+
+
+def _row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    Хэш значений каждой строки (hash_pandas_object с постоянным ключом — одинаковый от запуска
+    к запуску) как знаковое 64-битное целое, которое помещается в INTEGER SQLite.
+    Значения приводятся к строкам, чтобы хэш не зависел от типа хранения (category, ArrowDtype).
+    """
+    text = pd.DataFrame({i: df.iloc[:, i].astype(object).where(df.iloc[:, i].notna()).astype("str")
+                         for i in range(df.shape[1])})
+    return pd.util.hash_pandas_object(text, index=False).to_numpy().view(np.int64)
+
+
+def _batches(rows, size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _existing_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")]
+
+
+def _create_table(conn: sqlite3.Connection, df: pd.DataFrame, table: str) -> None:
+    """
+    Таблица со столбцами df и хэшем строки. Уникальный индекс ('ФИО', 'УЗ') — ключ upsert
+    и индекс поиска по 'ФИО' (левая часть ключа); отдельный индекс — для поиска по 'УЗ'.
+    """
+    columns = ", ".join(f"{_quote(column)} {_sql_type(dtype)}" for column, dtype in df.dtypes.items())
+    conn.execute(f"CREATE TABLE {_quote(table)} ({columns}, {_quote(HASH_COLUMN)} INTEGER)")
+    keys = ", ".join(map(_quote, MERGE_KEYS))
+    conn.execute(f"CREATE UNIQUE INDEX {_quote(f'{table}_ключ')} ON {_quote(table)} ({keys})")
+    conn.execute(f"CREATE INDEX {_quote(f'{table}_УЗ')} ON {_quote(table)} ({_quote('УЗ')})")
+
+
+def export_to_sqlite(df: pd.DataFrame, path, table: str = DEFAULT_TABLE,
+                     batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Записывает итоговую таблицу в базу SQLite: строки с ключом ('ФИО', 'УЗ') вставляются
+    или обновляются (upsert), строки с ключами, которых больше нет, удаляются.
+
+    По хэшу значений строки (столбец _hash) отбираются только новые и изменённые строки,
+    поэтому повторный запуск с теми же данными почти ничего не пишет. Всё выполняется
+    в одной транзакции пачками executemany; база в режиме WAL, так что читатели не ждут
+    записи и видят либо прошлый, либо новый результат целиком.
+
+    Если набор столбцов изменился (например, после правки config.json), таблица создаётся заново.
+
+    Args:
+        df: Итоговая таблица (без дубликатов 'ФИО'/'УЗ', как после smart_merge).
+        path: Файл базы.
+        table: Имя таблицы.
+        batch_size: Строк в одном вызове executemany.
+
+    Returns:
+        dict: Число строк: inserted, updated, deleted, unchanged; skipped — строки с пустым ключом.
+
+    Raises:
+        ValueError: В таблице нет 'ФИО' или 'УЗ', или ключи повторяются.
+    """
+    missing = [key for key in MERGE_KEYS if key not in df.columns]
+    if missing:
+        raise ValueError(f"Нет столбцов {', '.join(missing)}")
+    if not df.columns.is_unique:
+        raise ValueError("Имена столбцов повторяются")
+    na_keys = df[MERGE_KEYS].isna().any(axis=1).to_numpy()
+    skipped = int(na_keys.sum())
+    if skipped:
+        logging.warning(f"SQLite: строк с пустым 'ФИО' или 'УЗ': {skipped}, они не записываются")
+        df = df[~na_keys]
+    if df.duplicated(MERGE_KEYS).any():
+        raise ValueError("Ключи 'ФИО'/'УЗ' повторяются")
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Транзакция задаётся явно: иначе sqlite3 выполнял бы CREATE и DROP TABLE вне неё
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        # В режиме WAL synchronous=NORMAL не портит базу при сбое, а запись заметно быстрее
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            existing = _existing_columns(conn, table)
+            if existing and existing != [*map(str, df.columns), HASH_COLUMN]:
+                logging.info(f"SQLite: столбцы таблицы '{table}' изменились, она создаётся заново")
+                conn.execute(f"DROP TABLE {_quote(table)}")
+                existing = []
+            if not existing:
+                _create_table(conn, df, table)
+
+            keys = ", ".join(map(_quote, MERGE_KEYS))
+            stored = {(fio, login): row_hash for fio, login, row_hash in conn.execute(
+                f"SELECT {keys}, {_quote(HASH_COLUMN)} FROM {_quote(table)}")}
+
+            key_values = [_column_values(df[key]) for key in MERGE_KEYS]
+            hashes = _row_hashes(df).tolist()
+            changed = [i for i, (fio, login, row_hash) in enumerate(zip(*key_values, hashes))
+                       if stored.get((fio, login)) != row_hash]
+            current = set(zip(*key_values))
+            removed = [key for key in stored if key not in current]
+
+            inserted = sum((key_values[0][i], key_values[1][i]) not in stored for i in changed)
+            if changed:
+                part = df.iloc[changed]
+                rows = list(zip(*(_column_values(part.iloc[:, i]) for i in range(part.shape[1])),
+                                [hashes[i] for i in changed]))
+                columns = [*map(str, df.columns), HASH_COLUMN]
+                updates = ", ".join(f"{_quote(column)} = excluded.{_quote(column)}"
+                                    for column in columns if column not in MERGE_KEYS)
+                sql = (f"INSERT INTO {_quote(table)} ({', '.join(map(_quote, columns))}) "
+                       f"VALUES ({', '.join('?' * len(columns))}) "
+                       f"ON CONFLICT ({keys}) DO UPDATE SET {updates}")
+                for batch in _batches(rows, batch_size):
+                    conn.executemany(sql, batch)
+            if removed:
+                sql = (f"DELETE FROM {_quote(table)} WHERE "
+                       + " AND ".join(f"{_quote(key)} = ?" for key in MERGE_KEYS))
+                for batch in _batches(removed, batch_size):
+                    conn.executemany(sql, batch)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+    stats = {"inserted": inserted, "updated": len(changed) - inserted, "deleted": len(removed),
+             "unchanged": len(df) - len(changed), "skipped": skipped}
+    logging.info(f"SQLite {path} ('{table}'): добавлено {stats['inserted']}, изменено {stats['updated']}, "
+                 f"удалено {stats['deleted']}, без изменений {stats['unchanged']}")
+    return stats
+
+
+def lookup(path, fio: str | None = None, login: str | None = None,
+           table: str = DEFAULT_TABLE) -> pd.DataFrame:
+    """
+    Строки итоговой таблицы базы по 'ФИО' и/или 'УЗ' (поиск по индексам).
+
+    Raises:
+        ValueError: Не задано ни 'ФИО', ни 'УЗ'.
+    """
+    conditions = {key: value for key, value in zip(MERGE_KEYS, (fio, login)) if value is not None}
+    if not conditions:
+        raise ValueError("Нужно задать ФИО или УЗ")
+    conn = sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        cursor = conn.execute(
+            f"SELECT * FROM {_quote(table)} WHERE "
+            + " AND ".join(f"{_quote(key)} = ?" for key in conditions), list(conditions.values()))
+        columns = [column[0] for column in cursor.description]
+        result = pd.DataFrame(cursor.fetchall(), columns=columns)
+    finally:
+        conn.close()
+    return result.drop(columns=HASH_COLUMN)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Поиск прав сотрудника в базе SQLite итоговой таблицы")
+    parser.add_argument("database", type=Path, help="файл базы")
+    parser.add_argument("--fio", default=None, help="ФИО сотрудника")
+    parser.add_argument("--login", default=None, help="учётная запись (УЗ)")
+    parser.add_argument("--table", default=DEFAULT_TABLE)
+    args = parser.parse_args()
+    found = lookup(args.database, args.fio, args.login, args.table)
+    if found.empty:
+        print("Ничего не найдено")
+    for _, row in found.iterrows():
+        print("\n".join(f"{column}: {value}" for column, value in row.items() if value is not None))
+        print()
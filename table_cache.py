@@ -0,0 +1,261 @@
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+from pathlib import Path
+from typing import Iterable
+
+import pandas as pd
+
+import schema
+import xlsx_tables
+
+# Увеличивается при изменении формата записей кэша
+CACHE_FORMAT_VERSION = 1
+# Размер кэша по умолчанию
+DEFAULT_MAX_BYTES = 1024 * 2 ** 20
+
+_CACHE_SUFFIX = ".pkl"
+
+
+def file_digest(path: Path) -> str:
+    """Хэш содержимого файла."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(2 ** 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TableCache:
+    """
+    Дисковый кэш разобранных таблиц опросных листов.
+
+    Каждая таблица хранится отдельным файлом. Ключ записи — путь, размер, время изменения
+    и хэш содержимого файла, имя таблицы и отпечаток логики чтения и нормализации
+    (normalizer и модули xlsx_tables и schema), поэтому после правки любого из них записи
+    перестают совпадать и таблицы разбираются заново.
+
+    Таблицы сохраняются через pickle, а не Parquet/Feather: в столбцах опросных листов
+    встречаются значения разных типов (числа, строки, даты в одном столбце), которые
+    Arrow без потерь не хранит.
+
+    Кэш, который переживает запуск (режим наблюдения за каталогом), может держать таблицы
+    и в памяти (keep_in_memory): тогда неизменённые файлы не читаются даже из кэша на диске.
+    В памяти остаются только таблицы, запрошенные с прошлого вызова evict.
+
+    Args:
+        folder: Каталог кэша.
+        normalizer: Функция нормализации столбцов, входит в отпечаток логики.
+        max_bytes: Предельный размер кэша; старые записи удаляются первыми.
+        keep_in_memory: Держать таблицы и в памяти.
+    """
+
+    def __init__(self, folder, normalizer, max_bytes: int = DEFAULT_MAX_BYTES,
+                 keep_in_memory: bool = False):
+        self.folder = Path(folder)
+        self.max_bytes = max_bytes
+        self.keep_in_memory = keep_in_memory
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._file_keys: dict[Path, tuple[int, int, str]] = {}
+        self._memory: dict[Path, pd.DataFrame] = {}
+        self._used: set[Path] = set()
+        self._logic_fingerprint = hashlib.sha256("\n".join([
+            str(CACHE_FORMAT_VERSION),
+            pd.__version__,
+            inspect.getsource(normalizer),
+            inspect.getsource(xlsx_tables),
+            inspect.getsource(schema),
+        ]).encode("utf-8")).hexdigest()
+        os.makedirs(self.folder, exist_ok=True)
+
+    def _file_key(self, path: Path) -> str:
+        """
+        Отпечаток файла: путь, размер, время изменения и хэш содержимого.
+        Хэш считается заново, только если изменились размер или время изменения.
+        """
+        path = Path(path).resolve()
+        stat = path.stat()
+        known = self._file_keys.get(path)
+        if known is None or known[:2] != (stat.st_size, stat.st_mtime_ns):
+            key = "|".join([str(path), str(stat.st_size), str(stat.st_mtime_ns), file_digest(path)])
+            known = self._file_keys[path] = (stat.st_size, stat.st_mtime_ns, key)
+        return known[2]
+
+    def _entry_path(self, path: Path, table_name: str) -> Path:
+        key = "|".join([self._file_key(path), table_name, self._logic_fingerprint])
+        return self.folder / (hashlib.sha256(key.encode("utf-8")).hexdigest() + _CACHE_SUFFIX)
+
+    def get(self, path, table_names: Iterable[str]) -> dict[str, pd.DataFrame]:
+        """Возвращает найденные в кэше таблицы файла; отсутствующих в результате нет."""
+        found = {}
+        for table_name in table_names:
+            entry = self._entry_path(path, table_name)
+            if entry in self._memory:
+                found[table_name] = self._memory[entry]
+                self._used.add(entry)
+                self.hits += 1
+                continue
+            try:
+                with open(entry, "rb") as f:
+                    found[table_name] = pickle.load(f)
+            except FileNotFoundError:
+                self.misses += 1
+                continue
+            except Exception as e:
+                logging.warning(f"Повреждённая запись кэша {entry} удалена: {e}")
+                entry.unlink(missing_ok=True)
+                self.misses += 1
+                continue
+            # Время изменения записи служит отметкой последнего использования для вытеснения
+            os.utime(entry)
+            self.hits += 1
+            self._remember(entry, found[table_name])
+        return found
+
+    def _remember(self, entry: Path, df: pd.DataFrame) -> None:
+        if self.keep_in_memory:
+            self._memory[entry] = df
+            self._used.add(entry)
+
+    def put(self, path, tables: dict[str, pd.DataFrame]) -> None:
+        """Сохраняет таблицы файла в кэш."""
+        for table_name, df in tables.items():
+            entry = self._entry_path(path, table_name)
+            tmp = entry.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, entry)
+            self._remember(entry, df)
+
+    def evict(self) -> None:
+        """
+        Удаляет давно не использованные записи, пока кэш не уложится в max_bytes.
+        Из памяти удаляются таблицы, не запрошенные с прошлого вызова (старые версии файлов).
+        """
+        self._memory = {entry: df for entry, df in self._memory.items() if entry in self._used}
+        self._used = set()
+
+        entries = []
+        total = 0
+        for entry in self.folder.glob(f"*{_CACHE_SUFFIX}"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry))
+            total += stat.st_size
+
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Удаляет все записи кэша."""
+        self._memory.clear()
+        for entry in self.folder.glob(f"*{_CACHE_SUFFIX}"):
+            entry.unlink(missing_ok=True)
+
+    def log_stats(self) -> None:
+        logging.info(
+            f"Кэш таблиц {self.folder}: попаданий {self.hits}, промахов {self.misses}, "
+            f"вытеснено {self.evictions}")
+
+
+# Бюджет памяти кэша книг openpyxl по умолчанию
+DEFAULT_WORKBOOK_BUDGET = 512 * 2 ** 20
+# Грубая оценка памяти на одну ячейку openpyxl (объект Cell, стиль и значение)
+_BYTES_PER_CELL = 300
+
+
+def _estimate_workbook_size(wb) -> int:
+    """Оценка памяти, занятой загруженной книгой openpyxl, по числу ячеек."""
+    return sum(len(getattr(ws, "_cells", ())) for ws in wb.worksheets) * _BYTES_PER_CELL
+
+
+class WorkbookCache:
+    """
+    Кэш загруженных книг openpyxl в памяти с бюджетом в байтах.
+
+    Ключ — нормализованный абсолютный путь, поэтому Path и str одного файла дают одну запись.
+    Если заранее сообщить, какие таблицы нужны из файла (expect), книга вытесняется сразу
+    после того, как все они извлечены (mark_extracted). При превышении бюджета вытесняются
+    давно не использованные книги.
+
+    Args:
+        loader: Функция загрузки книги по пути.
+        max_bytes: Бюджет памяти на все книги.
+    """
+
+    def __init__(self, loader, max_bytes: int = DEFAULT_WORKBOOK_BUDGET):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Порядок словаря — порядок последнего использования
+        self._entries: dict[Path, tuple[object, int]] = {}
+        self._pending: dict[Path, set[str]] = {}
+
+    @staticmethod
+    def _key(path) -> Path:
+        return Path(os.path.normcase(os.path.abspath(path)))
+
+    @property
+    def size(self) -> int:
+        return sum(size for _, size in self._entries.values())
+
+    def get(self, path):
+        """Возвращает книгу из кэша или загружает её."""
+        key = self._key(path)
+        if key in self._entries:
+            self.hits += 1
+            self._entries[key] = self._entries.pop(key)
+            return self._entries[key][0]
+
+        self.misses += 1
+        wb = self.loader(path)
+        self._entries[key] = (wb, _estimate_workbook_size(wb))
+        self._shrink(keep=key)
+        return wb
+
+    def expect(self, path, table_names: Iterable[str]) -> None:
+        """Сообщает, какие таблицы ещё будут извлечены из файла."""
+        self._pending.setdefault(self._key(path), set()).update(table_names)
+
+    def mark_extracted(self, path, table_names: Iterable[str]) -> None:
+        """Отмечает таблицы извлечёнными; книга вытесняется, когда ожидаемых таблиц не осталось."""
+        key = self._key(path)
+        pending = self._pending.get(key)
+        if pending is None:
+            return
+        pending.difference_update(table_names)
+        if not pending:
+            del self._pending[key]
+            self._evict(key, "все таблицы извлечены")
+
+    def _evict(self, key: Path, reason: str) -> None:
+        if key in self._entries:
+            del self._entries[key]
+            self.evictions += 1
+            logging.debug(f"Книга {key} вытеснена из кэша: {reason}")
+
+    def _shrink(self, keep: Path) -> None:
+        """Вытесняет давно не использованные книги, пока кэш не уложится в бюджет."""
+        for key in list(self._entries):
+            if self.size <= self.max_bytes:
+                break
+            if key != keep:
+                self._evict(key, "превышен бюджет памяти")
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._pending.clear()
+
+    def log_stats(self) -> None:
+        logging.info(
+            f"Кэш книг: попаданий {self.hits}, промахов {self.misses}, вытеснено {self.evictions}, "
+            f"в памяти {len(self._entries)} книг (~{self.size / 2 ** 20:.1f} МБ)")
@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Модули проекта лежат в корне репозитория, а не в пакете
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("suite", "набор замеров tests/test_benchmarks.py")
+    group.addoption("--suite-rows", type=int, default=200, help="строк в каждой таблице опросных листов")
+    group.addoption("--suite-columns", type=int, default=20, help="столбцов в каждой таблице")
+    group.addoption("--suite-rounds", type=int, default=5, help="запусков замеров с подготовкой данных")
+
+
+@pytest.fixture
+def main_folders(tmp_path, monkeypatch):
+    """
+    Служебные каталоги main (кэш, контрольные точки, состояние --incremental, логи)
+    во временном каталоге: запуски из тестов не трогают каталоги репозитория.
+    """
+    import main
+
+    for name in ("CACHE_FOLDER", "CHECKPOINT_FOLDER", "INCREMENTAL_FOLDER", "LOG_FOLDER"):
+        monkeypatch.setattr(main, name, tmp_path / name.lower())
+    return tmp_path
@@ -0,0 +1,308 @@
+"""
+Данные для тестов и замеров benchmark.py: генераторы таблиц и прежние реализации
+функций обработки — эталоны, с которыми сравниваются нынешние.
+"""
+import os
+import shutil
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.cell import range_boundaries
+
+import functions
+from config_manager import config
+from questionnaire_generator import SURNAMES
+
+
+def random_frame(rows: int, columns: int, seed: int, duplicate_rate: float = 0.3,
+                 na_key_rate: float = 0.02) -> pd.DataFrame:
+    """Случайная таблица в духе опросных листов: дубли по ('ФИО', 'УЗ'), пропуски, смешанные типы."""
+    rng = np.random.default_rng(seed)
+    n_people = max(1, int(rows * (1 - duplicate_rate)))
+    person = rng.integers(0, n_people, rows)
+    data = {
+        "ФИО": np.array([f"Сотрудник {i}" for i in person], dtype=object),
+        "УЗ": np.array([f"user{i}" for i in person], dtype=object),
+    }
+    for key in ("ФИО", "УЗ"):
+        data[key][rng.random(rows) < na_key_rate] = None
+
+    pools = [
+        np.array(["+", None, None], dtype=object),
+        np.array(["ТЭЦ-27", "ТЭЦ-12", None, "  "], dtype=object),
+        np.array([1, 2, None, 3.5, "4"], dtype=object),
+        np.array([pd.Timestamp("2024-01-01"), pd.Timestamp("2024-06-30"), None], dtype=object),
+    ]
+    for i in range(columns):
+        pool = pools[i % len(pools)]
+        data[f"Столбец {i}"] = pool[rng.integers(0, len(pool), rows)]
+    return pd.DataFrame(data)
+
+
+def smart_merge_iterrows(df: pd.DataFrame, rename_map: dict[str, str]) -> pd.DataFrame:
+    """Прежняя построчная реализация smart_merge — эталон для проверки."""
+    df = df.copy()
+    df.rename(columns=rename_map, inplace=True)
+    final_rows = []
+    for _, group in df.groupby(['ФИО', 'УЗ'], as_index=False):
+        original = group.iloc[0].copy()
+        for _, duplicate in group.iloc[1:].iterrows():
+            for col in df.columns:
+                if pd.isna(original[col]) and not pd.isna(duplicate[col]):
+                    original[col] = duplicate[col]
+        final_rows.append(original)
+    return pd.DataFrame(final_rows)
+
+
+def permission_frame(rows: int, seed: int) -> pd.DataFrame:
+    """Таблица со всеми столбцами прав из REPLACE_ENERGYMAIN и REPLACE_ACCESS, заполненными '+' и пропусками."""
+    rng = np.random.default_rng(seed)
+    columns = {**config.REPLACE_ENERGYMAIN, **config.REPLACE_ACCESS}
+    pool = np.array(["+", None, None, "-"], dtype=object)
+    data = {"ФИО": [f"Сотрудник {i}" for i in range(rows)]}
+    for column in columns:
+        data[column] = pool[rng.integers(0, len(pool), rows)]
+    return pd.DataFrame(data)
+
+
+def apply_replacements_pairwise(df: pd.DataFrame, *replace_dicts) -> pd.DataFrame:
+    """Прежняя реализация: отдельный Series.replace на каждую пару замен."""
+    for replace_dict in replace_dicts:
+        for column, replacements in replace_dict.items():
+            if column in df.columns:
+                for old_value, new_value in replacements.items():
+                    df[column] = df[column].replace(old_value, new_value)
+    return df
+
+
+def rules_workload(rows: int, rules: int, seed: int) -> tuple[pd.DataFrame, dict]:
+    """
+    Столбцы прав строкового типа и словарь замен с rules парами на каждый столбец —
+    как у справочников с несколькими уровнями доступа ('R', 'W', 'RW' и т. п.).
+    """
+    rng = np.random.default_rng(seed)
+    columns = list({**config.REPLACE_ENERGYMAIN, **config.REPLACE_ACCESS})
+    values = [f"Уровень {i}" for i in range(rules)]
+    replace_dict = {column: {value: f"{value}-код" for value in values} for column in columns}
+    pool = np.array([*values, None, ""], dtype=object)
+    df = pd.DataFrame({column: pd.array(pool[rng.integers(0, len(pool), rows)], dtype="str")
+                       for column in columns})
+    return df, replace_dict
+
+
+def mixed_permission_frame(rows: int, seed: int) -> pd.DataFrame:
+    """Столбцы прав со смешанными типами: строки с пробелами, целые, дробные, даты, пропуски."""
+    rng = np.random.default_rng(seed)
+    pools = [
+        np.array(["10001700-0000", " 1 ", "\t", "", None, "+\n"], dtype=object),
+        np.array([1, 2, None, 0], dtype=object),
+        np.array([1.5, 2.0, np.nan, -0.0], dtype=float),
+        pd.to_datetime(["2024-01-01 00:00", "2024-06-30 12:30", None]).to_numpy(),
+        np.array([7, 8, 9], dtype="int64"),
+        np.array([True, False, None, "x"], dtype=object),
+    ]
+    columns = list({**config.REPLACE_ENERGYMAIN, **config.REPLACE_ACCESS})
+    data = {"ФИО": [f"Сотрудник {i}" for i in range(rows)]}
+    for i, column in enumerate(columns):
+        pool = pools[i % len(pools)]
+        data[column] = pool[rng.integers(0, len(pool), rows)]
+    return pd.DataFrame(data)
+
+
+def combine_columns_apply(df: pd.DataFrame, replace_key: str, drop: bool) -> pd.DataFrame:
+    """Прежняя реализация combine_columns_by_replace_key через построчный DataFrame.apply."""
+    columns_to_combine = list(getattr(config, replace_key, {}).keys())
+
+    def combine_row_values(row):
+        values = []
+        for col in columns_to_combine:
+            val = row.get(col)
+            if pd.notna(val) and str(val).strip():
+                values.append(str(val).strip())
+        return "!".join(values)
+
+    df[f"{replace_key}_combined"] = df.apply(combine_row_values, axis=1)
+    if drop:
+        df.drop(columns=[col for col in columns_to_combine if col in df.columns], inplace=True)
+    return df
+
+
+def input_files(folder: Path) -> list[Path]:
+    """Опросные листы каталога, без временных файлов Excel ('~$')."""
+    return sorted(
+        folder / name for name in os.listdir(folder)
+        if name.endswith(".xlsx") and "~$" not in name)
+
+
+def edit_table(path: Path, table_name: str, edit) -> None:
+    """Меняет значения именованной таблицы книги: edit(header, cell) для каждой ячейки данных."""
+    wb = load_workbook(path)
+    for ws in wb.worksheets:
+        if table_name in ws.tables:
+            min_col, min_row, max_col, max_row = range_boundaries(ws.tables[table_name].ref)
+            headers = [ws.cell(min_row, col).value for col in range(min_col, max_col + 1)]
+            for row in ws.iter_rows(min_row=min_row + 1, max_row=max_row,
+                                    min_col=min_col, max_col=max_col):
+                for header, cell in zip(headers, row):
+                    edit(header, cell)
+    wb.save(path)
+
+
+def input_changes() -> list[tuple[str, object]]:
+    """Изменения каталога опросных листов: изменение ячейки, новый файл, удаление файла."""
+    fio_columns = {raw for raw, name in config.RENAME_MAP.items() if name == "ФИО"} | {"ФИО"}
+
+    def change_cell(inputs: Path) -> None:
+        path = inputs / "Опросный лист ОЖ.xlsx"
+        state = {"done": False}
+
+        def edit(header, cell):
+            if not state["done"] and header not in fio_columns and cell.value is not None:
+                cell.value = f"{cell.value} (изменено)"
+                state["done"] = True
+        edit_table(path, "Рук", edit)
+
+    def add_file(inputs: Path) -> None:
+        path = inputs / "Опросный лист ОЖ 2.xlsx"
+        shutil.copy(inputs / "Опросный лист ОЖ.xlsx", path)
+
+        def edit(header, cell):
+            if header in fio_columns and cell.value is not None:
+                cell.value = f"{cell.value} 2"
+        edit_table(path, "Рук", edit)
+
+    def remove_file(inputs: Path) -> None:
+        (inputs / "Опросный лист ЖД.xlsx").unlink()
+
+    return [
+        ("изменена ячейка", change_cell),
+        ("добавлен файл", add_file),
+        ("удалён файл", remove_file),
+    ]
+
+
+def rights_frame(rows: int, rights: int, seed: int) -> tuple[pd.DataFrame, SimpleNamespace]:
+    """
+    Разреженная таблица прав после compact_dtypes и замен, до smart_merge: у сотрудника
+    около двух строк, каждое право выдано в 5% строк. Возвращает таблицу и config
+    с ключом REPLACE_RIGHTS.
+    """
+    rng = np.random.default_rng(seed)
+    person = rng.integers(0, max(1, rows // 2), rows)
+    replace = {f"Право {i}": {"+": f"{i:08d}-0000-0000-C000-0000006D746C"} for i in range(rights)}
+    data = {"ФИО": [f"Сотрудник {i}" for i in person], "УЗ": [f"user{i}" for i in person]}
+    for column in replace:
+        present = rng.random(rows) < 0.05
+        data[column] = np.where(present, "+", None).tolist()
+    df = functions.compact_dtypes(pd.DataFrame(data))
+    df = functions.apply_replacements(df, replace)
+    return df, SimpleNamespace(REPLACE_RIGHTS=replace)
+
+
+def engine_tables(rows: int, seed: int, edge_cases: bool = False) -> dict[str, list[pd.DataFrame]]:
+    """
+    Таблицы модулей MODULES (всего около rows строк) в том виде, в каком их отдаёт чтение
+    опросных листов: текст — str, '№' — int64, 'Столбец1' — bool, права REPLACE_ENERGYMAIN
+    и REPLACE_ACCESS — '+' или пусто. Строятся из массивов numpy, поэтому годятся
+    и для миллионов строк.
+
+    edge_cases добавляет то, на чём движки могли бы разойтись: пустые 'ФИО' и 'УЗ', права
+    с пробелами по краям, пустые строки и другие значения, таблицу без части прав и с другим
+    порядком столбцов, два столбца учётной записи, сводимые в 'УЗ'.
+    """
+    rng = np.random.default_rng(seed)
+    tables = [(module, name) for module, module_config in config.MODULES.items()
+              for name in module_config["table_names"]]
+    sizes = np.full(len(tables), rows // len(tables))
+    sizes[:rows % len(tables)] += 1
+    permissions = list(dict.fromkeys([*config.REPLACE_ENERGYMAIN, *config.REPLACE_ACCESS]))
+    pool = np.array(["+", None, None] + (["  + ", "", "x"] if edge_cases else []), dtype=object)
+    surnames = np.array(SURNAMES, dtype=object)
+
+    result: dict[str, list[pd.DataFrame]] = {}
+    for number, ((module, _), size) in enumerate(zip(tables, sizes)):
+        person = pd.Series(rng.integers(0, max(1, rows * 2 // 3), size))
+        fio = surnames[person.to_numpy() % len(surnames)] + " " + person.astype(str).to_numpy(dtype=object)
+        login = "user" + person.astype(str).to_numpy(dtype=object)
+        data = {
+            "№": np.arange(1, size + 1, dtype=np.int64),
+            "Организация": pd.Series([f"Филиал {i}" for i in range(12)], dtype="str").take(
+                rng.integers(0, 12, size)).to_numpy(),
+            "ФИО": fio,
+            "Столбец1": np.ones(size, dtype=bool),
+            "Учетная запись в MS AD": login,
+            "Должность": pd.Series([f"Должность {i}" for i in range(150)], dtype="str").take(
+                rng.integers(0, 150, size)).to_numpy(),
+        }
+        for column in permissions:
+            data[column] = pool[rng.integers(0, len(pool), size)]
+        df = pd.DataFrame(data)
+        df = df.astype({column: "str" for column, dtype in df.dtypes.items() if dtype == object
+                        and column not in permissions})
+        if edge_cases:
+            keys = df[["ФИО", "Учетная запись в MS AD"]].to_numpy(dtype=object)
+            keys[rng.random(keys.shape) < 0.01] = None
+            df["ФИО"], df["Учетная запись в MS AD"] = pd.array(keys[:, 0], dtype="str"), pd.array(keys[:, 1], dtype="str")
+            if number == 1:
+                # Часть прав не заведена, столбцы в другом порядке
+                df = df.drop(columns=permissions[::2])[list(reversed(df.columns.drop(permissions[::2])))]
+            if number == 2:
+                # Вторая учётная запись заполняет пропуски первой
+                df.insert(5, "Учетная запись MS AD", login)
+        result.setdefault(module, []).append(df)
+    return result
+
+
+def pandas_chain(module_tables: dict[str, list[pd.DataFrame]]) -> pd.DataFrame:
+    """Этапы движка pandas от склейки таблиц до объединения столбцов, без выгрузки Excel."""
+    import main
+
+    combined = pd.concat([
+        functions.combine_dataframes(dfs, config.MODULES[module]["columns_to_remove"], config.RENAME_MAP)
+        for module, dfs in module_tables.items()], ignore_index=True)
+    combined = functions.compact_dtypes(combined, config.DTYPES)
+    replaced = functions.apply_replacements(combined, config.REPLACE_ENERGYMAIN, config.REPLACE_ACCESS)
+    merged = functions.smart_merge(replaced, config.RENAME_MAP)
+    return functions.combine_columns_by_replace_keys(merged.copy(deep=False), main.COMBINE_KEYS, config)
+
+
+def polars_chain(module_tables: dict[str, list[pd.DataFrame]]) -> pd.DataFrame:
+    """Те же этапы одним планом движка polars; результат переводится в pandas, как для выгрузки."""
+    import main
+    import polars_engine
+
+    plan = polars_engine.build_plan(
+        module_tables, {module: config.MODULES[module]["columns_to_remove"] for module in module_tables},
+        config.RENAME_MAP, (config.REPLACE_ENERGYMAIN, config.REPLACE_ACCESS), main.COMBINE_KEYS, config)
+    combined, = plan.collect([plan.combined])
+    return polars_engine.to_pandas(combined)
+
+
+def engine_differences(expected: pd.DataFrame, actual: pd.DataFrame) -> list[str]:
+    """
+    Расхождения результатов движков по тому, что попадает в Excel: имена и порядок столбцов,
+    значения (пропуски любого вида равны) и вид значений (строки, целые, дробные, даты).
+    Типы хранения (category, ArrowDtype, Int64) не сравниваются.
+    """
+    if list(expected.columns) != list(actual.columns):
+        return [f"столбцы: {list(expected.columns)} != {list(actual.columns)}"]
+    if len(expected) != len(actual):
+        return [f"строк: {len(expected)} != {len(actual)}"]
+    differences = []
+    for position, column in enumerate(expected.columns):
+        a = expected.iloc[:, position].to_numpy(dtype=object)
+        b = actual.iloc[:, position].to_numpy(dtype=object)
+        a[pd.isna(a)] = None
+        b[pd.isna(b)] = None
+        kinds = (pd.api.types.infer_dtype(a, skipna=True), pd.api.types.infer_dtype(b, skipna=True))
+        if kinds[0] != kinds[1] and "empty" not in kinds:
+            differences.append(f"'{column}': {kinds[0]} != {kinds[1]}")
+            continue
+        mismatch = np.flatnonzero(a != b)
+        if len(mismatch):
+            row = mismatch[0]
+            differences.append(f"'{column}': строк {len(mismatch)}, например {a[row]!r} != {b[row]!r}")
+    return differences
@@ -0,0 +1,50 @@
+"""
+Набор замеров pytest-benchmark на синтетических опросных листах (questionnaire_generator).
+
+Запуск и сравнение с прошлыми результатами:
+    python -m pytest tests/test_benchmarks.py --suite-rows 2000 --benchmark-autosave
+    python -m pytest tests/test_benchmarks.py --suite-rows 2000 --benchmark-compare --benchmark-compare-fail=min:20%
+"""
+from pathlib import Path
+
+import pytest
+
+import main
+from benchmark import suite_case_names, suite_cases
+from questionnaire_generator import GeneratorOptions, generate
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.fixture(scope="module")
+def cases(request, tmp_path_factory):
+    """Замеры suite_cases по именам на опросных листах, сгенерированных один раз на модуль."""
+    folder = tmp_path_factory.mktemp("suite")
+    inputs, outputs = folder / "in", folder / "out"
+    outputs.mkdir()
+    generate(inputs, GeneratorOptions(rows=request.config.getoption("--suite-rows"),
+                                      columns=request.config.getoption("--suite-columns")))
+    return {name: (func, setup) for name, func, setup in suite_cases(inputs, outputs)}
+
+
+@pytest.mark.parametrize("name", suite_case_names())
+def test_suite(benchmark, cases, name, request):
+    func, setup = cases[name]
+    benchmark.extra_info["rows"] = request.config.getoption("--suite-rows")
+    if setup is None:
+        benchmark(func)
+    else:
+        # Подготовка (копия изменяемой таблицы) не входит в замер
+        benchmark.pedantic(func, setup=lambda: (setup(), {}),
+                           rounds=request.config.getoption("--suite-rounds"))
+
+
+def test_full_run_keeps_repository_folders(cases):
+    """Замер полного запуска пишет контрольные точки и логи во временный каталог и возвращает их main."""
+    folders = {name: getattr(main, name)
+               for name in ("CACHE_FOLDER", "CHECKPOINT_FOLDER", "INCREMENTAL_FOLDER", "LOG_FOLDER")}
+    func, _ = cases["full_run"]
+    result = func()
+    assert {name: getattr(main, name) for name in folders} == folders
+    for path in (result.log_path, result.report_path):
+        assert not Path(path).is_relative_to(main.LOG_FOLDER)
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+import main
+from checkpoints import CheckpointMismatch, load_checkpoint, save_checkpoint
+from instrumentation import RunReport
+from questionnaire_generator import GeneratorOptions, generate
+
+pytest.importorskip("pyarrow")
+
+
+def test_object_columns_with_strings_and_nulls_use_arrow(tmp_path):
+    """Строки и пустые столбцы object идут в Arrow и читаются обратно тем же типом и пропусками."""
+    df = pd.DataFrame({
+        "ФИО": pd.Series(["Иванов И.И.", "Петров П.П.", "Сидоров С.С."], dtype="str"),
+        "Строки с None": pd.Series(["a", None, "b"], dtype=object),
+        "Строки с NaN": pd.Series(["a", np.nan, "b"], dtype=object),
+        "Пустой": pd.Series([np.nan] * 3, dtype=object),
+        "Модуль": pd.Categorical(["ОЖ", "ЖД", "ОЖ"]),
+        "Номер": [1, 2, 3],
+    })
+    path = save_checkpoint(df, tmp_path, "load")
+    assert path.suffix == ".arrow"
+    assert_frame_equal(load_checkpoint(tmp_path, "load"), df)
+
+
+def test_mixed_nulls_in_empty_column_are_restored_as_none(tmp_path):
+    """Столбец, где после concat модулей есть и None, и NaN, не уводит контрольную точку в pickle."""
+    df = pd.DataFrame({"Право": pd.Series([None, np.nan, "+"], dtype=object)})
+    assert save_checkpoint(df, tmp_path, "replace").suffix == ".arrow"
+    loaded = load_checkpoint(tmp_path, "replace")
+    assert loaded["Право"].dtype == object
+    assert loaded["Право"].tolist() == [None, None, "+"]
+
+
+def test_values_of_different_types_fall_back_to_pickle(tmp_path):
+    """Целые и строки в одном столбце Arrow исказил бы — такая таблица сохраняется через pickle."""
+    df = pd.DataFrame({"Значение": pd.Series([1, "2", None], dtype=object)})
+    assert save_checkpoint(df, tmp_path, "merge").suffix == ".pkl"
+    assert_frame_equal(load_checkpoint(tmp_path, "merge"), df)
+
+
+def test_checkpoint_from_other_data_is_refused(tmp_path):
+    """Контрольная точка других входных данных не загружается; без meta проверки нет."""
+    df = pd.DataFrame({"ФИО": ["Иванов"]})
+    meta = {"files": [["Опросный лист ОЖ.xlsx", 100, 1]], "modules": ["ОЖ"], "settings": "a"}
+    save_checkpoint(df, tmp_path, "replace", meta)
+    assert_frame_equal(load_checkpoint(tmp_path, "replace", meta), df)
+    assert_frame_equal(load_checkpoint(tmp_path, "replace"), df)
+    with pytest.raises(CheckpointMismatch, match="modules"):
+        load_checkpoint(tmp_path, "replace", {**meta, "modules": ["ОЖ", "ЖД"]})
+    with pytest.raises(CheckpointMismatch, match="files, settings"):
+        load_checkpoint(tmp_path, "replace", {**meta, "files": [], "settings": "b"})
+
+
+def test_checkpoint_without_description_is_refused(tmp_path):
+    """Контрольная точка прежнего формата, без описания, с --from-stage не загружается."""
+    save_checkpoint(pd.DataFrame({"ФИО": ["Иванов"]}), tmp_path, "merge")
+    (tmp_path / "merge.json").unlink()
+    with pytest.raises(CheckpointMismatch, match="нет описания"):
+        load_checkpoint(tmp_path, "merge", {"modules": ["ОЖ"]})
+
+
+def test_from_stage_refuses_checkpoints_of_changed_inputs(main_folders):
+    """--from-stage после изменения опросных листов или с другими модулями — ошибка, а не старые данные."""
+    inputs = main_folders / "in"
+    generate(inputs, GeneratorOptions(rows=50, columns=10))
+
+    def run(argv):
+        return main.run_stages(main.parse_args(["--input-folder", str(inputs), *argv]),
+                               RunReport(), lambda name, df: None)
+
+    full = run([])
+    assert_frame_equal(run(["--from-stage", "merge"]), full)
+    with pytest.raises(CheckpointMismatch, match="modules"):
+        run(["--from-stage", "merge", "--modules", next(iter(main.MODULES))])
+    path = next(inputs.iterdir())
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10 ** 9))
+    with pytest.raises(CheckpointMismatch, match="files"):
+        run(["--from-stage", "merge"])
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from excel_writer import (EXCEL_MAX_COLUMNS, EXCEL_MAX_ROWS, EXCEL_WRITERS, SHEET_NAME,
+                          write_openpyxl_write_only, xlsxwriter)
+
+STREAMING_WRITERS = ["write_only"] + (["xlsxwriter"] if xlsxwriter is not None else [])
+
+
+def test_write_only_header_matches_table_columns(tmp_path):
+    """Имена не-строковых столбцов в ячейках заголовка те же, что в описании таблицы."""
+    df = pd.DataFrame([[1, "a", None]], columns=[2024, "ФИО", ("Права", "Чтение")])
+    path = tmp_path / "result.xlsx"
+    write_openpyxl_write_only(df, str(path))
+
+    ws = load_workbook(path)[SHEET_NAME]
+    header = [cell.value for cell in ws[1]]
+    (table,) = ws.tables.values()
+    assert header == [column.name for column in table.tableColumns]
+    assert header == ["2024", "ФИО", "('Права', 'Чтение')"]
+
+
+@pytest.mark.parametrize("writer", STREAMING_WRITERS)
+@pytest.mark.parametrize("shape", [(EXCEL_MAX_ROWS, 1), (1, EXCEL_MAX_COLUMNS + 1)])
+def test_streaming_writers_reject_frames_larger_than_a_sheet(tmp_path, writer, shape):
+    """Таблица больше листа Excel (строк с заголовком или столбцов) — ошибка, а не обрезанный файл."""
+    df = pd.DataFrame(np.zeros(shape, dtype=np.int8))
+    path = tmp_path / "result.xlsx"
+    with pytest.raises(ValueError, match="не помещается на лист Excel"):
+        EXCEL_WRITERS[writer](df, str(path))
+    assert not path.exists()
+
+
+@pytest.mark.parametrize("writer", STREAMING_WRITERS)
+def test_streaming_writers_accept_full_width(tmp_path, writer):
+    df = pd.DataFrame(np.zeros((1, EXCEL_MAX_COLUMNS), dtype=np.int8))
+    EXCEL_WRITERS[writer](df, str(tmp_path / "result.xlsx"))
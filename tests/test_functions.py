@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+import functions
+from config_manager import config
+from tests.helpers import (apply_replacements_pairwise, combine_columns_apply, mixed_permission_frame,
+                           permission_frame, random_frame, rules_workload, smart_merge_iterrows)
+
+SAMPLE_FOLDER = config.ROOT / "Обрабатываемые"
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_smart_merge_matches_iterrows(seed):
+    """smart_merge совпадает с прежней построчной реализацией на случайных данных."""
+    df = random_frame(500, 12, seed)
+    expected = smart_merge_iterrows(df, config.RENAME_MAP)
+    actual = functions.smart_merge(df, config.RENAME_MAP)
+    assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_apply_replacements_matches_pairwise_config():
+    """Замены по словарям config.json совпадают с попарными Series.replace."""
+    dicts = (config.REPLACE_ENERGYMAIN, config.REPLACE_ACCESS)
+    df = permission_frame(2000, seed=0)
+    expected = apply_replacements_pairwise(df.copy(), *dicts)
+    assert_frame_equal(functions.apply_replacements(df.copy(), *dicts), expected)
+
+
+def test_apply_replacements_matches_pairwise_many_rules():
+    """Несколько пар на столбец в строковом столбце: значения и тип как у попарных replace."""
+    df, replace_dict = rules_workload(2000, rules=10, seed=1)
+    expected = apply_replacements_pairwise(df.copy(), replace_dict)
+    assert_frame_equal(functions.apply_replacements(df.copy(), replace_dict), expected)
+
+
+def test_apply_replacements_composes_chained_rules():
+    """Цепочки и перестановки замен дают тот же итог, что последовательные replace."""
+    df = pd.DataFrame({"Право": pd.Series(["a", "b", "c", None, "+"], dtype=object)})
+    dicts = ({"Право": {"+": "a", "a": "b"}}, {"Право": {"b": "a", "c": "+"}})
+    expected = apply_replacements_pairwise(df.copy(), *dicts)
+    assert_frame_equal(functions.apply_replacements(df.copy(), *dicts), expected)
+
+
+@pytest.mark.parametrize("drop", [True, False])
+@pytest.mark.parametrize("seed", range(3))
+def test_combine_columns_matches_apply(seed, drop):
+    """Объединённые столбцы побайтно совпадают с построчным DataFrame.apply на смешанных типах."""
+    keys = ["REPLACE_ENERGYMAIN", "REPLACE_ACCESS"]
+    df = mixed_permission_frame(1000, seed)
+    expected = df.copy()
+    for key in keys:
+        expected = combine_columns_apply(expected, key, drop=drop)
+    actual = functions.combine_columns_by_replace_keys(df.copy(), keys, config, drop=drop)
+    assert_frame_equal(actual, expected)
+
+
+@pytest.mark.skipif(not SAMPLE_FOLDER.is_dir(), reason="нет опросных листов из репозитория")
+@pytest.mark.parametrize("engine", list(functions.TABLE_READERS))
+def test_load_indexed_tables_leaves_no_pending_workbooks(engine):
+    """После загрузки кэш книг не ждёт таблиц: иначе в постоянном процессе он растёт без предела."""
+    index = functions.discover_input_files(SAMPLE_FOLDER, config.MODULES)
+    functions.load_indexed_tables(index, engine=engine)
+    assert functions._workbook_cache._pending == {}
@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from config_check import check_config
+from identity import MATCH_KINDS, IdentityRules, resolve_identities
+
+
+def _namesakes() -> pd.DataFrame:
+    """Два однофамильца с одинаковыми ФИО: у одного УЗ заполнен, у другого — нет."""
+    return pd.DataFrame({
+        "ФИО": ["Иванов Иван Иванович", "Иванов Иван Иванович", "Петров Пётр Петрович"],
+        "УЗ": ["ivanovii", None, "petrovpp"],
+        "Право": ["+", None, "+"],
+    })
+
+
+def test_missing_login_of_namesake_goes_to_review():
+    """Строка без УЗ не приписывается единственному видимому тёзке, а попадает в отчёт."""
+    df = _namesakes()
+    resolved, report = resolve_identities(df, IdentityRules(enabled=True))
+
+    assert resolved["УЗ"].isna().tolist() == [False, True, False]
+    assert report["Действие"].tolist() == ["проверить"]
+    assert report["Правило"].tolist() == [MATCH_KINDS["missing"]]
+    assert pd.isna(report["УЗ"].iloc[0]) and report["УЗ (итог)"].iloc[0] == "ivanovii"
+
+
+def test_fill_missing_merge_attaches_the_row():
+    """С fill_missing_merge строка без УЗ получает УЗ единственного сотрудника с тем же ФИО."""
+    resolved, report = resolve_identities(_namesakes(), IdentityRules(enabled=True, fill_missing_merge=True))
+
+    assert resolved["УЗ"].tolist() == ["ivanovii", "ivanovii", "petrovpp"]
+    assert report["Действие"].tolist() == ["объединено"]
+
+
+@pytest.mark.parametrize("section, message", [
+    ({"enabled": True, "fuzy": True}, "Неизвестные правила IDENTITY: fuzy"),
+    ({"max_block_size": "много"}, "Недопустимое значение правила IDENTITY max_block_size: 'много'"),
+    (["enabled"], "Раздел IDENTITY должен быть словарём"),
+])
+def test_check_config_reports_invalid_identity(tmp_path, section, message):
+    """Ошибка в разделе IDENTITY находится проверкой настроек, до запуска обработки."""
+    raw = {"RENAME_MAP": {}, "REPLACE_ENERGYMAIN": {}, "REPLACE_ACCESS": {}, "MODULES": {},
+           "IDENTITY": section}
+    check = check_config(tmp_path, raw)
+    assert [issue.message for issue in check.errors] == [message]
@@ -0,0 +1,63 @@
+import json
+import shutil
+
+import pytest
+from pandas.testing import assert_frame_equal
+
+import main
+from config_manager import config
+from instrumentation import RunReport
+from tests.helpers import input_changes, input_files
+from watch_service import WatchService
+
+SAMPLE_FOLDER = config.ROOT / "Обрабатываемые"
+
+
+@pytest.fixture
+def inputs(main_folders, monkeypatch):
+    """Копия опросных листов из репозитория как входной каталог main."""
+    folder = main_folders / "Обрабатываемые"
+    folder.mkdir()
+    for path in input_files(SAMPLE_FOLDER):
+        shutil.copy(path, folder / path.name)
+    monkeypatch.setattr(main, "INPUT_FOLDER", folder)
+    return folder
+
+
+def _run(argv: list[str]) -> dict:
+    exports = {}
+    main.run_stages(main.parse_args(argv), RunReport(),
+                    lambda name, df: exports.__setitem__(name, df))
+    return exports
+
+
+@pytest.mark.skipif(not SAMPLE_FOLDER.is_dir(), reason="нет опросных листов из репозитория")
+def test_incremental_matches_full_rebuild(inputs):
+    """После каждого изменения каталога все выгрузки инкрементального запуска совпадают с полной сборкой."""
+    steps = [("первый запуск", None), ("без изменений", lambda folder: None), *input_changes()]
+    for title, mutate in steps:
+        if mutate is not None:
+            mutate(inputs)
+        incremental = _run(["--incremental"])
+        full = _run([])
+        assert incremental.keys() == full.keys(), title
+        for name, df in full.items():
+            assert_frame_equal(incremental[name], df, obj=f"{title}: {name}")
+
+
+def test_watch_service_records_config_errors(inputs, monkeypatch):
+    """Ошибка перечитывания config.json записывается в итог пачки, служба продолжает работу."""
+    def broken_config():
+        raise ValueError("неверный config.json")
+
+    service = WatchService(main.parse_args(["--excel", "final"]), status_file=inputs.parent / "status.json",
+                           use_events=False)
+    monkeypatch.setattr(service, "_reload_config", broken_config)
+    try:
+        run = service.run_once()
+    finally:
+        service.close()
+    assert run["error"] == "ValueError: неверный config.json"
+    with open(service.status_file, encoding="utf-8") as f:
+        status = json.load(f)
+    assert status["runs"] == 1 and status["last_run"]["error"] == run["error"]
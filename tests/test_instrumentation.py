@@ -0,0 +1,28 @@
+import tracemalloc
+
+import pandas as pd
+
+from instrumentation import RunReport
+
+
+def _run_stage(report: RunReport):
+    df = pd.DataFrame({"ФИО": ["Иванов", "Петров"], "Право": ["+", None]})
+    with report.stage("smart_merge", inputs=df) as stage:
+        stage.set_output(df)
+    report.stop()
+    return report.to_dict()["stages"][0]
+
+
+def test_memory_is_not_measured_by_default():
+    """По умолчанию ни tracemalloc, ни память результата этапа не замеряются."""
+    record = _run_stage(RunReport())
+    assert not tracemalloc.is_tracing()
+    assert record["rows_out"] == 2
+    assert record["frame_bytes_out"] is None and record["memory_peak"] is None
+    assert "measure_bytes" not in record
+
+
+def test_trace_memory_measures_stages():
+    record = _run_stage(RunReport(trace_memory=True))
+    assert not tracemalloc.is_tracing()
+    assert record["frame_bytes_out"] > 0 and record["memory_peak"] is not None
@@ -0,0 +1,27 @@
+import pytest
+from pandas.testing import assert_frame_equal
+
+import functions
+from tests.helpers import rights_frame
+
+
+@pytest.mark.parametrize("sort", [True, False])
+@pytest.mark.parametrize("na_keys", ["drop", "keep"])
+def test_merge_bit_matrix_matches_first(sort, na_keys):
+    """smart_merge с побитовым ИЛИ прав по группам совпадает с groupby().first() по столбцам."""
+    df, _ = rights_frame(2000, 40, seed=0)
+    df.loc[df.index[::50], "УЗ"] = None
+    results = [functions.smart_merge(df, {}, na_keys=na_keys, sort=sort, flags_as_bits=flags_as_bits)
+               for flags_as_bits in (False, True)]
+    assert_frame_equal(results[1], results[0])
+
+
+@pytest.mark.parametrize("drop", [True, False])
+def test_combine_bit_matrix_matches_columns(drop):
+    """Объединение прав через битовую матрицу совпадает с объединением по столбцам."""
+    df, rights_config = rights_frame(2000, 40, seed=0)
+    merged = functions.smart_merge(df, {})
+    results = [functions.combine_columns_by_replace_keys(
+        merged.copy(), ["REPLACE_RIGHTS"], rights_config, drop=drop, flags_as_bits=flags_as_bits)
+        for flags_as_bits in (False, True)]
+    assert_frame_equal(results[1], results[0])
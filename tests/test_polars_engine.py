@@ -0,0 +1,35 @@
+import json
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+pytest.importorskip("polars")
+
+import main
+from questionnaire_generator import GeneratorOptions, generate
+from tests.helpers import engine_differences, engine_tables, pandas_chain, polars_chain
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_engines_write_same_files(main_folders, seed):
+    """Полные запуски обоими движками на синтетических опросных листах выгружают одинаковые файлы."""
+    inputs = main_folders / "in"
+    generate(inputs, GeneratorOptions(rows=200, columns=20, seed=seed))
+    results = {engine: main.run(inputs, main_folders / engine, engine=engine, no_cache=True)
+               for engine in ("pandas", "polars")}
+    with open(results["polars"].report_path, encoding="utf-8") as f:
+        stages = [stage["stage"] for stage in json.load(f)["stages"]]
+    assert "polars_collect" in stages, "движок polars не использовался"
+    assert results["pandas"].written
+    for path in results["pandas"].written:
+        name = Path(path).name
+        assert_frame_equal(pd.read_excel(main_folders / "polars" / name), pd.read_excel(path), obj=name)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_engines_match_on_edge_cases(seed):
+    """Этапы обработки совпадают на таблицах с особыми случаями: пропуски, пробелы, другой порядок столбцов."""
+    tables = engine_tables(5000, seed, edge_cases=True)
+    assert engine_differences(pandas_chain(tables), polars_chain(tables)) == []
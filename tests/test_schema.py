@@ -0,0 +1,44 @@
+import json
+
+import pandas as pd
+import pytest
+
+from schema import SchemaRegistry
+
+HEADERS = pd.Index(["№", "ФИО сотрудника", "Учетная запись в MS AD", "Учетная запись MS AD", "Должность"])
+RENAME_MAP = {"ФИО сотрудника": "ФИО", "Учетная запись в MS AD": "УЗ", "Учетная запись MS AD": "УЗ"}
+
+
+def test_stored_signatures_are_reused_by_the_next_run(tmp_path, monkeypatch):
+    """Сигнатура, разобранная в одном запуске, в следующем берётся из файла без разбора."""
+    path = tmp_path / "schemas.json"
+    first = SchemaRegistry()
+    first.load(path)
+    expected = first.resolve(HEADERS, ["№"], RENAME_MAP)
+    first.save()
+
+    def build(*args):
+        raise AssertionError("сигнатура разобрана заново")
+
+    second = SchemaRegistry()
+    monkeypatch.setattr(second, "_build", build)
+    second.load(path)
+    schema = second.resolve(HEADERS, ["№"], RENAME_MAP)
+    assert (schema.columns, schema.sources, schema.identity) == (
+        expected.columns, expected.sources, expected.identity)
+    assert schema.collisions == {"УЗ": (2, 3)}
+
+    # Другие настройки — другая сигнатура: разбор нужен заново
+    with pytest.raises(AssertionError, match="заново"):
+        second.resolve(HEADERS, [], RENAME_MAP)
+
+
+def test_damaged_file_is_ignored_and_rewritten(tmp_path):
+    """Повреждённый файл сигнатур не мешает разбору и перезаписывается при save."""
+    path = tmp_path / "schemas.json"
+    path.write_text("{не json", encoding="utf-8")
+    registry = SchemaRegistry()
+    registry.load(path)
+    assert registry.resolve(HEADERS, [], {}).identity
+    registry.save()
+    assert len(json.loads(path.read_text(encoding="utf-8"))["schemas"]) == 1
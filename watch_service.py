@@ -0,0 +1,301 @@
+import argparse
+import importlib
+import json
+import logging
+import os
+import queue
+import signal
+import time
+from datetime import datetime
+from pathlib import Path
+
+import main
+from config_manager import config
+from functions import is_input_file, normalize_columns
+from incremental import IncrementalState
+from table_cache import TableCache
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # необязательная зависимость
+    FileSystemEventHandler = object
+    Observer = None
+
+# Файл состояния службы по умолчанию
+STATUS_FILE = config.ROOT / "log" / "watch_status.json"
+
+
+def _snapshot(folder: Path) -> dict[str, tuple[int, int]]:
+    """Опросные листы каталога: имя -> (размер, время изменения)."""
+    snapshot = {}
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file() and is_input_file(entry.name):
+                stat = entry.stat()
+                snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Будит наблюдателя при событиях с опросными листами каталога."""
+
+    def __init__(self, events: queue.Queue):
+        super().__init__()
+        self.events = events
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+            if path and is_input_file(os.path.basename(path)):
+                self.events.put(path)
+
+
+class FolderWatcher:
+    """
+    Следит за опросными листами каталога: через события файловой системы (пакет watchdog:
+    inotify в Linux, ReadDirectoryChangesW в Windows) или, если watchdog не установлен,
+    опросом каталога. Временные файлы Excel (~$...) и другие файлы, которые обработка
+    не читает, пропускаются (is_input_file).
+
+    Args:
+        folder: Каталог с опросными листами.
+        poll_interval: Период опроса каталога, с.
+        use_events: Использовать события файловой системы, если watchdog доступен.
+    """
+
+    def __init__(self, folder, poll_interval: float = 1.0, use_events: bool = True):
+        self.folder = Path(folder)
+        self.poll_interval = poll_interval
+        self._snapshot = _snapshot(self.folder)
+        self._events: queue.Queue = queue.Queue()
+        self._observer = None
+        if use_events and Observer is not None:
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self._events), str(self.folder), recursive=False)
+            self._observer.start()
+        logging.info(f"Наблюдение за {self.folder}: "
+                     f"{'события файловой системы' if self._observer else 'опрос каталога'}")
+
+    @property
+    def mode(self) -> str:
+        return "events" if self._observer is not None else "polling"
+
+    def changes(self, timeout: float) -> set[str]:
+        """
+        Имена опросных листов, добавленных, изменённых или удалённых с прошлого вызова.
+        Ждёт не дольше timeout, пока не появится хотя бы одно изменение.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._observer is not None:
+                # События только будят наблюдателя, а что изменилось, показывает сверка снимков:
+                # событие о файле ещё не значит, что файл изменился (например, Excel только открыл его)
+                try:
+                    self._events.get(timeout=max(0.0, deadline - time.monotonic()))
+                    while True:
+                        self._events.get_nowait()
+                except queue.Empty:
+                    pass
+            snapshot = _snapshot(self.folder)
+            names = {name for name in self._snapshot.keys() | snapshot.keys()
+                     if self._snapshot.get(name) != snapshot.get(name)}
+            self._snapshot = snapshot
+            if names or time.monotonic() >= deadline:
+                return names
+            if self._observer is None:
+                time.sleep(min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+
+    def close(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+
+class WatchService:
+    """
+    Служба непрерывной обработки: ждёт изменений в каталоге опросных листов и запускает
+    обработку в режиме --incremental.
+
+    Пачка сохранений (Excel пишет файл в несколько приёмов, файлы копируют по одному)
+    собирается в один запуск: обработка начинается, когда в течение quiet секунд
+    изменений не было, но не позже max_delay секунд после первого изменения.
+
+    Разобранные таблицы (TableCache в памяти) и результаты smart_merge и объединения
+    столбцов (IncrementalState) хранятся в памяти между запусками, поэтому запуск
+    разбирает только изменённые файлы и пересчитывает только затронутые группы 'ФИО'/'УЗ'.
+    При изменении config.json настройки перечитываются, а состояние сбрасывается.
+
+    Ход работы записывается в файл состояния (JSON): состояние службы, очередь
+    изменённых файлов и итог последнего запуска с задержкой от изменения до результата.
+
+    Args:
+        args: Параметры обработки (main.parse_args).
+        status_file: Путь к файлу состояния.
+        quiet: Сколько секунд без изменений ждать перед запуском.
+        max_delay: Наибольшая задержка запуска после первого изменения, с.
+        poll_interval: Период опроса каталога без watchdog, с.
+        use_events: Использовать события файловой системы, если watchdog доступен.
+    """
+
+    def __init__(self, args: argparse.Namespace, status_file=STATUS_FILE, quiet: float = 2.0,
+                 max_delay: float = 30.0, poll_interval: float = 1.0, use_events: bool = True):
+        self.args = args
+        self.status_file = Path(status_file)
+        self.quiet = quiet
+        self.max_delay = max_delay
+        self._modules = args.modules
+        self._config_mtime = None
+        self._reset_state()
+        self.watcher = FolderWatcher(args.input_folder, poll_interval, use_events)
+        self.pending: set[str] = set()
+        self.runs = 0
+        self.last_run: dict | None = None
+
+    def _reset_state(self) -> None:
+        """Кэш таблиц и состояние инкрементальной обработки — заново, под текущие настройки."""
+        self._config_mtime = os.stat(config.ROOT / "config.json").st_mtime_ns
+        self.args.modules = self._modules
+        main.resolve_folders(self.args)
+        self.args.incremental = True
+        self.args.table_cache = None if self.args.no_cache else TableCache(
+            main.CACHE_FOLDER, normalize_columns,
+            max_bytes=self.args.cache_size_mb * 2 ** 20, keep_in_memory=True)
+        self.args.incremental_state = IncrementalState(main.INCREMENTAL_FOLDER, config)
+
+    def _reload_config(self) -> None:
+        if os.stat(config.ROOT / "config.json").st_mtime_ns == self._config_mtime:
+            return
+        logging.info("config.json изменён: настройки перечитываются")
+        config.reload()
+        importlib.reload(main)
+        self._reset_state()
+
+    def write_status(self, state: str) -> None:
+        """Записывает файл состояния целиком (через временный файл, без полузаписанного JSON)."""
+        status = {
+            "state": state,
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+            "input_folder": str(self.args.input_folder),
+            "output_folder": str(self.args.output_folder),
+            "mode": self.watcher.mode,
+            "queue_depth": len(self.pending),
+            "pending_files": sorted(self.pending),
+            "runs": self.runs,
+            "last_run": self.last_run,
+        }
+        os.makedirs(self.status_file.parent, exist_ok=True)
+        tmp = self.status_file.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(status, f, indent=4, ensure_ascii=False)
+        os.replace(tmp, self.status_file)
+
+    def wait_for_batch(self, idle_timeout: float | None = None) -> float | None:
+        """
+        Ждёт изменений и собирает их в пачку. Возвращает время (time.monotonic) первого
+        изменения пачки или None, если за idle_timeout изменений не было.
+        """
+        first = None
+        deadline = None if idle_timeout is None else time.monotonic() + idle_timeout
+        while True:
+            if first is not None and time.monotonic() >= first + self.max_delay:
+                return first
+            if first is None:
+                timeout = 1.0 if deadline is None else max(0.0, deadline - time.monotonic())
+            else:
+                timeout = max(0.0, min(self.quiet, first + self.max_delay - time.monotonic()))
+            names = self.watcher.changes(timeout)
+            if names:
+                if first is None:
+                    first = time.monotonic()
+                self.pending |= names
+                self.write_status("waiting")
+                continue
+            if first is not None:
+                return first
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+
+    def run_once(self, first_change: float | None = None) -> dict:
+        """Запуск обработки для накопленной пачки изменений."""
+        batch, self.pending = sorted(self.pending), set()
+        started_at = datetime.now().isoformat(timespec="seconds")
+        self.write_status("running")
+        start = time.monotonic()
+        run = {"started_at": started_at, "files": batch}
+        try:
+            # Ошибка в изменённом config.json — ошибка этой пачки, а не остановка службы:
+            # настройки перечитываются снова при следующем изменении файла
+            self._reload_config()
+            result = main.execute(self.args)
+        except Exception as e:
+            logging.exception(f"Ошибка обработки: {e}")
+            run["error"] = f"{type(e).__name__}: {e}"
+        else:
+            run.update(rows=result.rows, written=result.written,
+                       failures=[path for path, _ in result.failures], log_path=result.log_path)
+        finished = time.monotonic()
+        run["duration"] = round(finished - start, 3)
+        # Задержка от первого изменения пачки до готового результата
+        run["latency"] = round(finished - (first_change if first_change is not None else start), 3)
+        self.runs += 1
+        self.last_run = run
+        self.write_status("idle")
+        return run
+
+    def serve(self, initial_run: bool = True) -> None:
+        """Основной цикл службы; останавливается по Ctrl+C или SIGTERM."""
+        def stop(signum, frame):
+            raise KeyboardInterrupt
+
+        signal.signal(signal.SIGTERM, stop)
+        try:
+            if initial_run:
+                self.run_once()
+            else:
+                self.write_status("idle")
+            while True:
+                first = self.wait_for_batch()
+                run = self.run_once(first)
+                print(f"{run['started_at']}: файлов {len(run['files'])}, "
+                      f"задержка {run['latency']:.1f} с"
+                      + (f", ошибка: {run['error']}" if "error" in run else ""))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self.watcher.close()
+        self.write_status("stopped")
+
+
+def parse_args(argv=None) -> tuple[argparse.Namespace, argparse.Namespace]:
+    """Параметры службы и параметры обработки (все параметры main.py, кроме --incremental)."""
+    parser = argparse.ArgumentParser(
+        description="Непрерывная обработка опросных листов по мере их появления в каталоге. "
+                    "Остальные параметры передаются обработке, как у main.py.")
+    parser.add_argument("--status-file", type=Path, default=STATUS_FILE,
+                        help="файл состояния службы (JSON)")
+    parser.add_argument("--quiet", type=float, default=2.0,
+                        help="сколько секунд без изменений ждать перед запуском")
+    parser.add_argument("--max-delay", type=float, default=30.0,
+                        help="наибольшая задержка запуска после первого изменения, с")
+    parser.add_argument("--poll-interval", type=float, default=1.0,
+                        help="период опроса каталога, если события файловой системы недоступны, с")
+    parser.add_argument("--poll", action="store_true",
+                        help="опрашивать каталог даже при установленном watchdog")
+    parser.add_argument("--no-initial-run", action="store_true",
+                        help="не обрабатывать каталог при старте, ждать первого изменения")
+    service_args, rest = parser.parse_known_args(argv)
+    # По умолчанию служба выгружает только итог: результат нужен быстро
+    return service_args, main.parse_args(["--excel", "final", *rest])
+
+
+if __name__ == "__main__":
+    service_args, pipeline_args = parse_args()
+    WatchService(pipeline_args, status_file=service_args.status_file, quiet=service_args.quiet,
+                 max_delay=service_args.max_delay, poll_interval=service_args.poll_interval,
+                 use_events=not service_args.poll).serve(initial_run=not service_args.no_initial_run)
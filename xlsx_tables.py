@@ -0,0 +1,181 @@
+import zipfile
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Iterable, Optional
+from xml.etree.ElementTree import fromstring
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.packaging.relationship import get_dependents, get_rels_path
+from openpyxl.utils.cell import range_boundaries
+from openpyxl.utils.escape import unescape
+from openpyxl.xml.constants import ARC_ROOT_RELS, REL_NS, SHEET_MAIN_NS
+
+# Типы связей, по которым ищем книгу и таблицы внутри пакета xlsx
+_OFFICE_DOCUMENT_REL = "/officeDocument"
+_TABLE_REL = "/table"
+
+
+@dataclass(frozen=True)
+class TableDefinition:
+    """
+    Описание именованной таблицы Excel: имя, лист и диапазон ячеек.
+
+    columns — имена столбцов из описания таблицы; header_row=False, если у таблицы
+    нет строки заголовков (тогда заголовками при чтении становится первая строка диапазона).
+    """
+    name: str
+    sheet: str
+    ref: str
+    columns: tuple[str, ...] = ()
+    header_row: bool = True
+
+
+def _find_workbook_part(archive: zipfile.ZipFile) -> str:
+    """Возвращает путь к workbook.xml внутри архива по корневым связям пакета."""
+    for rel in get_dependents(archive, ARC_ROOT_RELS):
+        if rel.Type.endswith(_OFFICE_DOCUMENT_REL):
+            return rel.target
+    raise ValueError("В файле не найдена книга Excel")
+
+
+def _read_table_definitions(archive: zipfile.ZipFile) -> list[TableDefinition]:
+    workbook_part = _find_workbook_part(archive)
+    valid_files = set(archive.namelist())
+    workbook_rels = {rel.id: rel.target for rel in get_dependents(
+        archive, get_rels_path(workbook_part))}
+
+    workbook = fromstring(archive.read(workbook_part))
+    definitions = []
+    for sheet in workbook.iterfind(f"{{{SHEET_MAIN_NS}}}sheets/{{{SHEET_MAIN_NS}}}sheet"):
+        sheet_part = workbook_rels.get(sheet.get(f"{{{REL_NS}}}id"))
+        if sheet_part is None:
+            continue
+        sheet_rels_path = get_rels_path(sheet_part)
+        if sheet_rels_path not in valid_files:
+            continue
+
+        for rel in get_dependents(archive, sheet_rels_path):
+            if not rel.Type.endswith(_TABLE_REL) or rel.target not in valid_files:
+                continue
+            table = fromstring(archive.read(rel.target))
+            definitions.append(TableDefinition(
+                name=table.get("name"),
+                sheet=sheet.get("name"),
+                ref=table.get("ref"),
+                # Переносы строк и другие служебные символы в именах записаны как _xHHHH_
+                columns=tuple(unescape(column.get("name", ""))
+                              for column in table.iter(f"{{{SHEET_MAIN_NS}}}tableColumn")),
+                header_row=table.get("headerRowCount", "1") != "0",
+            ))
+    return definitions
+
+
+def read_table_definitions(filepath) -> list[TableDefinition]:
+    """
+    Читает только описания таблиц (xl/tables/*.xml и связи листов), не загружая ячейки.
+
+    Args:
+        filepath: Путь к Excel файлу.
+
+    Returns:
+        list[TableDefinition]: Таблицы в порядке листов книги.
+    """
+    with zipfile.ZipFile(filepath) as archive:
+        return _read_table_definitions(archive)
+
+
+def read_table_headers(filepath) -> list[TableDefinition]:
+    """
+    Описания таблиц с заголовками, которые получит read_tables, без чтения данных.
+
+    Заголовки берутся из описаний таблиц; только у таблиц без строки заголовков
+    читается первая строка диапазона.
+
+    Returns:
+        list[TableDefinition]: Таблицы в порядке листов книги; columns — заголовки.
+    """
+    definitions = read_table_definitions(filepath)
+    headless = [d for d in definitions if not d.header_row]
+    if not headless:
+        return definitions
+
+    wb = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        first_rows = {}
+        for definition in headless:
+            min_col, min_row, max_col, _ = range_boundaries(definition.ref)
+            first_rows[definition.name] = next(wb[definition.sheet].iter_rows(
+                min_row=min_row, max_row=min_row, min_col=min_col, max_col=max_col,
+                values_only=True), ())
+    finally:
+        wb.close()
+    return [replace(d, columns=tuple(first_rows[d.name])) if d.name in first_rows else d
+            for d in definitions]
+
+
+def _rows_to_dataframe(rows: Iterable[tuple], n_rows: int) -> pd.DataFrame:
+    """
+    Раскладывает поток строк диапазона по столбцам; первая строка — заголовки.
+
+    Строки, отсутствующие в конце листа, дополняются пустыми значениями до n_rows,
+    как это делает срез sheet[ref] при полной загрузке книги.
+    """
+    rows = iter(rows)
+    headers = list(next(rows, ()))
+    columns = [list(column) for column in zip(*rows)] or [[] for _ in headers]
+    for column in columns:
+        column.extend([None] * (n_rows - len(column)))
+    if not n_rows:
+        return pd.DataFrame([], columns=headers)
+    df = pd.DataFrame(dict(enumerate(columns)))
+    # Заголовки выставляем отдельно: в таблице могут встречаться одинаковые имена столбцов
+    df.columns = headers
+    return df
+
+
+def read_tables(filepath, table_names: Optional[Iterable[str]] = None) -> dict[str, pd.DataFrame]:
+    """
+    Потоково читает именованные таблицы из Excel файла.
+
+    Сначала читаются только описания таблиц, затем для каждой таблицы в режиме
+    read_only разбирается лишь нужный диапазон листа, без построения полной книги.
+
+    Args:
+        filepath: Путь к Excel файлу.
+        table_names: Имена нужных таблиц. None — все таблицы файла.
+
+    Returns:
+        dict[str, pd.DataFrame]: Таблицы по именам, в порядке следования в книге.
+
+    Raises:
+        ValueError: Если какая-либо из запрошенных таблиц не найдена.
+    """
+    filepath = Path(filepath)
+    definitions = read_table_definitions(filepath)
+    if table_names is not None:
+        wanted = list(dict.fromkeys(table_names))
+        found = {d.name for d in definitions}
+        missing = [name for name in wanted if name not in found]
+        if missing:
+            raise ValueError(
+                f"Таблица '{missing[0]}' не найдена" if len(missing) == 1
+                else f"Таблицы {missing} не найдены")
+        definitions = [d for d in definitions if d.name in wanted]
+
+    tables = {}
+    if not definitions:
+        return tables
+
+    wb = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        for definition in definitions:
+            min_col, min_row, max_col, max_row = range_boundaries(definition.ref)
+            rows = wb[definition.sheet].iter_rows(
+                min_row=min_row, max_row=max_row,
+                min_col=min_col, max_col=max_col,
+                values_only=True)
+            tables[definition.name] = _rows_to_dataframe(rows, max_row - min_row)
+    finally:
+        wb.close()
+    return tables